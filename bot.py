@@ -4,12 +4,16 @@ import logging
 import os
 import signal
 import sys
+import time
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from db.database import initialize_databases, close_all_databases
+from db.storage import SqliteBackend
 from utils.log import setup_logging
 from utils.cogs import discover_cog_paths
 from utils.uptime import format_uptime
+from utils.rest import RestScheduler
+from utils.cluster import check_cluster_config, cluster_member, cluster_size, member_shards, shard_count
+from utils.shards import ShardHealth
 import asyncio
 import internal_api
 
@@ -36,6 +40,7 @@ TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 if not TOKEN:
     raise SystemExit("DISCORD_BOT_TOKEN is not set. Add it to your .env file")
 
+check_cluster_config()
 setup_logging()
 logger = logging.getLogger("bot")
 
@@ -43,8 +48,21 @@ intents = discord.Intents.default()
 intents.members = True
 intents.guilds = True
 intents.message_content = True
-bot = commands.Bot(command_prefix="ç!", intents=intents)
+# SHARD_COUNT unset lets Discord recommend a count for the bot's current guild total.
+# In cluster mode run.py starts one of these per member, each running its own run of shards.
+shard_ids = list(member_shards(cluster_member(), cluster_size(), shard_count())) if cluster_size() > 1 else None
+bot = commands.AutoShardedBot(command_prefix="ç!", intents=intents, shard_count=shard_count(), shard_ids=shard_ids)
+bot.cluster_member = cluster_member()
+bot.shard_health = ShardHealth()
+bot.shard_health.attach(bot)
 bot.launch_time = datetime.now(timezone.utc)
+# Every cog reads and writes through this rather than importing db.database, see db/storage.py.
+bot.storage = SqliteBackend()
+if shard_ids:
+    bot.storage.set_owned_shards(shard_count(), shard_ids[0], shard_ids[-1])
+# Paces the bot's own REST calls by priority lane, see utils/rest.py.
+bot.rest = RestScheduler()
+bot.rest.install(bot.http)
 
 # A custom /help command is loaded from cogs, so the built-in one is removed to avoid a name clash.
 bot.remove_command("help")
@@ -63,6 +81,20 @@ async def load_cogs(bot):
 has_synced = False
 has_greeted = False
 
+async def warm_up():
+    """Loads every guild's settings, the lobby index and the unban schedule in bulk
+    before the first commands arrive, so they don't each pay for a cold read."""
+    started = time.perf_counter()
+    try:
+        loaded = await bot.storage.warm_up([guild.id for guild in bot.guilds])
+    except Exception as e:
+        # Not fatal: everything is still read on demand, just slower at first.
+        logger.error(f"Warm-up failed: {e}")
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    summary = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in loaded.items())
+    logger.info(f"Warmed up {len(bot.guilds)} guild(s) in {elapsed_ms:.1f}ms" + (f": {summary}" if summary else ""))
+
 @bot.event
 async def on_ready():
     global has_synced, has_greeted
@@ -74,6 +106,7 @@ async def on_ready():
         logger.info(f"{bot.user.name} online and ready with devtools prefix {bot.command_prefix}")
         logger.info("=" * 56)
         has_greeted = True
+        await warm_up()
     else:
         logger.info(f"{bot.user.name} reconnected")
 
@@ -84,7 +117,8 @@ async def on_ready():
     # Set SYNC_ON_STARTUP=false in .env to skip this entirely, e.g. during restart testing
     # where every crash/restart would otherwise trigger a fresh command sync.
     sync_on_startup = os.getenv("SYNC_ON_STARTUP", "true").lower() != "false"
-    if sync_on_startup and not has_synced:
+    # Commands are global, so in cluster mode the first member syncs for all of them.
+    if sync_on_startup and not has_synced and bot.cluster_member == 0:
         try:
             synced = await bot.tree.sync()
             logger.info(f"Synced {len(synced)} slash commands")
@@ -95,7 +129,7 @@ async def on_ready():
 if __name__ == "__main__":
     async def main():
         global _shutdown_event
-        await initialize_databases()
+        await bot.storage.initialize()
         await load_cogs(bot)
 
         _shutdown_event = asyncio.Event()
@@ -126,7 +160,7 @@ if __name__ == "__main__":
                 except Exception as e:
                     logger.error(f"Failed to unload extension {extension}: {e}")
 
-            await close_all_databases()
+            await bot.storage.close()
 
             # Gives any straggling background tasks a moment to finish before the process exits.
             await asyncio.sleep(2)
@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 import random
 
 ANSWERS = [
@@ -36,7 +35,7 @@ class EightBall(commands.Cog):
         """Responds to a user's question with a random answer."""
         answer = random.choice(ANSWERS)
 
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
 
         embed = discord.Embed(
             title="🎱 Magic 8-Ball",
@@ -1,10 +1,10 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color, add_autorole, remove_autorole, get_autoroles
 from utils.embeds import success_embed
 from utils.errors import UserError
 from utils.permissions import require_permission
+from utils.rest import MODERATION, lane
 
 class Autorole(commands.GroupCog, group_name="autorole"):
     def __init__(self, bot: commands.Bot):
@@ -13,7 +13,7 @@ class Autorole(commands.GroupCog, group_name="autorole"):
 
     async def get_color(self, guild_id: int) -> discord.Color:
         """Helper method to fetch the server's configured embed color."""
-        return await get_guild_embed_color(guild_id)
+        return await self.bot.storage.get_guild_embed_color(guild_id)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
@@ -21,7 +21,7 @@ class Autorole(commands.GroupCog, group_name="autorole"):
         if member.bot:
             return
             
-        role_ids = await get_autoroles(member.guild.id)
+        role_ids = await self.bot.storage.get_autoroles(member.guild.id)
         if not role_ids:
             return
             
@@ -33,7 +33,8 @@ class Autorole(commands.GroupCog, group_name="autorole"):
                 
         if roles_to_add:
             try:
-                await member.add_roles(*roles_to_add, reason="Autorole")
+                with lane(MODERATION):
+                    await member.add_roles(*roles_to_add, reason="Autorole")
             except discord.HTTPException:
                 pass
 
@@ -42,7 +43,7 @@ class Autorole(commands.GroupCog, group_name="autorole"):
     async def add(self, interaction: discord.Interaction, role: discord.Role):
         """Adds an autorole to the database."""
         await require_permission(interaction, "manage_roles")
-        await add_autorole(interaction.guild_id, role.id)
+        await self.bot.storage.add_autorole(interaction.guild_id, role.id)
 
         embed = success_embed(f"Successfully added {role.mention} to the autorole list.")
         await interaction.response.send_message(embed=embed)
@@ -52,7 +53,7 @@ class Autorole(commands.GroupCog, group_name="autorole"):
     async def remove(self, interaction: discord.Interaction, role: discord.Role):
         """Removes an autorole from the database."""
         await require_permission(interaction, "manage_roles")
-        await remove_autorole(interaction.guild_id, role.id)
+        await self.bot.storage.remove_autorole(interaction.guild_id, role.id)
 
         embed = success_embed(f"Successfully removed {role.mention} from the autorole list.")
         await interaction.response.send_message(embed=embed)
@@ -61,7 +62,7 @@ class Autorole(commands.GroupCog, group_name="autorole"):
     async def list(self, interaction: discord.Interaction):
         """Lists all configured autoroles for the guild."""
         await require_permission(interaction, "manage_roles")
-        role_ids = await get_autoroles(interaction.guild_id)
+        role_ids = await self.bot.storage.get_autoroles(interaction.guild_id)
         color = await self.get_color(interaction.guild_id)
 
         # Handle case where no roles are configured
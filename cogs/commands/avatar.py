@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 
 class Avatar(commands.Cog):
     def __init__(self, bot):
@@ -11,7 +10,7 @@ class Avatar(commands.Cog):
     async def avatar(self, interaction: discord.Interaction, member: discord.Member = None):
         """Shows the avatar of the user."""
         member = member or interaction.user  # Default to the command user if no member is mentioned
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
 
         embed = discord.Embed(
             title=f"{member}'s Avatar",
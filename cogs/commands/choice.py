@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 from utils.errors import UserError
 import random
 
@@ -32,7 +31,7 @@ class Choice(commands.Cog):
         # Select a random option
         selected = random.choice(all_options)
 
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
 
         # Create an embed to display the result
         embed = discord.Embed(
@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 
 # Keyed by qualified name, whole group (e.g. "image") or single subcommand
 # (e.g. "setup welcome"). A subcommand entry wins over its group's entry.
@@ -199,7 +198,7 @@ class HelpCog(commands.Cog):
         return chunks
 
     async def get_help_pages(self, guild_id=None):
-        color = await get_guild_embed_color(guild_id)
+        color = await self.bot.storage.get_guild_embed_color(guild_id)
 
         collected = self._collect_commands()
 
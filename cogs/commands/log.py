@@ -3,7 +3,6 @@ from discord import app_commands
 from discord.ext import commands
 from typing import Optional
 
-from db.database import set_commands_log_channel, set_moderation_log_channel
 from utils.embeds import success_embed
 from utils.permissions import require_permission
 
@@ -17,10 +16,10 @@ class Log(commands.GroupCog, group_name="log"):
     async def commands_log(self, interaction: discord.Interaction, channel: Optional[discord.TextChannel] = None):
         await require_permission(interaction, "administrator")
         if channel is None:
-            await set_commands_log_channel(interaction.guild_id, None)
+            await self.bot.storage.set_commands_log_channel(interaction.guild_id, None)
             embed = success_embed("Command logging has been disabled.")
         else:
-            await set_commands_log_channel(interaction.guild_id, channel.id)
+            await self.bot.storage.set_commands_log_channel(interaction.guild_id, channel.id)
             embed = success_embed(f"Commands will now be logged in {channel.mention}.")
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -29,10 +28,10 @@ class Log(commands.GroupCog, group_name="log"):
     async def moderation(self, interaction: discord.Interaction, channel: Optional[discord.TextChannel] = None):
         await require_permission(interaction, "administrator")
         if channel is None:
-            await set_moderation_log_channel(interaction.guild_id, None)
+            await self.bot.storage.set_moderation_log_channel(interaction.guild_id, None)
             embed = success_embed("Moderation logging has been disabled.")
         else:
-            await set_moderation_log_channel(interaction.guild_id, channel.id)
+            await self.bot.storage.set_moderation_log_channel(interaction.guild_id, channel.id)
             embed = success_embed(f"Moderation actions will now be logged in {channel.mention}.")
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -1,21 +1,21 @@
+import asyncio
 import logging
+import time
 from datetime import timedelta
 from typing import Optional
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
-
-from db.database import (
-    get_guild_embed_color, get_moderation_log_channel,
-    next_case_number, add_mod_case,
-    temp_ban_add, temp_ban_remove, temp_bans_due,
-    add_warning, get_warnings, count_warnings, get_all_warnings, clear_warnings,
-)
+from discord.ext import commands
+
+from db.database import CaseRecord
 from utils.duration import parse_duration
 from utils.embeds import success_embed
 from utils.errors import UserError
+from utils.pagination import KeysetPaginator
 from utils.permissions import require_permission
+from utils.rest import MODERATION, set_lane
+from utils.shards import owns_guild
 
 logger = logging.getLogger("moderation")
 
@@ -30,12 +30,33 @@ PERMISSIONS = {
     "warn": "moderate_members",
     "warnings": "moderate_members",
     "clearwarnings": "administrator",
+    "history": "moderate_members",
+    "case": "moderate_members",
+    "search": "moderate_members",
 }
 
+# Every action _log_case records, for filtering /moderation search.
+CASE_ACTIONS = ["Ban", "Unban", "Kick", "Timeout", "Timeout Removed", "Warn", "Warnings Cleared"]
+
 MAX_TIMEOUT_DURATION = timedelta(days=28)
 WARN_TIMEOUT_DURATION = timedelta(hours=24)
 WARN_TIMEOUT_THRESHOLD = 2
 WARN_BAN_THRESHOLD = 3
+# Expired temp bans processed at once. A burst of expiries across many guilds runs
+# in parallel up to this, without flooding the unban route.
+TEMP_UNBAN_CONCURRENCY = 5
+# Rows per page in the history/warnings views. Reasons are cut short in those lists
+# so a full page stays inside a TextDisplay's 4000 characters; /moderation case shows them whole.
+PAGE_SIZE = 10
+REASON_PREVIEW_LENGTH = 200
+CASE_REASON_LENGTH = 3000
+# Mod log entries are sent in windows of this long, so the cases of a ban or warn
+# wave reach the log channel up to 10 to a message rather than one send each.
+MOD_LOG_BATCH_SECONDS = 1
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
 
 class Moderation(commands.GroupCog, group_name="moderation"):
     def __init__(self, bot: commands.Bot):
@@ -43,32 +64,31 @@ class Moderation(commands.GroupCog, group_name="moderation"):
         self.bot = bot
 
     async def cog_load(self):
-        if not self.check_temp_bans.is_running():
-            self.check_temp_bans.start()
+        await self.bot.storage.load_temp_bans()
+        self.temp_ban_task = asyncio.create_task(self.run_temp_ban_scheduler())
 
     def cog_unload(self):
-        self.check_temp_bans.cancel()
+        self.temp_ban_task.cancel()
 
     async def _check_permission(self, interaction: discord.Interaction, command_name: str):
         await require_permission(interaction, PERMISSIONS[command_name])
 
     async def _log_case(
         self, guild: discord.Guild, action: str, target_id: int,
-        moderator_id: int, reason: str, duration: Optional[str],
-    ) -> int:
-        case_number = await next_case_number(guild.id)
-        await add_mod_case(guild.id, case_number, action, target_id, moderator_id, reason, duration)
+        moderator_id: int, reason: str, duration: Optional[str], **record,
+    ) -> CaseRecord:
+        # Extra keyword arguments (warning, unban_at, lift_temp_ban) go to record_case,
+        # so the case and its side effects commit together.
+        case = await self.bot.storage.record_case(guild.id, action, target_id, moderator_id, reason, duration, **record)
 
-        channel_id = await get_moderation_log_channel(guild.id)
-        if not channel_id:
-            return case_number
+        if not case.log_channel_id:
+            return case
 
-        channel = guild.get_channel(channel_id)
+        channel = guild.get_channel(case.log_channel_id)
         if not channel:
-            return case_number
+            return case
 
-        color = await get_guild_embed_color(guild.id)
-        embed = discord.Embed(title=f"{action} | Case #{case_number}", color=color)
+        embed = discord.Embed(title=f"{action} | Case #{case.case_number}", color=case.color)
         embed.add_field(name="Offender", value=f"<@{target_id}>", inline=False)
         embed.add_field(name="Reason", value=reason, inline=False)
         if duration:
@@ -77,12 +97,10 @@ class Moderation(commands.GroupCog, group_name="moderation"):
         embed.timestamp = discord.utils.utcnow()
         embed.set_footer(text=f"User ID: {target_id}")
 
-        try:
-            await channel.send(embed=embed)
-        except (discord.Forbidden, discord.HTTPException):
-            pass
-
-        return case_number
+        await self.bot.storage.outbox_enqueue(
+            guild.id, channel.id, "mod_log", {"embeds": [embed.to_dict()]}, batch_window=MOD_LOG_BATCH_SECONDS
+        )
+        return case
 
     @app_commands.command(name="ban", description="Bans a user from the server")
     @app_commands.describe(
@@ -116,8 +134,7 @@ class Moderation(commands.GroupCog, group_name="moderation"):
 
         if parsed_duration:
             unban_at = int((discord.utils.utcnow() + parsed_duration).timestamp())
-            case_number = await self._log_case(interaction.guild, "Ban", target_id, interaction.user.id, reason, duration)
-            await temp_ban_add(interaction.guild_id, target_id, unban_at, case_number)
+            await self._log_case(interaction.guild, "Ban", target_id, interaction.user.id, reason, duration, unban_at=unban_at)
             description = f"Banned <@{target_id}> (`{target_id}`) for `{duration}`."
         else:
             await self._log_case(interaction.guild, "Ban", target_id, interaction.user.id, reason, None)
@@ -145,8 +162,7 @@ class Moderation(commands.GroupCog, group_name="moderation"):
         except discord.Forbidden:
             raise UserError("I don't have permission to unban that user.")
 
-        await temp_ban_remove(interaction.guild_id, target_id)
-        await self._log_case(interaction.guild, "Unban", target_id, interaction.user.id, reason, None)
+        await self._log_case(interaction.guild, "Unban", target_id, interaction.user.id, reason, None, lift_temp_ban=True)
 
         embed = success_embed(f"Unbanned <@{target_id}> (`{target_id}`).")
         await interaction.followup.send(embed=embed, ephemeral=True)
@@ -221,9 +237,8 @@ class Moderation(commands.GroupCog, group_name="moderation"):
 
         await interaction.response.defer(ephemeral=True)
 
-        case_number = await self._log_case(interaction.guild, "Warn", member.id, interaction.user.id, reason, None)
-        await add_warning(interaction.guild_id, case_number, member.id, interaction.user.id, reason)
-        count = await count_warnings(interaction.guild_id, member.id)
+        case = await self._log_case(interaction.guild, "Warn", member.id, interaction.user.id, reason, None, warning=True)
+        count = case.warning_count
 
         description = f"Warned {member.mention} (`{member.id}`). This is warning **#{count}**."
 
@@ -252,38 +267,52 @@ class Moderation(commands.GroupCog, group_name="moderation"):
 
         await interaction.response.defer(ephemeral=True)
 
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
+
         if member is not None:
-            rows = await get_warnings(interaction.guild_id, member.id)
-            if not rows:
+            async def fetch_page(after_case: int):
+                rows = await self.bot.storage.get_warnings(interaction.guild_id, member.id, after_case, PAGE_SIZE + 1)
+                lines = [
+                    f"`#{case}` <t:{created_at}:R> by <@{mod_id}>: {_shorten(reason, REASON_PREVIEW_LENGTH)}"
+                    for case, mod_id, reason, created_at in rows[:PAGE_SIZE]
+                ]
+                next_cursor = rows[PAGE_SIZE - 1][0] if len(rows) > PAGE_SIZE else None
+                return "\n".join(lines) or None, next_cursor
+
+            content, next_cursor = await fetch_page(0)
+            if content is None:
                 raise UserError(f"{member.mention} has no warnings.")
 
-            lines = [f"`#{case}` <t:{created_at}:R> by <@{mod_id}>: {reason}" for case, mod_id, reason, created_at in rows]
-            embed = discord.Embed(
-                title=f"Warnings for {member}",
-                description="\n".join(lines),
-                color=await get_guild_embed_color(interaction.guild_id),
-            )
-            return await interaction.followup.send(embed=embed, ephemeral=True)
-
-        rows = await get_all_warnings(interaction.guild_id)
-        member_ids = {m.id for m in interaction.guild.members}
-
-        grouped: dict[int, list] = {}
-        for case, target_id, mod_id, reason, created_at in rows:
-            if target_id not in member_ids:
-                continue
-            grouped.setdefault(target_id, []).append((case, mod_id, reason, created_at))
+            view = KeysetPaginator(f"Warnings for {member}", fetch_page, content, next_cursor, color, start_cursor=0)
+            view.message = await interaction.followup.send(view=view, ephemeral=True)
+            return
 
-        if not grouped:
+        guild = interaction.guild
+
+        async def fetch_summary_page(after_target: int):
+            # Members who have left still have counters, so keep reading until a page's
+            # worth (plus one, to know if there's more) of current members turns up.
+            found: list[tuple[int, int]] = []
+            cursor = after_target
+            while len(found) <= PAGE_SIZE:
+                rows = await self.bot.storage.get_warning_counts(guild.id, cursor, PAGE_SIZE * 2)
+                for target_id, count in rows:
+                    if guild.get_member(target_id) is not None:
+                        found.append((target_id, count))
+                if len(rows) < PAGE_SIZE * 2:
+                    break
+                cursor = rows[-1][0]
+
+            lines = [f"<@{target_id}>: **{count}** warning(s)" for target_id, count in found[:PAGE_SIZE]]
+            next_cursor = found[PAGE_SIZE - 1][0] if len(found) > PAGE_SIZE else None
+            return "\n".join(lines) or None, next_cursor
+
+        content, next_cursor = await fetch_summary_page(0)
+        if content is None:
             raise UserError("No members currently in the server have any warnings.")
 
-        lines = [f"<@{target_id}>: **{len(entries)}** warning(s)" for target_id, entries in grouped.items()]
-        embed = discord.Embed(
-            title="Warnings",
-            description="\n".join(lines),
-            color=await get_guild_embed_color(interaction.guild_id),
-        )
-        await interaction.followup.send(embed=embed, ephemeral=True)
+        view = KeysetPaginator("Warnings", fetch_summary_page, content, next_cursor, color, start_cursor=0)
+        view.message = await interaction.followup.send(view=view, ephemeral=True)
 
     @app_commands.command(name="clearwarnings", description="Clears every warning for a member")
     @app_commands.describe(member="The member whose warnings should be cleared")
@@ -292,48 +321,176 @@ class Moderation(commands.GroupCog, group_name="moderation"):
 
         await interaction.response.defer(ephemeral=True)
 
-        count = await count_warnings(interaction.guild_id, member.id)
+        count = await self.bot.storage.count_warnings(interaction.guild_id, member.id)
         if count == 0:
             raise UserError(f"{member.mention} has no warnings to clear.")
 
-        await clear_warnings(interaction.guild_id, member.id)
+        # Re-read from the delete itself, in case a warning landed since the check.
+        count = await self.bot.storage.clear_warnings(interaction.guild_id, member.id)
         await self._log_case(interaction.guild, "Warnings Cleared", member.id, interaction.user.id, f"Cleared {count} warning(s)", None)
 
         embed = success_embed(f"Cleared **{count}** warning(s) for {member.mention}.")
         await interaction.followup.send(embed=embed, ephemeral=True)
 
-    @tasks.loop(seconds=60)
-    async def check_temp_bans(self):
-        # Guards against ticking before the guild cache is populated: is_ready()
-        # is a plain attribute check, safe even before login (unlike
-        # wait_until_ready(), which would raise if called this early during
-        # the very first cog_load, since bot.start() hasn't run yet at that point).
-        if not self.bot.is_ready():
-            return
+    @app_commands.command(name="history", description="Shows a user's moderation history, newest first")
+    @app_commands.describe(user="The user whose cases should be shown", include_archive="Also show cases archived by the retention policy")
+    async def history(self, interaction: discord.Interaction, user: discord.User, include_archive: bool = False):
+        await self._check_permission(interaction, "history")
+
+        await interaction.response.defer(ephemeral=True)
+
+        async def fetch_page(before_case: int | None):
+            rows = await self.bot.storage.get_case_history(interaction.guild_id, user.id, before_case, PAGE_SIZE + 1, include_archive=include_archive)
+            lines = []
+            for case, action, mod_id, reason, duration, created_at in rows[:PAGE_SIZE]:
+                suffix = f" ({duration})" if duration else ""
+                lines.append(f"`#{case}` **{action}**{suffix} <t:{created_at}:R> by <@{mod_id}>: {_shorten(reason, REASON_PREVIEW_LENGTH)}")
+            next_cursor = rows[PAGE_SIZE - 1][0] if len(rows) > PAGE_SIZE else None
+            return "\n".join(lines) or None, next_cursor
+
+        content, next_cursor = await fetch_page(None)
+        if content is None:
+            raise UserError(f"{user.mention} has no moderation history.")
+
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
+        view = KeysetPaginator(f"History for {user}", fetch_page, content, next_cursor, color)
+        view.message = await interaction.followup.send(view=view, ephemeral=True)
+
+    @app_commands.command(name="case", description="Shows a moderation case, with arrows to step back through older ones")
+    @app_commands.describe(number="The case number", include_archive="Also look in cases archived by the retention policy")
+    async def case(self, interaction: discord.Interaction, number: app_commands.Range[int, 1], include_archive: bool = False):
+        await self._check_permission(interaction, "case")
 
-        now_ts = int(discord.utils.utcnow().timestamp())
-        for guild_id, user_id, case_number in await temp_bans_due(now_ts):
-            # Isolated per row: tasks.loop only auto-retries on network errors, so any
-            # other unhandled exception here would kill the loop permanently and silently.
+        await interaction.response.defer(ephemeral=True)
+
+        # One case per page: each fetch reads the case plus the one before it, whose
+        # number is where the next page starts.
+        def render(rows) -> tuple[str | None, int | None]:
+            if not rows:
+                return None, None
+
+            case, action, target_id, mod_id, reason, duration, created_at = rows[0]
+            lines = [
+                f"## {action} | Case #{case}",
+                f"**Offender:** <@{target_id}> (`{target_id}`)",
+                f"**Reason:** {_shorten(reason, CASE_REASON_LENGTH)}",
+            ]
+            if duration:
+                lines.append(f"**Duration:** {duration}")
+            lines.append(f"**Responsible Moderator:** <@{mod_id}>")
+            lines.append(f"**Date:** <t:{created_at}:f>")
+            next_cursor = rows[1][0] if len(rows) > 1 else None
+            return "\n".join(lines), next_cursor
+
+        async def fetch_page(case_number: int):
+            return render(await self.bot.storage.get_cases_from(interaction.guild_id, case_number, 2, include_archive=include_archive))
+
+        rows = await self.bot.storage.get_cases_from(interaction.guild_id, number, 2, include_archive=include_archive)
+        if not rows or rows[0][0] != number:
+            hint = "" if include_archive else " It may have been archived; try again with `include_archive`."
+            raise UserError(f"Case #{number} doesn't exist.{hint}")
+
+        content, next_cursor = render(rows)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
+        view = KeysetPaginator("Moderation Case", fetch_page, content, next_cursor, color, start_cursor=number)
+        view.message = await interaction.followup.send(view=view, ephemeral=True)
+
+    @app_commands.command(name="search", description="Searches case reasons, best matches first")
+    @app_commands.describe(
+        query='Words to look for; put "quotes" around an exact phrase',
+        action="Only cases of this type",
+        user="Only cases against this user",
+        since="Only cases from this long ago or later, e.g. 12h, 7d, 30d",
+    )
+    @app_commands.choices(action=[app_commands.Choice(name=action, value=action) for action in CASE_ACTIONS])
+    async def search(
+        self, interaction: discord.Interaction, query: str,
+        action: Optional[app_commands.Choice[str]] = None,
+        user: Optional[discord.User] = None,
+        since: Optional[str] = None,
+    ):
+        await self._check_permission(interaction, "search")
+
+        since_ts = None
+        if since is not None:
+            try:
+                since_ts = int((discord.utils.utcnow() - parse_duration(since)).timestamp())
+            except ValueError as e:
+                raise UserError(str(e))
+
+        await interaction.response.defer(ephemeral=True)
+
+        async def fetch_page(offset: int):
+            rows = await self.bot.storage.search_cases(
+                interaction.guild_id, query,
+                action=action.value if action else None,
+                target_id=user.id if user else None,
+                since=since_ts, offset=offset, limit=PAGE_SIZE + 1,
+            )
+            lines = [
+                f"`#{case}` **{case_action}** <t:{created_at}:R> <@{target_id}> by <@{mod_id}>: {_shorten(snippet, REASON_PREVIEW_LENGTH)}"
+                for case, case_action, target_id, mod_id, snippet, created_at in rows[:PAGE_SIZE]
+            ]
+            next_cursor = offset + PAGE_SIZE if len(rows) > PAGE_SIZE else None
+            return "\n".join(lines) or None, next_cursor
+
+        content, next_cursor = await fetch_page(0)
+        if content is None:
+            raise UserError("No cases match that search.")
+
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
+        view = KeysetPaginator(f"Search: {_shorten(query, 100)}", fetch_page, content, next_cursor, color, start_cursor=0)
+        view.message = await interaction.followup.send(view=view, ephemeral=True)
+
+    async def run_temp_ban_scheduler(self):
+        # Waits for the guild cache to be populated first. Polls is_ready() rather than
+        # awaiting wait_until_ready(), which would raise if called this early during
+        # the very first cog_load, since bot.start() hasn't run yet at that point.
+        while not self.bot.is_ready():
+            await asyncio.sleep(1)
+
+        # Unbans queue behind commands but ahead of logging and cleanup.
+        set_lane(MODERATION)
+        semaphore = asyncio.Semaphore(TEMP_UNBAN_CONCURRENCY)
+        while True:
+            # Isolated per pass: an unhandled exception would otherwise end this task
+            # for good, and with it every future unban, silently.
+            try:
+                now = time.time()
+                # Every member loads the whole schedule; each unbans only in the guilds it runs.
+                due = [ban for ban in self.bot.storage.pop_due_temp_bans(now) if owns_guild(self.bot, ban[0])]
+                if due:
+                    await asyncio.gather(*(
+                        self._expire_temp_ban(semaphore, guild_id, user_id)
+                        for guild_id, user_id, _ in due
+                    ))
+                    continue
+
+                # Sleeps exactly until the next expiry, or indefinitely if nothing is
+                # pending; record_case wakes this early for a ban that expires sooner.
+                next_at = self.bot.storage.next_temp_ban_at()
+                await self.bot.storage.wait_for_temp_ban_change(None if next_at is None else max(0.0, next_at - now))
+            except Exception:
+                logger.exception("Temp ban scheduler pass failed")
+                await asyncio.sleep(5)
+
+    async def _expire_temp_ban(self, semaphore: asyncio.Semaphore, guild_id: int, user_id: int):
+        async with semaphore:
             try:
-                await temp_ban_remove(guild_id, user_id)
+                await self.bot.storage.temp_ban_remove(guild_id, user_id)
 
                 guild = self.bot.get_guild(guild_id)
                 if not guild:
-                    continue
+                    return
 
                 try:
                     await guild.unban(discord.Object(id=user_id), reason="Temporary ban expired")
                 except (discord.NotFound, discord.Forbidden, discord.HTTPException):
-                    continue
+                    return
 
                 await self._log_case(guild, "Unban", user_id, self.bot.user.id, "Temporary ban expired", None)
             except Exception:
                 logger.exception(f"Failed to process expired temp ban for user {user_id} in guild {guild_id}")
 
-    @check_temp_bans.error
-    async def check_temp_bans_error(self, error: BaseException):
-        logger.exception("check_temp_bans loop crashed", exc_info=error)
-
 async def setup(bot: commands.Bot):
     await bot.add_cog(Moderation(bot))
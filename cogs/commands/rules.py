@@ -3,7 +3,6 @@ from typing import Optional
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 from utils.embeds import success_embed
 from utils.errors import UserError
 from utils.permissions import require_permission
@@ -50,7 +49,7 @@ class Rules(commands.Cog):
         message_id: Optional[str] = None,
         channel: Optional[discord.TextChannel] = None,
     ):
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
 
         if message_id is None:
             await interaction.response.send_message(view=RulesView(color))
@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 
 class ServerInfo(commands.Cog):
     def __init__(self, bot):
@@ -22,7 +21,7 @@ class ServerInfo(commands.Cog):
             ("Owner", str(guild.owner), True)
         ]
 
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
 
         embed = discord.Embed(
             title="Server Info",
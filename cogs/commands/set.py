@@ -3,9 +3,9 @@ from discord import app_commands
 from discord.ext import commands
 from typing import Optional
 
-from db.database import set_embed_color
 from config.constants import EMBED_COLOR
 from utils.color import parse_hex_color
+from utils.embeds import success_embed
 from utils.errors import UserError
 from utils.permissions import require_permission
 
@@ -19,7 +19,7 @@ class Set(commands.GroupCog, group_name="set"):
     async def embed_color(self, interaction: discord.Interaction, hex_code: Optional[str] = None):
         await require_permission(interaction, "administrator")
         if not hex_code:
-            await set_embed_color(interaction.guild_id, None, interaction.user.id)
+            await self.bot.storage.set_embed_color(interaction.guild_id, None, interaction.user.id)
             embed = discord.Embed(description="Embed color has been reset to default.", color=discord.Color(EMBED_COLOR))
             await interaction.response.send_message(embed=embed)
             return
@@ -31,10 +31,26 @@ class Set(commands.GroupCog, group_name="set"):
 
         # Save to Database without the #
         clean_hex = f"{color.value:06X}"
-        await set_embed_color(interaction.guild_id, clean_hex, interaction.user.id)
+        await self.bot.storage.set_embed_color(interaction.guild_id, clean_hex, interaction.user.id)
 
         embed = discord.Embed(description=f"Embed color has been updated to `#{clean_hex}`.", color=color)
         await interaction.response.send_message(embed=embed)
 
+    @app_commands.command(name="caseretention", description="Set how long moderation cases stay active before being archived")
+    @app_commands.describe(days="Days to keep cases active (leave empty to never archive)")
+    async def case_retention(self, interaction: discord.Interaction, days: Optional[app_commands.Range[int, 1, 3650]] = None):
+        await require_permission(interaction, "administrator")
+        await self.bot.storage.set_case_retention(interaction.guild_id, days)
+
+        if days is None:
+            embed = success_embed("Moderation cases will no longer be archived.")
+        else:
+            embed = success_embed(
+                f"Moderation cases older than **{days}** day(s) will be archived. Archived cases still show in "
+                f"`/moderation history` and `/moderation case` with `include_archive`, but their warnings "
+                f"no longer count towards auto-escalation."
+            )
+        await interaction.response.send_message(embed=embed)
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(Set(bot))
\ No newline at end of file
@@ -3,7 +3,6 @@ from discord import app_commands
 from discord.ext import commands
 from typing import Optional
 
-from db.database import set_welcome_channel
 from config.constants import NEW_LOBBY_TRIGGER, VOICE_VQM, VOICE_REGION
 from utils.embeds import success_embed
 from utils.permissions import require_permission
@@ -42,11 +41,11 @@ class Setup(commands.GroupCog, group_name="setup"):
         await require_permission(interaction, "administrator")
 
         if channel is None:
-            await set_welcome_channel(interaction.guild_id, None)
+            await self.bot.storage.set_welcome_channel(interaction.guild_id, None)
             embed = success_embed("Welcome messages have been disabled.")
             await interaction.response.send_message(embed=embed, ephemeral=True)
         else:
-            await set_welcome_channel(interaction.guild_id, channel.id)
+            await self.bot.storage.set_welcome_channel(interaction.guild_id, channel.id)
             embed = success_embed(f"Welcome messages will now be sent in {channel.mention}.")
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 from utils.uptime import format_uptime
 
 class Stats(commands.Cog):
@@ -17,7 +16,7 @@ class Stats(commands.Cog):
         member_count = sum(g.member_count for g in self.bot.guilds if g.member_count)
         shard_count = self.bot.shard_count or 1
 
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
 
         embed = discord.Embed(
             title="Statistics",
@@ -27,7 +26,9 @@ class Stats(commands.Cog):
         embed.add_field(name="👥 Members", value=f"`{member_count}`", inline=True)
         channel_count = sum(len(guild.channels) for guild in self.bot.guilds)
         embed.add_field(name="💬 Channels", value=f"`{channel_count}`", inline=True)
-        latency = round(self.bot.latency * 1000)
+        # The shard serving this guild, not the average over all of them.
+        shard = self.bot.get_shard(interaction.guild.shard_id) if interaction.guild else None
+        latency = round((shard.latency if shard else self.bot.latency) * 1000)
         embed.add_field(name="💠 Shards", value=f"`{shard_count}`", inline=True)
         embed.add_field(name="📶 Latency", value=f"`{latency}ms`", inline=True)
         embed.add_field(name="⏱️ Uptime", value=f"`{uptime_str}`", inline=True)
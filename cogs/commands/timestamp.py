@@ -3,7 +3,6 @@ from discord import app_commands
 from discord.ext import commands
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo, available_timezones
-from db.database import get_guild_embed_color
 from utils.errors import UserError
 
 ALL_TIMEZONES = sorted(available_timezones())
@@ -40,7 +39,7 @@ class Timestamp(commands.GroupCog, group_name="timestamp"):
 
     async def _reply_with_tag(self, interaction: discord.Interaction, epoch: int, style: str):
         tag = f"<t:{epoch}:{style}>"
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
         await interaction.response.send_message(view=TimestampResultView(tag, color))
 
     async def _timezone_autocomplete(self, interaction: discord.Interaction, current: str):
@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db.database import get_guild_embed_color
 from utils.errors import UserError
 
 class UserInfo(commands.Cog):
@@ -49,7 +48,7 @@ class UserInfo(commands.Cog):
         if is_member and target.joined_at:
             fields.append(("Joined Server", target.joined_at.strftime('%Y-%m-%d %H:%M:%S'), False))
 
-        color = await get_guild_embed_color(interaction.guild_id)
+        color = await self.bot.storage.get_guild_embed_color(interaction.guild_id)
 
         embed = discord.Embed(
             title="User Info",
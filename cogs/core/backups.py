@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+import time
+
+from discord.ext import commands, tasks
+
+from db.backup import BACKUP_DIR, BackupProgress, backup_databases, latest_backup_at, rotate_backups
+from db.database import database_files
+
+logger = logging.getLogger("backups")
+
+
+class Backups(commands.Cog):
+    """Takes online backups of database.db and archive.db (every shard's pair, if
+    sharded) on a schedule, and on demand through start_backup() (ç!backup and the
+    dashboard's Back up button). Only one backup runs at a time; asking for another while one is running hands
+    back the running one's progress instead."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.directory = os.getenv("DB_BACKUP_DIR") or BACKUP_DIR
+        # Hours between scheduled backups; 0 leaves only the manual triggers.
+        self.interval_hours = float(os.getenv("DB_BACKUP_INTERVAL_HOURS") or 24)
+        self.keep = max(1, int(os.getenv("DB_BACKUP_KEEP") or 7))
+        self.compress = os.getenv("DB_BACKUP_COMPRESS", "true").lower() != "false"
+        # The running backup, or the last one to finish since this cog loaded.
+        self.progress: BackupProgress | None = None
+        self._task: asyncio.Task | None = None
+
+    async def cog_load(self):
+        # One scheduled backup for a whole cluster, taken by its first member.
+        if self.interval_hours > 0 and self.bot.cluster_member == 0 and not self.backup_schedule.is_running():
+            self.backup_schedule.start()
+
+    def cog_unload(self):
+        # A backup already copying finishes in its thread regardless; its files are
+        # only renamed into place once complete, so nothing half-written is left.
+        self.backup_schedule.cancel()
+
+    def start_backup(self, trigger: str) -> BackupProgress:
+        if self.progress is not None and self.progress.running:
+            return self.progress
+        self.progress = BackupProgress(trigger=trigger, compress=self.compress)
+        self._task = asyncio.create_task(self._run(self.progress))
+        return self.progress
+
+    async def wait(self, progress: BackupProgress):
+        """Waits for the given backup (as returned by start_backup) to finish."""
+        while progress.running:
+            await asyncio.sleep(0.5)
+
+    async def _run(self, progress: BackupProgress):
+        try:
+            await asyncio.to_thread(backup_databases, database_files(), self.directory, progress)
+            removed = await asyncio.to_thread(rotate_backups, self.directory, self.keep)
+        except Exception as e:
+            progress.stage = "failed"
+            progress.error = str(e)
+            logger.exception(f"Backup ({progress.trigger}) failed")
+        else:
+            progress.stage = "done"
+            logger.info(
+                f"Backup ({progress.trigger}) wrote {', '.join(progress.files)} "
+                f"({progress.size / 1024 / 1024:.1f} MiB) in {time.time() - progress.started_at:.1f}s"
+                + (f", rotated out {removed} old backup(s)" if removed else "")
+            )
+        finally:
+            progress.finished_at = time.time()
+
+    # Checks often and only backs up once the newest backup on disk is old enough,
+    # so restarts neither skip a backup nor take an extra one. Needs no guild cache,
+    # and the database files exist before cogs load, so it can tick straight away.
+    @tasks.loop(minutes=15)
+    async def backup_schedule(self):
+        latest = await asyncio.to_thread(latest_backup_at, self.directory)
+        if latest is None or time.time() - latest >= self.interval_hours * 3600:
+            await self.wait(self.start_backup("scheduled"))
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Backups(bot))
@@ -1,43 +1,106 @@
+import dataclasses
+import logging
+from datetime import datetime
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+
+logger = logging.getLogger("command_logger")
+
+# Uses are collected and queued together this often, each due at the end of the
+# same window, so the outbox combines a burst of commands into a few log messages
+# per channel (see outbox._coalesce) instead of one send each.
+FLUSH_SECONDS = 2
+OPTIONS_LENGTH = 1000
+# Uses held between flushes at most; beyond this (the database stalled), new ones are dropped.
+MAX_PENDING = 5000
+
+
+@dataclasses.dataclass(slots=True)
+class CommandUse:
+    guild_id: int
+    command: str
+    user_id: int
+    channel_id: int
+    options: str | None
+    used_at: datetime
 
-from db.database import get_commands_log_channel, get_guild_embed_color
 
 class CommandLogger(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.bot.tree.interaction_check = self.log_interaction
+        self._pending: list[CommandUse] = []
+        self._dropped = 0
+
+    async def cog_load(self):
+        if not self.flush_uses.is_running():
+            self.flush_uses.start()
+
+    async def cog_unload(self):
+        # Awaited by unload_extension, so whatever's pending is queued before the database closes.
+        self.flush_uses.cancel()
+        await self.flush()
 
     async def log_interaction(self, interaction: discord.Interaction) -> bool:
+        # Runs before every slash command, so it only notes the use: the log channel
+        # lookup and the send happen in flush(), off the command's path.
         if interaction.command is None or interaction.guild is None:
             return True
-
-        log_channel_id = await get_commands_log_channel(interaction.guild_id)
-        if not log_channel_id:
-            return True
-
-        log_channel = interaction.guild.get_channel(log_channel_id)
-        if log_channel is None:
+        if len(self._pending) >= MAX_PENDING:
+            self._dropped += 1
             return True
 
         options = interaction.namespace.__dict__
         options_str = ", ".join(f"{option_name}: {option_value}" for option_name, option_value in options.items()) if options else None
+        self._pending.append(CommandUse(
+            guild_id=interaction.guild_id,
+            command=interaction.command.qualified_name,
+            user_id=interaction.user.id,
+            channel_id=interaction.channel_id,
+            options=options_str,
+            used_at=discord.utils.utcnow(),
+        ))
+        return True
+
+    @tasks.loop(seconds=FLUSH_SECONDS)
+    async def flush_uses(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Command log flush failed")
 
-        description = f"**/{interaction.command.qualified_name}** used by {interaction.user.mention} in {interaction.channel.mention}"
-        if options_str:
-            description += f"\n{options_str}"
+    async def flush(self):
+        uses, self._pending = self._pending, []
+        if self._dropped:
+            logger.warning(f"Dropped {self._dropped} command log entries, too many were pending")
+            self._dropped = 0
 
-        color = await get_guild_embed_color(interaction.guild_id)
-        embed = discord.Embed(description=description, color=color)
-        embed.timestamp = discord.utils.utcnow()
-        embed.set_footer(text=f"User ID: {interaction.user.id}")
+        by_guild: dict[int, list[CommandUse]] = {}
+        for use in uses:
+            by_guild.setdefault(use.guild_id, []).append(use)
 
-        try:
-            await log_channel.send(embed=embed)
-        except (discord.Forbidden, discord.HTTPException):
-            pass
+        for guild_id, guild_uses in by_guild.items():
+            config = await self.bot.storage.get_guild_config(guild_id)
+            guild = self.bot.get_guild(guild_id)
+            if not config.commands_log_channel_id or guild is None or guild.get_channel(config.commands_log_channel_id) is None:
+                continue
+            for use in guild_uses:
+                await self.bot.storage.outbox_enqueue(
+                    guild_id, config.commands_log_channel_id, "command_log",
+                    {"embeds": [self._embed(use, config.color).to_dict()]}, batch_window=FLUSH_SECONDS
+                )
 
-        return True
+    @staticmethod
+    def _embed(use: CommandUse, color: discord.Color) -> discord.Embed:
+        description = f"**/{use.command}** used by <@{use.user_id}> in <#{use.channel_id}>"
+        if use.options:
+            options = use.options if len(use.options) <= OPTIONS_LENGTH else use.options[:OPTIONS_LENGTH - 1] + "…"
+            description += f"\n{options}"
+
+        embed = discord.Embed(description=description, color=color, timestamp=use.used_at)
+        embed.set_footer(text=f"User ID: {use.user_id}")
+        return embed
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(CommandLogger(bot))
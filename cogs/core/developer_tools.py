@@ -5,12 +5,14 @@ import aiohttp
 import discord
 from discord.ext import commands
 import os
-from db.database import get_guild_embed_color, reset_case_counter
+from db.database import check_warning_counts, export_guild_file, import_guild, rebuild_warning_counts
 from utils.cogs import reload_shared_modules
 from utils.embeds import error_embed, success_embed
 
 logger = logging.getLogger("dev")
 WEB_DASHBOARD = "http://127.0.0.1:8000"
+# Seconds between edits of ç!backup's progress message, well inside Discord's edit rate limit.
+BACKUP_PROGRESS_INTERVAL = 2
 
 class DeveloperTools(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -212,7 +214,7 @@ class DeveloperTools(commands.Cog):
         Usage: ç!devtools
         """
         guild_id = ctx.guild.id if ctx.guild else None
-        color = await get_guild_embed_color(guild_id)
+        color = await self.bot.storage.get_guild_embed_color(guild_id)
 
         lines = [
             "# Developer Tools",
@@ -267,11 +269,135 @@ class DeveloperTools(commands.Cog):
             await ctx.reply(embed=embed)
             return
 
-        await reset_case_counter(target_guild_id)
+        await self.bot.storage.reset_case_counter(target_guild_id)
         embed = success_embed(f"Wiped case history and reset the case counter for guild `{target_guild_id}`.")
         await ctx.reply(embed=embed)
         logger.info(f"Reset case counter for guild {target_guild_id}.")
 
+    @commands.command(name="warncounts", hidden=True)
+    async def warncounts(self, ctx: commands.Context, action: str = "check"):
+        """
+        Checks the per-member warning counters against the warnings table, or rebuilds them
+        Usage: ç!warncounts [check | rebuild]
+        """
+        if action == "rebuild":
+            members = await rebuild_warning_counts()
+            embed = success_embed(f"Rebuilt warning counters for `{members}` member(s).")
+            await ctx.reply(embed=embed)
+            logger.info(f"Rebuilt warning counters for {members} member(s).")
+            return
+
+        mismatched = await check_warning_counts()
+        if not mismatched:
+            embed = success_embed("Warning counters match the warnings table.")
+            await ctx.reply(embed=embed)
+            return
+
+        lines = [f"`{guild_id}` <@{target_id}>: stored {stored or 0}, actual {actual}" for guild_id, target_id, actual, stored in mismatched[:20]]
+        if len(mismatched) > 20:
+            lines.append(f"...and {len(mismatched) - 20} more")
+        embed = error_embed(f"{len(mismatched)} warning counter(s) out of step. Run `ç!warncounts rebuild` to fix:\n" + "\n".join(lines))
+        await ctx.reply(embed=embed)
+
+    @commands.command(name="export", hidden=True)
+    async def export(self, ctx: commands.Context, guild_id: int = None):
+        """
+        Exports a guild's moderation cases, warnings, temp bans and autoroles as a gzipped NDJSON file
+        Usage: ç!export [guild_id]
+        """
+        target_guild_id = guild_id or (ctx.guild.id if ctx.guild else None)
+        if target_guild_id is None:
+            embed = error_embed("No guild specified and this wasn't run in a guild.")
+            await ctx.reply(embed=embed)
+            return
+
+        limit = ctx.guild.filesize_limit if ctx.guild else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+        async with export_guild_file(target_guild_id, compress=True) as (f, size):
+            if size > limit:
+                embed = error_embed(
+                    f"The export is {size / 1024 / 1024:.1f} MiB, over the {limit / 1024 / 1024:.0f} MiB upload limit here. "
+                    f"Download it from the web dashboard instead."
+                )
+                await ctx.reply(embed=embed)
+                return
+
+            filename = f"guild-{target_guild_id}-{discord.utils.utcnow():%Y%m%d-%H%M%S}.ndjson.gz"
+            embed = success_embed(f"Exported guild `{target_guild_id}` ({size / 1024:.1f} KiB).")
+            await ctx.reply(embed=embed, file=discord.File(f, filename=filename))
+        logger.info(f"Exported guild {target_guild_id} ({size} bytes).")
+
+    @commands.command(name="import", hidden=True)
+    async def import_(self, ctx: commands.Context, guild_id: int = None):
+        """
+        Imports an attached export file into a guild, keeping any rows that already exist
+        Usage: ç!import [guild_id] (with the .ndjson or .ndjson.gz file attached)
+        """
+        target_guild_id = guild_id or (ctx.guild.id if ctx.guild else None)
+        if target_guild_id is None:
+            embed = error_embed("No guild specified and this wasn't run in a guild.")
+            await ctx.reply(embed=embed)
+            return
+        if not ctx.message.attachments:
+            embed = error_embed("Attach the export file to the command message.")
+            await ctx.reply(embed=embed)
+            return
+
+        # Streamed from the CDN straight into the import, never read into memory whole.
+        attachment = ctx.message.attachments[0]
+        try:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(attachment.url) as resp:
+                    resp.raise_for_status()
+                    counts = await import_guild(target_guild_id, resp.content.iter_chunked(64 * 1024))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            embed = error_embed(f"Failed to download the attachment: {e}")
+            await ctx.reply(embed=embed)
+            return
+        except ValueError as e:
+            embed = error_embed(f"Import stopped: {e}. Chunks before that point were kept.")
+            await ctx.reply(embed=embed)
+            return
+
+        summary = ", ".join(f"{count} {table}" for table, count in counts.items())
+        embed = success_embed(f"Imported into guild `{target_guild_id}`: {summary}.")
+        await ctx.reply(embed=embed)
+
+    @commands.command(name="backup", hidden=True)
+    async def backup(self, ctx: commands.Context):
+        """
+        Takes an online backup of the database right away, reporting progress as it goes
+        Usage: ç!backup
+        """
+        backups = self.bot.get_cog("Backups")
+        if backups is None:
+            embed = error_embed("The backups cog isn't loaded.")
+            await ctx.reply(embed=embed)
+            return
+
+        color = await self.bot.storage.get_guild_embed_color(ctx.guild.id if ctx.guild else None)
+        progress = backups.start_backup(f"ç!backup by {ctx.author}")
+        message = await ctx.reply(embed=self._backup_embed(progress, color))
+        # running is read before each edit, so the last edit always shows the outcome.
+        running = progress.running
+        while running:
+            await asyncio.sleep(BACKUP_PROGRESS_INTERVAL)
+            running = progress.running
+            try:
+                await message.edit(embed=self._backup_embed(progress, color))
+            except discord.HTTPException:
+                pass
+
+    @staticmethod
+    def _backup_embed(progress, color) -> discord.Embed:
+        if progress.error:
+            return error_embed(f"Backup failed: {progress.error}")
+        if not progress.running:
+            files = ", ".join(f"`{name}`" for name in progress.files)
+            return success_embed(f"Backed up to {files} ({progress.size / 1024 / 1024:.1f} MiB).")
+        detail = f" `{progress.current}`" if progress.current else ""
+        return discord.Embed(description=f"Backup {progress.stage}{detail}: {progress.percent}%", color=color)
+
     @commands.command(name="reloadweb", hidden=True)
     async def reloadweb(self, ctx: commands.Context):
         """
@@ -2,14 +2,16 @@ import discord
 from discord.ext import commands, tasks
 from typing import Optional
 
-from db.database import lobby_add, lobby_delete, lobbies_all, lobby_is_tracked
 from config.constants import NEW_LOBBY_TRIGGER, LOBBY_NAME, LOBBY_EMOJI, VOICE_VQM, VOICE_REGION
+from utils.rest import BACKGROUND, lane, set_lane
+from utils.shards import owns_guild
 
 class LobbyManager(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     async def cog_load(self):
+        await self.bot.storage.load_lobbies()
         if not self.cleanup_lobbies.is_running():
             self.cleanup_lobbies.start()
 
@@ -25,13 +27,15 @@ class LobbyManager(commands.Cog):
         # Check if a user left a voice channel
         if before.channel and (not after.channel or before.channel.id != after.channel.id):
             if len(before.channel.members) == 0:
-                if await lobby_is_tracked(before.channel.id):
+                if self.bot.storage.lobby_is_tracked(before.channel.id):
                     try:
-                        await before.channel.delete(reason="Empty user lobby")
+                        # Nobody is waiting on the delete, unlike the create and move below.
+                        with lane(BACKGROUND):
+                            await before.channel.delete(reason="Empty user lobby")
                     except (discord.NotFound, discord.HTTPException):
                         pass
                     finally:
-                        await lobby_delete(before.channel.id)
+                        await self.bot.storage.lobby_delete(before.channel.id)
 
         # When a user joins the trigger channel, create a new lobby and move them.
         if after and after.channel and isinstance(after.channel, discord.VoiceChannel):
@@ -45,7 +49,7 @@ class LobbyManager(commands.Cog):
                     video_quality_mode=discord.VideoQualityMode(VOICE_VQM),
                     rtc_region=VOICE_REGION,
                 )
-                await lobby_add(member.guild.id, new_ch.id)
+                await self.bot.storage.lobby_add(member.guild.id, new_ch.id)
 
                 try:
                     await member.move_to(new_ch, reason="Auto-created user lobby")
@@ -63,22 +67,26 @@ class LobbyManager(commands.Cog):
         if not self.bot.is_ready():
             return
 
-        for guild_id, channel_id in await lobbies_all():
+        set_lane(BACKGROUND)
+        for guild_id, channel_id in self.bot.storage.tracked_lobbies():
+            # Another cluster member's guild isn't in this cache; not finding it here doesn't mean it's gone.
+            if not owns_guild(self.bot, guild_id):
+                continue
             guild = self.bot.get_guild(guild_id)
             if not guild:
-                await lobby_delete(channel_id)
+                await self.bot.storage.lobby_delete(channel_id)
                 continue
 
             ch = guild.get_channel(channel_id)
             if not isinstance(ch, discord.VoiceChannel):
-                await lobby_delete(channel_id)
+                await self.bot.storage.lobby_delete(channel_id)
                 continue
 
             if len(ch.members) == 0:
                 try:
                     await ch.delete(reason="Empty user lobby (periodic cleanup)")
                 finally:
-                    await lobby_delete(channel_id)
+                    await self.bot.storage.lobby_delete(channel_id)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(LobbyManager(bot))
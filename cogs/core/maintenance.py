@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+
+from discord.ext import commands, tasks
+
+from db.database import (
+    archive_old_cases, freelist_pages, guilds_with_retention, incremental_vacuum, last_write_at, poll_changes,
+    prune_change_log, shard_count,
+)
+
+logger = logging.getLogger("maintenance")
+
+# Free pages are only given back once the database has seen no writes from anything
+# else for this long, and the pass stops as soon as another write shows up.
+QUIET_SECONDS = 30
+# Not worth a pass for less than this many free pages (4 MiB at the default page size).
+VACUUM_MIN_FREE_PAGES = 1024
+VACUUM_STEP_PAGES = 256
+# Pauses between batches, so archiving and vacuuming trickle along behind normal
+# traffic instead of queueing up the writer.
+ARCHIVE_BATCH_PAUSE = 0.5
+VACUUM_STEP_PAUSE = 0.1
+# How often to check for settings changed by another process (web tooling, scripts,
+# another bot process); the most a cached guild config can lag behind them.
+CHANGE_POLL_SECONDS = 1
+
+
+class Maintenance(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        # last_write_at() as of this cog's own latest write, so its own archive
+        # batches and vacuum steps don't count as the database being busy.
+        self._own_write_at = 0.0
+
+    async def cog_load(self):
+        # The database is shared across a cluster, so only its first member archives,
+        # vacuums and prunes; every member still watches for changes to its caches.
+        if self.bot.cluster_member == 0 and not self.maintenance.is_running():
+            self.maintenance.start()
+        if not self.watch_changes.is_running():
+            self.watch_changes.start()
+
+    def cog_unload(self):
+        self.maintenance.cancel()
+        self.watch_changes.cancel()
+
+    def _is_quiet(self) -> bool:
+        last = last_write_at()
+        return last == self._own_write_at or time.monotonic() - last >= QUIET_SECONDS
+
+    @tasks.loop(minutes=10)
+    async def maintenance(self):
+        # Isolated per step, so a failing archive pass doesn't also skip the vacuum.
+        try:
+            await self.archive_expired_cases()
+        except Exception:
+            logger.exception("Case archiving pass failed")
+        try:
+            await self.reclaim_free_pages()
+        except Exception:
+            logger.exception("Incremental vacuum pass failed")
+        try:
+            await prune_change_log()
+        except Exception:
+            logger.exception("Change log pruning failed")
+
+    @tasks.loop(seconds=CHANGE_POLL_SECONDS)
+    async def watch_changes(self):
+        try:
+            await poll_changes()
+        except Exception:
+            logger.exception("Polling for changes from other processes failed")
+
+    async def archive_expired_cases(self):
+        now = time.time()
+        for guild_id, days in await guilds_with_retention():
+            cutoff = int(now - days * 86400)
+            moved = 0
+            while batch := await archive_old_cases(guild_id, cutoff):
+                self._own_write_at = last_write_at()
+                moved += batch
+                await asyncio.sleep(ARCHIVE_BATCH_PAUSE)
+            if moved:
+                logger.info(f"Archived {moved} case(s) older than {days} day(s) from guild {guild_id}")
+
+    async def reclaim_free_pages(self):
+        for shard in range(shard_count()):
+            free = await freelist_pages(shard)
+            if free < VACUUM_MIN_FREE_PAGES:
+                continue
+
+            reclaimed = 0
+            while free > 0 and self._is_quiet():
+                await incremental_vacuum(shard, VACUUM_STEP_PAGES)
+                self._own_write_at = last_write_at()
+                reclaimed += min(free, VACUUM_STEP_PAGES)
+                free -= VACUUM_STEP_PAGES
+                await asyncio.sleep(VACUUM_STEP_PAUSE)
+
+            if reclaimed:
+                where = f" from shard {shard}" if shard_count() > 1 else ""
+                logger.info(f"Reclaimed {reclaimed} free page(s){where}, {max(free, 0)} left")
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Maintenance(bot))
@@ -0,0 +1,187 @@
+import asyncio
+import io
+import logging
+import random
+import time
+
+import discord
+from discord.ext import commands
+
+from utils.rest import BACKGROUND, set_lane
+from utils.webhooks import LogWebhooks
+
+logger = logging.getLogger("outbox")
+
+# Channels sent to at once. Each channel's own messages go out one at a time, in
+# the order they were queued, so a mod log never shows case #12 above case #11.
+OUTBOX_CONCURRENCY = 5
+OUTBOX_BATCH = 50
+# A message still failing after this many attempts is dropped (and logged).
+OUTBOX_MAX_ATTEMPTS = 8
+# Retry backoff doubles per attempt from the base, up to the cap, with jitter so a
+# burst of failures doesn't retry in lockstep.
+OUTBOX_BACKOFF_BASE = 5
+OUTBOX_BACKOFF_MAX = 15 * 60
+# Consecutive embed-only messages to one channel are combined into a single send
+# within Discord's limits: 10 embeds and 6000 characters across them.
+EMBEDS_PER_MESSAGE = 10
+MESSAGE_TEXT_LIMIT = 6000
+# Kinds sent through the guild's managed webhook when the bot may manage webhooks there.
+WEBHOOK_KINDS = {"mod_log"}
+# Longest sleep between checks, so retries and messages queued by another process
+# are picked up even without a wakeup.
+OUTBOX_POLL_SECONDS = 5
+
+
+class Undeliverable(Exception):
+    """The message can never be sent (the channel is gone, or the bot left the guild)."""
+
+
+def _is_permanent(error: Exception) -> bool:
+    # 4xx other than rate limits won't change on retry: missing permissions, a
+    # deleted channel, or a payload Discord rejects.
+    if isinstance(error, discord.HTTPException):
+        return 400 <= error.status < 500 and error.status != 429
+    return isinstance(error, Undeliverable)
+
+
+def _coalesce(rows: list) -> list[list]:
+    """Groups a channel's claimed rows, in order, into sends: runs of the same kind
+    without attachments share one as long as it stays within Discord's limits."""
+    sends: list[list] = []
+    embeds = size = 0
+    for row in rows:
+        payload = row[4]
+        row_embeds = payload.get("embeds", ())
+        row_size = sum(len(discord.Embed.from_dict(embed)) for embed in row_embeds)
+        previous = sends[-1][-1] if sends else None
+        if (
+            previous is None or previous[3] != row[3] or previous[4].get("attachments") or payload.get("attachments")
+            or embeds + len(row_embeds) > EMBEDS_PER_MESSAGE or size + row_size > MESSAGE_TEXT_LIMIT
+        ):
+            sends.append([])
+            embeds = size = 0
+        sends[-1].append(row)
+        embeds += len(row_embeds)
+        size += row_size
+    return sends
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class Outbox(commands.Cog):
+    """Sends the messages producers queue with storage.outbox_enqueue() (mod logs,
+    command logs, welcomes), so they neither wait on Discord nor lose a message to
+    a failed send or a restart. Delivery is at least once: a message sent just
+    before a crash, but not yet marked done, goes out again after the restart."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.webhooks = LogWebhooks(bot)
+
+    async def cog_load(self):
+        self.dispatch_task = asyncio.create_task(self.run_dispatcher())
+
+    def cog_unload(self):
+        # Claimed messages still being sent are picked up again once their lease runs out.
+        self.dispatch_task.cancel()
+
+    async def run_dispatcher(self):
+        # Channels are looked up in the cache, so wait for it to be populated. Polls
+        # is_ready() since wait_until_ready() raises this early in the first cog_load.
+        while not self.bot.is_ready():
+            await asyncio.sleep(1)
+
+        # Log delivery yields to commands and moderation; the sends below inherit the lane.
+        set_lane(BACKGROUND)
+        semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+        while True:
+            # Isolated per pass, so one failure doesn't end the task and with it every future send.
+            try:
+                rows = await self.bot.storage.outbox_claim(OUTBOX_BATCH)
+                if rows:
+                    by_channel: dict[int, list] = {}
+                    for row in rows:
+                        by_channel.setdefault(row[2], []).append(row)
+                    await asyncio.gather(*(self._deliver(semaphore, channel_rows) for channel_rows in by_channel.values()))
+                    continue
+
+                next_at = await self.bot.storage.next_outbox_at()
+                timeout = OUTBOX_POLL_SECONDS if next_at is None else min(OUTBOX_POLL_SECONDS, max(0.0, next_at - time.time()))
+                await self.bot.storage.wait_for_outbox(timeout)
+            except Exception:
+                logger.exception("Outbox dispatcher pass failed")
+                await asyncio.sleep(5)
+
+    async def _deliver(self, semaphore: asyncio.Semaphore, rows: list):
+        """Sends one channel's claimed messages in order, combined where possible. On
+        a failure worth retrying, the rest of them wait out the same backoff, so
+        they still go out in order."""
+        async with semaphore:
+            sends = _coalesce(rows)
+            for index, batch in enumerate(sends):
+                try:
+                    await self._send(batch)
+                except Exception as e:
+                    _, guild_id, channel_id, kind, _, _ = batch[0]
+                    attempts = max(row[5] for row in batch)
+                    if _is_permanent(e) or attempts >= OUTBOX_MAX_ATTEMPTS:
+                        logger.warning(f"Dropped {len(batch)} {kind} message(s) for channel {channel_id} after {attempts} attempt(s): {e}")
+                        for row in batch:
+                            await self.bot.storage.outbox_done(row[1], row[0])
+                        continue
+                    delay = _backoff(attempts)
+                    for later in (row for later_batch in sends[index:] for row in later_batch):
+                        await self.bot.storage.outbox_retry(later[1], later[0], delay, str(e) or type(e).__name__)
+                    return
+                for row in batch:
+                    await self.bot.storage.outbox_done(row[1], row[0])
+
+    async def _send(self, batch: list):
+        _, guild_id, channel_id, kind, payload, _ = batch[0]
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            raise Undeliverable("channel not found")
+
+        kwargs = {"embeds": [discord.Embed.from_dict(embed) for row in batch for embed in row[4].get("embeds", ())]}
+        if payload.get("attachments"):
+            # Fetched now rather than stored, so a queued welcome is a URL, not a megabyte of avatar.
+            kwargs["files"] = []
+            for attachment in payload["attachments"]:
+                data = await self._fetch_attachment(attachment)
+                if data is not None:
+                    kwargs["files"].append(discord.File(io.BytesIO(data), filename=attachment["filename"]))
+
+        if kind in WEBHOOK_KINDS:
+            webhook = await self.webhooks.get(channel)
+            if webhook is not None:
+                try:
+                    # Webhook executes bypass the bot's HTTP client, so they take their turn here.
+                    await self.bot.rest.acquire(BACKGROUND, f"webhook:{webhook.id}")
+                    await webhook.send(username=self.bot.user.name, avatar_url=self.bot.user.display_avatar.url, **kwargs)
+                    return
+                except discord.NotFound:
+                    # Deleted from the channel settings; this one goes out directly, the next makes a new webhook.
+                    self.webhooks.forget(guild_id)
+        await channel.send(**kwargs)
+
+    async def _fetch_attachment(self, attachment: dict) -> bytes | None:
+        """An attachment's bytes from the CDN. A URL gone stale since the message was
+        queued (a changed avatar, a member who left) falls back to its fallback_url,
+        then to None, so the message goes out without that file rather than not at all."""
+        for url in (attachment["url"], attachment.get("fallback_url")):
+            if url is None:
+                continue
+            try:
+                return await self.bot.http.get_from_cdn(url)
+            except discord.HTTPException as e:
+                if not _is_permanent(e):
+                    raise
+                logger.info(f"Attachment {attachment['filename']} unavailable at {url} ({e.status})")
+        return None
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Outbox(bot))
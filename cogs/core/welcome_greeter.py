@@ -1,9 +1,6 @@
-import io
 import discord
 from discord.ext import commands
 
-from db.database import get_welcome_channel, get_guild_embed_color
-
 class WelcomeGreeter(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
@@ -15,7 +12,7 @@ class WelcomeGreeter(commands.Cog):
         await self._send_welcome(member)
 
     async def _send_welcome(self, member: discord.Member):
-        channel_id = await get_welcome_channel(member.guild.id)
+        channel_id = await self.bot.storage.get_welcome_channel(member.guild.id)
         if not channel_id:
             return
 
@@ -23,7 +20,7 @@ class WelcomeGreeter(commands.Cog):
         if not channel:
             return
 
-        color = await get_guild_embed_color(member.guild.id)
+        color = await self.bot.storage.get_guild_embed_color(member.guild.id)
 
         description = (
             f"Welcome to {member.guild.name} {member.mention}!\n\n"
@@ -38,21 +35,15 @@ class WelcomeGreeter(commands.Cog):
         embed.set_author(name=member.name, icon_url=f"attachment://{author_icon_name}")
         embed.set_thumbnail(url=f"attachment://{thumbnail_name}")
 
-        try:
-            author_icon_bytes = await member.display_avatar.with_size(128).read()
-            thumbnail_bytes = await member.display_avatar.with_size(1024).read()
-        except discord.HTTPException:
-            return
-
-        files = [
-            discord.File(io.BytesIO(author_icon_bytes), filename=author_icon_name),
-            discord.File(io.BytesIO(thumbnail_bytes), filename=thumbnail_name),
+        # The avatars are fetched by the outbox when it sends, not stored with the message.
+        # Should the member change theirs or leave first, the default avatar stands in.
+        attachments = [
+            {"url": member.display_avatar.with_size(128).url, "fallback_url": member.default_avatar.url, "filename": author_icon_name},
+            {"url": member.display_avatar.with_size(1024).url, "fallback_url": member.default_avatar.url, "filename": thumbnail_name},
         ]
-
-        try:
-            await channel.send(embed=embed, files=files)
-        except (discord.Forbidden, discord.HTTPException):
-            pass
+        await self.bot.storage.outbox_enqueue(
+            member.guild.id, channel.id, "welcome", {"embeds": [embed.to_dict()], "attachments": attachments}
+        )
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(WelcomeGreeter(bot))
@@ -0,0 +1,176 @@
+import dataclasses
+import gzip
+import os
+import pathlib
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+BACKUP_DIR = os.path.join(os.path.dirname(__file__), "backups")
+# Pages copied per backup step (4 MiB at the default page size), with a short pause
+# after each so the copy trickles along instead of saturating the disk.
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_PAUSE = 0.01
+
+# <stamp>-<database>.db[.gz], one file per database per backup; files sharing a
+# stamp are one backup, and rotation keeps or drops them together.
+_BACKUP_NAME = re.compile(r"^(\d{8}-\d{6})-([\w-]+)\.db(?:\.gz)?$")
+_STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+
+@dataclasses.dataclass
+class BackupProgress:
+    """State of one backup run. Written by the backup thread, read by whatever
+    reports on it; every field is a plain value, so a read never sees a torn one."""
+
+    trigger: str
+    compress: bool
+    started_at: float = dataclasses.field(default_factory=time.time)
+    stage: str = "starting"  # starting, copying, compressing, done, failed
+    current: str | None = None
+    copied_pages: int = 0
+    total_pages: int = 0
+    files: list[str] = dataclasses.field(default_factory=list)
+    size: int = 0
+    finished_at: float | None = None
+    error: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    @property
+    def percent(self) -> int:
+        if self.stage == "done":
+            return 100
+        return self.copied_pages * 100 // self.total_pages if self.total_pages else 0
+
+    def to_dict(self) -> dict:
+        return {**dataclasses.asdict(self), "running": self.running, "percent": self.percent}
+
+
+def backup_databases(shards: list[tuple[str, str]], directory: str, progress: BackupProgress) -> list[str]:
+    """Copies every (database, archive) file pair in shards into directory with
+    SQLite's online backup API. Blocking, so run it in a thread.
+
+    Each pair is attached to one read-only connection that holds a single read
+    transaction for the whole copy. In WAL mode that never blocks the writer, and
+    since the snapshot stays pinned, commits landing mid-copy neither restart the
+    backup nor end up half in it: every pair matches the moment the copy began.
+    Shards never share a guild, so their snapshots needn't be the same moment."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime(_STAMP_FORMAT)
+
+    connections = []
+    try:
+        copies = []  # (connection, schema, source path)
+        for path, archive_path in shards:
+            src = _connect_ro(path)
+            connections.append(src)
+            src.execute("ATTACH DATABASE ? AS archive", (_ro_uri(archive_path),))
+            src.execute("BEGIN")
+            for schema, source in (("main", path), ("archive", archive_path)):
+                # A read from each schema is what actually starts (and pins) its snapshot.
+                src.execute(f"SELECT count(*) FROM {schema}.sqlite_schema").fetchone()
+                progress.total_pages += src.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+                copies.append((src, schema, source))
+        progress.stage = "copying"
+
+        written = []
+        for src, schema, source in copies:
+            name = pathlib.Path(source).stem
+            progress.current = name
+            written.append(_copy_schema(src, schema, os.path.join(directory, f"{stamp}-{name}.db"), progress))
+        for src in connections:
+            src.execute("ROLLBACK")
+    finally:
+        for src in connections:
+            src.close()
+
+    if progress.compress:
+        progress.stage = "compressing"
+        for i, path in enumerate(written):
+            progress.current = os.path.basename(path)
+            written[i] = _compress(path)
+
+    progress.files = [os.path.basename(path) for path in written]
+    progress.size = sum(os.path.getsize(path) for path in written)
+    return written
+
+
+def _ro_uri(path: str) -> str:
+    return f"{pathlib.Path(path).resolve().as_uri()}?mode=ro"
+
+
+def _connect_ro(path: str) -> sqlite3.Connection:
+    # isolation_level=None so the explicit BEGIN above is the only transaction.
+    return sqlite3.connect(_ro_uri(path), uri=True, isolation_level=None, check_same_thread=False)
+
+
+def _copy_schema(src: sqlite3.Connection, schema: str, path: str, progress: BackupProgress) -> str:
+    # Written under a temporary name and renamed once complete, so a crash mid-copy
+    # never leaves something in the backup directory that looks like a good backup.
+    partial = f"{path}.partial"
+    done_before = progress.copied_pages
+
+    def on_step(status, remaining, page_count):
+        progress.copied_pages = done_before + page_count - remaining
+        time.sleep(BACKUP_STEP_PAUSE)
+
+    dest = sqlite3.connect(partial)
+    try:
+        src.backup(dest, pages=BACKUP_STEP_PAGES, progress=on_step, name=schema)
+    finally:
+        dest.close()
+    os.replace(partial, path)
+    return path
+
+
+def _compress(path: str) -> str:
+    compressed = f"{path}.gz"
+    with open(path, "rb") as f, gzip.open(f"{compressed}.partial", "wb", compresslevel=6) as out:
+        shutil.copyfileobj(f, out, 1024 * 1024)
+    os.replace(f"{compressed}.partial", compressed)
+    os.remove(path)
+    return compressed
+
+
+def _backup_sets(directory: str) -> dict[str, list[str]]:
+    """Backup files in directory, grouped by stamp."""
+    sets: dict[str, list[str]] = {}
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        return sets
+    for filename in filenames:
+        match = _BACKUP_NAME.match(filename)
+        if match:
+            sets.setdefault(match.group(1), []).append(os.path.join(directory, filename))
+    return sets
+
+
+def latest_backup_at(directory: str) -> float | None:
+    """Unix time of the newest backup in directory, or None if there isn't one."""
+    stamps = _backup_sets(directory)
+    if not stamps:
+        return None
+    return datetime.strptime(max(stamps), _STAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+def rotate_backups(directory: str, keep: int) -> int:
+    """Deletes all but the newest keep backups, returning how many were removed.
+    Leftover .partial files from an interrupted run are cleared out too."""
+    if not os.path.isdir(directory):
+        return 0
+    for filename in os.listdir(directory):
+        if filename.endswith(".partial"):
+            os.remove(os.path.join(directory, filename))
+
+    sets = _backup_sets(directory)
+    stale = sorted(sets, reverse=True)[keep:]
+    for stamp in stale:
+        for path in sets[stamp]:
+            os.remove(path)
+    return len(stale)
@@ -1,319 +1,1541 @@
 import aiosqlite
+import asyncio
+import contextlib
+import dataclasses
 import discord
+import heapq
+import json
 import logging
+import math
 import os
+import pathlib
+import re
+import tempfile
 import time
+import zlib
+from collections import OrderedDict
+from collections.abc import AsyncIterable, AsyncIterator
 
 from config.constants import EMBED_COLOR
+from db.migrations import create_archive_schema, run_migrations
+from db.stats import QueryStats
 
 logger = logging.getLogger("db")
 
-# Global database connection
-db = None
+# Connection pools, one per shard (see shard_of): each a single writer plus its
+# read-only connections, see ConnectionPool. Just the one unless DB_SHARDS is set.
+pools: list["ConnectionPool"] = []
+# Per-query latency stats, keyed by helper name. Filled in by _read/_write/_transaction.
+query_stats: dict[str, QueryStats] = {}
+# Queries slower than this many milliseconds are logged with their parameters.
+# Set from DB_SLOW_QUERY_MS in initialize_databases(); 0 disables the log.
+slow_query_ms = 0.0
+
+# Module globals that hold live connections, tasks and caches rather than definitions.
+# utils.cogs.reload_shared_modules() carries these across a hot reload of this
+# module, since re-executing the file would otherwise reset them.
+RELOAD_PERSISTENT = (
+    "pools", "query_stats", "slow_query_ms", "temp_ban_schedule", "lobby_index",
+    "_guild_configs", "_guild_config_version", "outbox_ready", "_outbox_due_hint", "owned_shards",
+)
 
 DB_FILE = os.path.join(os.path.dirname(__file__), "database.db")
+# Cases past their guild's retention period move here (archive_old_cases), attached
+# to every connection as "archive", so the main file and its page cache stay small.
+ARCHIVE_FILE = os.path.join(os.path.dirname(__file__), "archive.db")
+# With DB_SHARDS above 1, guilds are spread over that many database-<n>.db and
+# archive-<n>.db pairs beside those two instead, each pair with its own writer, so
+# one guild's writes never queue behind another shard's. scripts/split_shards.py
+# moves an existing single-file database into them.
 
-async def initialize_databases():
-    global db
-    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
-    
-    db = await aiosqlite.connect(DB_FILE)
-    
-    # Create tables in the single database file
-    # user_roles predates autoroles and was never read anywhere; drop it if it's still around.
-    await db.execute("DROP TABLE IF EXISTS user_roles")
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS lobbies (
-            guild_id   INTEGER NOT NULL,
-            channel_id INTEGER PRIMARY KEY
-        )
-    """)
+# Connection tuning, applied to the writer and every reader. WAL lets readers run
+# alongside the writer instead of queueing behind it. synchronous=NORMAL is still
+# crash-safe in WAL mode and only fsyncs at checkpoints, not on every commit.
+READER_POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024
 
-    # Older databases still have this under its old name; rename before CREATE TABLE
-    # IF NOT EXISTS below runs, since ALTER TABLE RENAME fails if the target already exists.
-    try:
-        await db.execute("ALTER TABLE server_settings RENAME TO guild_data")
-    except aiosqlite.OperationalError:
-        pass
+# How long a claimed outbox message is left alone before it's sent again, should the
+# process sending it die first. A send normally finishes, or fails, well within it.
+OUTBOX_LEASE_SECONDS = 60
 
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS guild_data (
-            guild_id INTEGER PRIMARY KEY,
-            embed_color TEXT,
-            updated_by INTEGER,
-            welcome_channel_id INTEGER,
-            commands_log_channel_id INTEGER,
-            moderation_log_channel_id INTEGER,
-            case_counter INTEGER NOT NULL DEFAULT 0
-        )
-    """)
+# Case numbers are SQLite integers; this is the largest, used as the "from the newest" cursor.
+MAX_CASE_NUMBER = 2**63 - 1
 
-    # Older databases predate the commands/moderation log split and the case counter.
-    # log_channel_id becomes commands_log_channel_id; every ALTER is a no-op once applied.
-    try:
-        await db.execute("ALTER TABLE guild_data RENAME COLUMN log_channel_id TO commands_log_channel_id")
-    except aiosqlite.OperationalError:
-        pass
-    try:
-        await db.execute("ALTER TABLE guild_data ADD COLUMN commands_log_channel_id INTEGER")
-    except aiosqlite.OperationalError:
-        pass
-    try:
-        await db.execute("ALTER TABLE guild_data ADD COLUMN moderation_log_channel_id INTEGER")
-    except aiosqlite.OperationalError:
-        pass
-    try:
-        await db.execute("ALTER TABLE guild_data ADD COLUMN case_counter INTEGER NOT NULL DEFAULT 0")
-    except aiosqlite.OperationalError:
-        pass
+# Upper bound on cached GuildConfig snapshots. Least recently used guilds are
+# evicted past this, so memory stays flat no matter how many guilds the bot is in.
+GUILD_CONFIG_CACHE_SIZE = 1024
+# change_log rows kept per file; a process that falls further behind than this
+# drops its whole settings cache instead of just the changed guilds.
+CHANGE_LOG_KEEP = 10_000
+
+
+@dataclasses.dataclass(frozen=True)
+class GuildConfig:
+    """Snapshot of a guild's guild_data row plus its autoroles, as read in one query."""
+
+    guild_id: int | None
+    embed_color: str | None = None
+    welcome_channel_id: int | None = None
+    commands_log_channel_id: int | None = None
+    moderation_log_channel_id: int | None = None
+    case_retention_days: int | None = None
+    autoroles: tuple[int, ...] = ()
+
+    @property
+    def color(self) -> discord.Color:
+        if self.embed_color:
+            return discord.Color(int(self.embed_color, 16))
+        return discord.Color(EMBED_COLOR)
+
+
+@dataclasses.dataclass(frozen=True)
+class CaseRecord:
+    """What record_case() wrote, plus the settings needed to announce it."""
+
+    case_number: int
+    warning_count: int | None
+    log_channel_id: int | None
+    color: discord.Color
+
+
+# Per-guild export/import (export_guild/import_guild): the tables covered and their
+# columns, in file order. guild_id is left out of each row and taken from the
+# header on export and the caller on import, so a guild's data can be moved to another.
+GUILD_EXPORT_TABLES = {
+    "mod_cases": ("case_number", "action", "target_id", "moderator_id", "reason", "duration", "created_at"),
+    "warnings": ("case_number", "target_id", "moderator_id", "reason", "created_at"),
+    "temp_bans": ("user_id", "unban_at", "case_number"),
+    "autoroles": ("role_id",),
+}
+GUILD_EXPORT_FORMAT = "pedro-bot-guild"
+GUILD_EXPORT_VERSION = 1
+# Rows pulled from the cursor per fetchmany() on export, and rows inserted per
+# committed transaction on import. Memory use is bounded by these, not by guild size.
+EXPORT_FETCH_ROWS = 1000
+IMPORT_CHUNK_ROWS = 2000
+# An export is read into a temporary file, in memory up to this size and on disk
+# beyond it, then streamed from there in chunks of EXPORT_STREAM_BYTES.
+EXPORT_SPOOL_BYTES = 8 * 1024 * 1024
+EXPORT_STREAM_BYTES = 64 * 1024
+# Tables archive_old_cases() moves into archive.db. Exports read both copies;
+# imports write to the main file and let the next archive pass move them back.
+ARCHIVED_TABLES = ("mod_cases", "warnings")
+# Cases moved per archive_old_cases() transaction, small enough that the write
+# lock is never held long enough to delay a moderation command noticeably.
+ARCHIVE_BATCH_ROWS = 500
+
+
+# Writers run their statements right away but share one COMMIT (one fsync), issued
+# WRITE_BATCH_INTERVAL seconds after the first statement of a batch or as soon as
+# WRITE_BATCH_MAX_STATEMENTS have piled up, whichever comes first. A durable write
+# with no other write waiting behind it commits at once, since there's nobody to
+# share the commit with.
+WRITE_BATCH_INTERVAL = 0.05
+WRITE_BATCH_MAX_STATEMENTS = 200
+
+
+class WriteBatcher:
+    """Funnels every write from every coroutine into one shared transaction and
+    commits it as a group. Statements execute immediately, so reads on the same
+    connection see them straight away; only the commit is deferred. Callers that
+    must not reply before their write is on disk pass durable=True and wait for
+    their batch's commit."""
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self.conn = conn
+        # Held for each statement/unit of work, so a savepoint never has another
+        # coroutine's statement interleaved into it, and for the commit itself.
+        self.lock = asyncio.Lock()
+        # Writers waiting on the lock for execute()/transaction(), so a durable write
+        # can tell whether anyone could join its batch.
+        self._queued = 0
+        self._batch: asyncio.Future | None = None
+        self._pending = 0
+        # Scheduled flushes, referenced until done so they can't be garbage collected.
+        self._flushes: set[asyncio.Task] = set()
+        # time.monotonic() of the last write, so maintenance can tell when things are quiet.
+        self.last_write = 0.0
+
+    async def execute(self, sql: str, params=(), *, durable: bool = False) -> list:
+        """Runs a single write statement, returning any RETURNING rows."""
+        async with self._locked():
+            await self._begin()
+            try:
+                async with self.conn.execute(sql, params) as cursor:
+                    rows = await cursor.fetchall()
+            except BaseException:
+                if self._batch is None and self.conn.in_transaction:
+                    # This statement opened the transaction and nothing else is in it,
+                    # so don't leave it (and the file's write lock) open.
+                    await self.conn.execute("ROLLBACK")
+                raise
+            batch = self._add_to_batch()
+            await self._commit_if_alone(durable)
+        if durable:
+            await asyncio.shield(batch)
+        return rows
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, *, durable: bool = False):
+        """Runs several statements as one atomic unit inside the current batch.
+        Rolled back to its savepoint on error without disturbing the rest of the batch."""
+        async with self._locked():
+            await self._begin()
+            await self.conn.execute("SAVEPOINT unit_of_work")
+            try:
+                yield self.conn
+            except BaseException:
+                await self.conn.execute("ROLLBACK TO unit_of_work")
+                await self.conn.execute("RELEASE unit_of_work")
+                if self._batch is None:
+                    # Nothing else is waiting on this transaction, so don't leave it open.
+                    await self.conn.execute("ROLLBACK")
+                raise
+            await self.conn.execute("RELEASE unit_of_work")
+            batch = self._add_to_batch()
+            await self._commit_if_alone(durable)
+        if durable:
+            await asyncio.shield(batch)
+
+    @contextlib.asynccontextmanager
+    async def _locked(self):
+        self._queued += 1
+        try:
+            await self.lock.acquire()
+        finally:
+            self._queued -= 1
+        try:
+            yield
+        finally:
+            self.lock.release()
+
+    async def _commit_if_alone(self, durable: bool):
+        # Waiting out the interval only pays off when other writes can join the batch.
+        if durable and not self._queued:
+            await self._commit()
+
+    async def _begin(self):
+        if not self.conn.in_transaction:
+            # IMMEDIATE takes the write lock up front, waiting out busy_timeout if
+            # another process (a cluster member on the same files) holds it. A deferred
+            # BEGIN would only take it at the first write, and if that follows a read
+            # another process has committed since, SQLite fails it at once with
+            # SQLITE_BUSY_SNAPSHOT instead of waiting.
+            await self.conn.execute("BEGIN IMMEDIATE")
+
+    def _add_to_batch(self) -> asyncio.Future:
+        self.last_write = time.monotonic()
+        if self._batch is None:
+            self._batch = asyncio.get_running_loop().create_future()
+            # Fire-and-forget writers never await their batch, so mark a failed commit
+            # as retrieved here; flush() already logs it.
+            self._batch.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._schedule(self._flush_after(self._batch, WRITE_BATCH_INTERVAL))
+        self._pending += 1
+        if self._pending >= WRITE_BATCH_MAX_STATEMENTS:
+            self._schedule(self.flush(self._batch))
+        return self._batch
+
+    def _schedule(self, coro):
+        task = asyncio.create_task(coro)
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush_after(self, batch: asyncio.Future, delay: float):
+        await asyncio.sleep(delay)
+        await self.flush(batch)
+
+    async def flush(self, batch: asyncio.Future | None = None):
+        """Commits the open batch. With a batch given, only commits if that batch is
+        still the open one, so a stale timer can't cut a newer batch short."""
+        async with self.lock:
+            if self._batch is None or (batch is not None and batch is not self._batch):
+                return
+            await self._commit()
+
+    async def run_standalone(self, sql: str):
+        """Runs sql on its own, outside the shared transaction, stepping it to the end.
+        For statements that can't run inside a transaction or, like PRAGMA
+        incremental_vacuum, only do all their work when stepped to completion
+        (execute() steps a statement that returns no rows just once). Commits the
+        open batch first."""
+        async with self.lock:
+            if self._batch is not None:
+                await self._commit()
+            await self.conn.executescript(sql)
+            self.last_write = time.monotonic()
+
+    async def _commit(self):
+        batch, self._batch = self._batch, None
+        count, self._pending = self._pending, 0
+        try:
+            await self.conn.execute("COMMIT")
+        except Exception as e:
+            logger.exception(f"Failed to commit a batch of {count} write(s)")
+            if self.conn.in_transaction:
+                await self.conn.execute("ROLLBACK")
+            batch.set_exception(e)
+        else:
+            batch.set_result(count)
+
+
+class ConnectionPool:
+    """One writer connection, fronted by a WriteBatcher, plus a small pool of
+    read-only connections on the same WAL-mode file. Read-only helpers borrow a
+    reader via read(), so a long read neither waits for nor holds up writes."""
+
+    def __init__(self, path: str, archive_path: str):
+        self.path = path
+        self.archive_path = archive_path
+        self.writer: aiosqlite.Connection | None = None
+        self.writes: WriteBatcher | None = None
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+        # Where poll_changes() left off: the writer's data_version, which only moves
+        # when another connection (another process) commits, and the last change_log
+        # seq already acted on.
+        self.data_version: int | None = None
+        self.change_seq = 0
+
+    async def open_writer(self):
+        # isolation_level=None turns off sqlite3's implicit BEGINs; WriteBatcher
+        # opens and commits transactions itself.
+        self.writer = await aiosqlite.connect(self.path, isolation_level=None)
+        # Only takes effect on a brand new file; existing ones are converted by a migration.
+        await self.writer.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await self.writer.execute("PRAGMA journal_mode=WAL")
+        await self._tune(self.writer)
+        self.writes = WriteBatcher(self.writer)
+
+    async def attach_archive(self):
+        """Attaches archive.db to the writer, creating the file and its tables if needed."""
+        await self.writer.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        await self.writer.execute("PRAGMA archive.journal_mode=WAL")
+        await create_archive_schema(self.writer)
+
+    async def open_readers(self, count: int):
+        """Opened only after the schema exists (and the archive is attached to the
+        writer, which creates it), since mode=ro can't create either file."""
+        uri = f"{pathlib.Path(self.path).resolve().as_uri()}?mode=ro"
+        archive_uri = f"{pathlib.Path(self.archive_path).resolve().as_uri()}?mode=ro"
+        for _ in range(count):
+            conn = await aiosqlite.connect(uri, uri=True, isolation_level=None)
+            await conn.execute("ATTACH DATABASE ? AS archive", (archive_uri,))
+            await self._tune(conn)
+            await conn.execute("PRAGMA query_only=ON")
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+
+    @staticmethod
+    async def _tune(conn: aiosqlite.Connection):
+        await conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def close(self):
+        """Flushes any pending writes, then closes every connection."""
+        if self.writes:
+            await self.writes.flush()
+        for conn in self._all_readers:
+            await conn.close()
+        if self.writer:
+            await self.writer.close()
 
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS autoroles (
-            guild_id INTEGER,
-            role_id INTEGER,
-            PRIMARY KEY (guild_id, role_id)
-        )
-    """)
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS mod_cases (
-            guild_id INTEGER NOT NULL,
-            case_number INTEGER NOT NULL,
-            action TEXT NOT NULL,
-            target_id INTEGER NOT NULL,
-            moderator_id INTEGER NOT NULL,
-            reason TEXT NOT NULL,
-            duration TEXT,
-            created_at INTEGER NOT NULL,
-            PRIMARY KEY (guild_id, case_number)
-        )
-    """)
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS temp_bans (
-            guild_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            unban_at INTEGER NOT NULL,
-            case_number INTEGER,
-            PRIMARY KEY (guild_id, user_id)
-        )
-    """)
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS warnings (
-            guild_id     INTEGER NOT NULL,
-            case_number  INTEGER NOT NULL,
-            target_id    INTEGER NOT NULL,
-            moderator_id INTEGER NOT NULL,
-            reason       TEXT NOT NULL,
-            created_at   INTEGER NOT NULL,
-            PRIMARY KEY (guild_id, case_number)
-        )
-    """)
 
-    await db.commit()
+class TempBanSchedule:
+    """In-memory mirror of temp_bans, ordered by unban time, so the unban task can
+    sleep exactly until the next expiry instead of polling the table. Kept in sync
+    by record_case/temp_ban_remove. Replaced or removed bans stay in the heap and
+    are skipped when they surface, instead of being dug out of the middle of it."""
+
+    def __init__(self):
+        self.loaded = False
+        self._heap: list[tuple[int, int, int]] = []  # (unban_at, guild_id, user_id)
+        self._entries: dict[tuple[int, int], tuple[int, int | None]] = {}  # -> (unban_at, case_number)
+        self._changed = asyncio.Event()
+
+    def load(self, rows):
+        self._entries = {(guild_id, user_id): (unban_at, case_number) for guild_id, user_id, unban_at, case_number in rows}
+        self._heap = [(unban_at, guild_id, user_id) for (guild_id, user_id), (unban_at, _) in self._entries.items()]
+        heapq.heapify(self._heap)
+        self.loaded = True
+        self._changed.set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, guild_id: int, user_id: int, unban_at: int, case_number: int | None):
+        self._entries[(guild_id, user_id)] = (unban_at, case_number)
+        heapq.heappush(self._heap, (unban_at, guild_id, user_id))
+        # Only an earlier deadline than the one being slept on needs to wake the task.
+        if self._heap[0][0] == unban_at:
+            self._changed.set()
+
+    def remove(self, guild_id: int, user_id: int):
+        self._entries.pop((guild_id, user_id), None)
+
+    def _is_current(self, unban_at: int, guild_id: int, user_id: int) -> bool:
+        entry = self._entries.get((guild_id, user_id))
+        return entry is not None and entry[0] == unban_at
+
+    def next_deadline(self) -> int | None:
+        while self._heap and not self._is_current(*self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now_ts: float) -> list[tuple[int, int, int | None]]:
+        """Removes and returns (guild_id, user_id, case_number) for every ban due by now_ts."""
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            unban_at, guild_id, user_id = heapq.heappop(self._heap)
+            if self._is_current(unban_at, guild_id, user_id):
+                _, case_number = self._entries.pop((guild_id, user_id))
+                due.append((guild_id, user_id, case_number))
+        return due
+
+    async def wait_for_change(self, timeout: float | None):
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._changed.clear()
+
+
+temp_ban_schedule = TempBanSchedule()
+
+
+class LobbyIndex:
+    """In-memory set of tracked lobby channel IDs, grouped by guild. Loaded once
+    from the lobbies table, then kept in step by lobby_add/lobby_delete, so voice
+    state events can check membership without touching SQLite."""
+
+    def __init__(self):
+        self.loaded = False
+        self._by_guild: dict[int, set[int]] = {}
+        self._guild_of: dict[int, int] = {}  # channel_id -> guild_id
+
+    def load(self, rows):
+        # Merges rather than replaces, so a lobby_add that landed before the
+        # load (and may not be committed yet) isn't lost.
+        for guild_id, channel_id in rows:
+            self.add(guild_id, channel_id)
+        self.loaded = True
+
+    def add(self, guild_id: int, channel_id: int):
+        self._by_guild.setdefault(guild_id, set()).add(channel_id)
+        self._guild_of[channel_id] = guild_id
+
+    def discard(self, channel_id: int):
+        guild_id = self._guild_of.pop(channel_id, None)
+        if guild_id is None:
+            return
+        channels = self._by_guild[guild_id]
+        channels.discard(channel_id)
+        if not channels:
+            del self._by_guild[guild_id]
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._guild_of
+
+    def __len__(self) -> int:
+        return len(self._guild_of)
+
+    def guild_of(self, channel_id: int) -> int | None:
+        return self._guild_of.get(channel_id)
+
+    def items(self) -> list[tuple[int, int]]:
+        """Snapshot of every (guild_id, channel_id), safe to iterate while lobbies change."""
+        return [(guild_id, channel_id) for channel_id, guild_id in self._guild_of.items()]
+
+
+lobby_index = LobbyIndex()
+
+_guild_configs: OrderedDict[int, GuildConfig] = OrderedDict()
+# Bumped by every writer that touches a cached field. A load that started before a
+# write can finish after it; comparing versions keeps that stale row out of the cache.
+_guild_config_version = 0
+
+def shard_of(guild_id: int, count: int) -> int:
+    """Which of count shards holds a guild. A snowflake's low 22 bits are worker and
+    sequence numbers; the millisecond timestamp above them spreads guilds evenly."""
+    return (guild_id >> 22) % count
+
+def shard_files(path: str, archive_path: str, count: int) -> list[tuple[str, str]]:
+    """(database, archive) file pair of each of count shards, in shard order."""
+    if count == 1:
+        return [(path, archive_path)]
+    def numbered(file: str, shard: int) -> str:
+        base, ext = os.path.splitext(file)
+        return f"{base}-{shard}{ext}"
+    return [(numbered(path, shard), numbered(archive_path, shard)) for shard in range(count)]
+
+def _check_shard_layout(path: str, archive_path: str, count: int):
+    """Refuses to open a layout other than the one on disk: with the wrong shard
+    count, guilds would be looked up in the wrong file and seem to have no data."""
+    more = shard_files(path, archive_path, count + 1)
+    if count == 1:
+        if os.path.exists(more[0][0]):
+            raise RuntimeError(f"{more[0][0]} exists, so the database is sharded; set DB_SHARDS to its shard count")
+        return
+    if os.path.exists(path):
+        raise RuntimeError(f"{path} holds unsharded data; run scripts/split_shards.py before setting DB_SHARDS")
+    existing = sum(os.path.exists(file) for file, _ in more)
+    if existing and (existing != count or os.path.exists(more[count][0])):
+        raise RuntimeError(f"The shard files on disk don't match DB_SHARDS={count}")
+
+async def initialize_databases(path: str | None = None, archive_path: str | None = None, shards: int | None = None):
+    """Opens the database (DB_FILE and ARCHIVE_FILE unless given other paths, split
+    into DB_SHARDS shards unless given a count) and brings its schema up to date."""
+    global pools, slow_query_ms
+    path = path or DB_FILE
+    archive_path = archive_path or ARCHIVE_FILE
+    shards = shards or int(os.getenv("DB_SHARDS") or 1)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    slow_query_ms = float(os.getenv("DB_SLOW_QUERY_MS") or 0)
+    _check_shard_layout(path, archive_path, shards)
+
+    # Every connection is a thread, so each shard gets a share of the readers.
+    readers = READER_POOL_SIZE if shards == 1 else max(2, READER_POOL_SIZE // shards)
+    pools = []
+    for shard_path, shard_archive_path in shard_files(path, archive_path, shards):
+        pool = ConnectionPool(shard_path, shard_archive_path)
+        pools.append(pool)
+        await pool.open_writer()
+        await run_migrations(pool.writer)
+        await pool.attach_archive()
+        await pool.open_readers(readers)
+        pool.data_version = await _data_version(pool)
+        pool.change_seq = (await _read_on(pool, "change_log_head", "SELECT coalesce(max(seq), 0) FROM change_log"))[0][0]
+    if shards > 1:
+        logger.info(f"Opened {shards} database shards")
+
+    mismatched = await check_warning_counts()
+    if mismatched:
+        logger.warning(f"warning_counts disagreed with warnings for {len(mismatched)} member(s), rebuilding")
+        await rebuild_warning_counts()
 
 async def close_all_databases():
-    """Closes the database connection gracefully."""
-    global db
-    if db:
-        await db.close()
+    """Flushes any pending writes, then closes every database connection gracefully."""
+    if pools:
+        for pool in pools:
+            await pool.close()
         logger.info("Database connection closed")
 
+def _record_query(name: str, sql: str | None, params, started: float, rows: int):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    stats = query_stats.get(name)
+    if stats is None:
+        stats = query_stats[name] = QueryStats()
+    stats.record(elapsed_ms, rows)
+
+    if slow_query_ms and elapsed_ms >= slow_query_ms:
+        statement = " ".join(sql.split()) if sql else "(transaction)"
+        logger.warning(f"Slow query {name} took {elapsed_ms:.1f}ms: {statement} params={params!r}")
+
+def shard_count() -> int:
+    return len(pools)
+
+def _pool_for(guild_id: int) -> ConnectionPool:
+    return pools[shard_of(guild_id, len(pools))]
+
+async def _read_on(pool: ConnectionPool, name: str, sql: str, params=()) -> list:
+    started = time.perf_counter()
+    async with pool.read() as conn, conn.execute(sql, params) as cursor:
+        rows = await cursor.fetchall()
+    _record_query(name, sql, params, started, len(rows))
+    return rows
+
+async def _read(name: str, sql: str, params=(), *, guild_id: int) -> list:
+    """Runs a read-only query on a pooled reader of guild_id's shard, recorded under
+    name in query_stats."""
+    return await _read_on(_pool_for(guild_id), name, sql, params)
+
+async def _read_all(name: str, sql: str, params=()) -> list:
+    """Runs a read-only query on every shard at once and concatenates the rows, for
+    queries across guilds. Any ORDER BY or LIMIT applies per shard, not overall."""
+    results = await asyncio.gather(*(_read_on(pool, name, sql, params) for pool in pools))
+    return [row for rows in results for row in rows]
+
+async def _write_on(pool: ConnectionPool, name: str, sql: str, params=(), *, durable: bool = False) -> list:
+    started = time.perf_counter()
+    rows = await pool.writes.execute(sql, params, durable=durable)
+    _record_query(name, sql, params, started, len(rows))
+    return rows
+
+async def _write(name: str, sql: str, params=(), *, guild_id: int, durable: bool = False) -> list:
+    """Runs one write through guild_id's shard's group-commit pipeline, recorded under
+    name in query_stats. The time includes any wait for the write lock and, if
+    durable, for the commit."""
+    return await _write_on(_pool_for(guild_id), name, sql, params, durable=durable)
+
+@contextlib.asynccontextmanager
+async def _transaction_on(pool: ConnectionPool, name: str, *, durable: bool = False):
+    started = time.perf_counter()
+    async with pool.writes.transaction(durable=durable) as conn:
+        yield conn
+    _record_query(name, None, None, started, 0)
+
+def _transaction(name: str, *, guild_id: int, durable: bool = False):
+    """Multi-statement unit of work on guild_id's shard, recorded as a whole under
+    name in query_stats."""
+    return _transaction_on(_pool_for(guild_id), name, durable=durable)
+
+def query_stats_snapshot() -> list[dict]:
+    """Every recorded query's stats, slowest total time first."""
+    rows = [{"name": name, **stats.snapshot()} for name, stats in query_stats.items()]
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+def _update_guild_config(guild_id: int, **changes):
+    """Applies a committed write to the cached snapshot, if this guild has one."""
+    global _guild_config_version
+    _guild_config_version += 1
+    config = _guild_configs.get(guild_id)
+    if config is not None:
+        _guild_configs[guild_id] = dataclasses.replace(config, **changes)
+
+def _forget_guild_config(guild_id: int):
+    """Drops the guild's cached snapshot, after a write this process didn't apply."""
+    global _guild_config_version
+    _guild_config_version += 1
+    _guild_configs.pop(guild_id, None)
+
+async def get_guild_config(guild_id: int | None) -> GuildConfig:
+    """Returns the guild's settings snapshot, hitting the database only on a cache miss.
+    A guild_id of None (a command run in DMs) gets the defaults, with no query."""
+    if guild_id is None:
+        return GuildConfig(guild_id=None)
+    config = _guild_configs.get(guild_id)
+    if config is not None:
+        _guild_configs.move_to_end(guild_id)
+        return config
+
+    version = _guild_config_version
+    rows = await _read(
+        "get_guild_config",
+        """
+        SELECT g.embed_color, g.welcome_channel_id, g.commands_log_channel_id, g.moderation_log_channel_id,
+               g.case_retention_days,
+               (SELECT group_concat(role_id) FROM autoroles WHERE guild_id = :guild_id)
+        FROM (SELECT :guild_id AS guild_id) AS k
+        LEFT JOIN guild_data AS g ON g.guild_id = k.guild_id
+        """,
+        {"guild_id": guild_id},
+        guild_id=guild_id,
+    )
+    embed_color, welcome_id, commands_log_id, moderation_log_id, retention_days, autoroles = rows[0]
+
+    config = GuildConfig(
+        guild_id=guild_id,
+        embed_color=embed_color,
+        welcome_channel_id=welcome_id,
+        commands_log_channel_id=commands_log_id,
+        moderation_log_channel_id=moderation_log_id,
+        case_retention_days=retention_days,
+        autoroles=tuple(int(role_id) for role_id in autoroles.split(",")) if autoroles else (),
+    )
+
+    if version == _guild_config_version:
+        _guild_configs[guild_id] = config
+        if len(_guild_configs) > GUILD_CONFIG_CACHE_SIZE:
+            _guild_configs.popitem(last=False)
+    return config
+
+async def warm_up(guild_ids) -> dict[str, int]:
+    """Loads everything the cogs look up per guild in a few bulk reads, instead of
+    one get_guild_config() per guild on its first command or event: the settings
+    of every guild in guild_ids (guilds without a guild_data row are cached as
+    defaults too), plus the lobby index and unban schedule if no cog has loaded
+    them yet. Returns how many of each are now in memory."""
+    wanted = set(guild_ids)
+    version = _guild_config_version
+    settings, autoroles = await asyncio.gather(
+        _read_all(
+            "warm_up_guild_data",
+            """
+            SELECT guild_id, embed_color, welcome_channel_id, commands_log_channel_id, moderation_log_channel_id,
+                   case_retention_days
+            FROM guild_data
+            """,
+        ),
+        # In primary key order, as get_guild_config's group_concat reads them.
+        _read_all("warm_up_autoroles", "SELECT guild_id, role_id FROM autoroles ORDER BY guild_id, role_id"),
+    )
+
+    roles_of: dict[int, list[int]] = {}
+    for guild_id, role_id in autoroles:
+        roles_of.setdefault(guild_id, []).append(role_id)
+    configs = {guild_id: GuildConfig(guild_id=guild_id) for guild_id in wanted}
+    for guild_id, *columns in settings:
+        if guild_id in wanted:
+            configs[guild_id] = GuildConfig(guild_id, *columns)
+    for guild_id, roles in roles_of.items():
+        if guild_id in wanted:
+            configs[guild_id] = dataclasses.replace(configs[guild_id], autoroles=tuple(roles))
+
+    # Written while these were read, so some rows may predate it; get_guild_config
+    # will read those guilds on demand instead.
+    if version == _guild_config_version:
+        for guild_id, config in list(configs.items())[:GUILD_CONFIG_CACHE_SIZE]:
+            _guild_configs[guild_id] = config
+        while len(_guild_configs) > GUILD_CONFIG_CACHE_SIZE:
+            _guild_configs.popitem(last=False)
+
+    await load_lobbies()
+    if not temp_ban_schedule.loaded:
+        await load_temp_bans()
+    return {
+        "guild_configs": len(_guild_configs),
+        "settings_rows": len(settings),
+        "autorole_rows": len(autoroles),
+        "lobbies": len(lobby_index),
+        "temp_bans": len(temp_ban_schedule),
+    }
+
+# What a change_log row from another process invalidates, by table.
+_CHANGE_HANDLERS = {
+    "guild_data": _forget_guild_config,
+    "autoroles": _forget_guild_config,
+}
+
+async def _data_version(pool: ConnectionPool) -> int:
+    async with pool.writer.execute("PRAGMA data_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+async def poll_changes() -> int:
+    """Drops the cache entries of guilds whose settings another process changed since
+    the last poll, returning how many changes were applied. Costs one pragma per
+    shard unless something else committed; this process's own commits are already
+    in its cache but show up here too, and cost only a re-read."""
+    applied = 0
+    for pool in pools:
+        version = await _data_version(pool)
+        if version == pool.data_version:
+            continue
+        pool.data_version = version
+        rows = await _read_on(
+            pool, "poll_changes", "SELECT seq, table_name, guild_id FROM change_log WHERE seq > ? ORDER BY seq", (pool.change_seq,)
+        )
+        if not rows:
+            continue
+        if rows[0][0] != pool.change_seq + 1:
+            # Rows this process never saw were pruned, so which guilds they touched is lost.
+            logger.warning("Fell behind the change log, dropping every cached guild config")
+            for guild_id in list(_guild_configs):
+                _forget_guild_config(guild_id)
+        else:
+            for _, table_name, guild_id in rows:
+                handler = _CHANGE_HANDLERS.get(table_name)
+                if handler:
+                    handler(guild_id)
+        pool.change_seq = rows[-1][0]
+        applied += len(rows)
+    return applied
+
+async def prune_change_log() -> int:
+    """Trims every shard's change_log to its newest CHANGE_LOG_KEEP rows."""
+    pruned = 0
+    for pool in pools:
+        rows = await _write_on(
+            pool,
+            "prune_change_log",
+            "DELETE FROM change_log WHERE seq <= (SELECT max(seq) FROM change_log) - ? RETURNING seq",
+            (CHANGE_LOG_KEEP,),
+        )
+        pruned += len(rows)
+    return pruned
+
 async def lobby_add(guild_id: int, channel_id: int):
-    await db.execute("INSERT OR REPLACE INTO lobbies (guild_id, channel_id) VALUES (?, ?)", (guild_id, channel_id))
-    await db.commit()
+    # Lobby churn is the highest-volume write and cheap to lose, so it never waits on the commit.
+    await _write("lobby_add", "INSERT OR REPLACE INTO lobbies (guild_id, channel_id) VALUES (?, ?)", (guild_id, channel_id), guild_id=guild_id)
+    lobby_index.add(guild_id, channel_id)
 
 async def lobby_delete(channel_id: int):
-    await db.execute("DELETE FROM lobbies WHERE channel_id = ?", (channel_id,))
-    await db.commit()
+    guild_id = lobby_index.guild_of(channel_id)
+    lobby_index.discard(channel_id)
+    if guild_id is not None or len(pools) == 1:
+        await _write("lobby_delete", "DELETE FROM lobbies WHERE channel_id = ?", (channel_id,), guild_id=guild_id or 0)
+        return
+    # Not in the index, so its shard isn't known; it's in at most one of them.
+    for pool in pools:
+        await _write_on(pool, "lobby_delete", "DELETE FROM lobbies WHERE channel_id = ?", (channel_id,))
 
 async def lobbies_all():
-    async with db.execute("SELECT guild_id, channel_id FROM lobbies") as cursor:
-        return await cursor.fetchall()
+    return await _read_all("lobbies_all", "SELECT guild_id, channel_id FROM lobbies")
+
+async def load_lobbies():
+    """Fills the in-memory lobby index from the lobbies table, once per process.
+    Later calls are no-ops: from then on lobby_add/lobby_delete keep it current,
+    and reloading from a reader could miss a lobby_add that hasn't committed yet."""
+    if lobby_index.loaded:
+        return
+    lobby_index.load(await lobbies_all())
 
-async def lobby_is_tracked(channel_id: int) -> bool:
-    async with db.execute("SELECT 1 FROM lobbies WHERE channel_id = ? LIMIT 1", (channel_id,)) as cursor:
-        return await cursor.fetchone() is not None
+def lobby_is_tracked(channel_id: int) -> bool:
+    return channel_id in lobby_index
+
+def tracked_lobbies() -> list[tuple[int, int]]:
+    """Every tracked (guild_id, channel_id), from memory."""
+    return lobby_index.items()
 
 async def set_embed_color(guild_id: int, hex_code: str, user_id: int):
-    await db.execute(
+    await _write(
+        "set_embed_color",
         """
         INSERT INTO guild_data (guild_id, embed_color, updated_by) VALUES (?, ?, ?)
         ON CONFLICT(guild_id) DO UPDATE SET embed_color=excluded.embed_color, updated_by=excluded.updated_by
         """,
-        (guild_id, hex_code, user_id)
+        (guild_id, hex_code, user_id),
+        durable=True,
+        guild_id=guild_id,
     )
-    await db.commit()
+    _update_guild_config(guild_id, embed_color=hex_code)
 
 async def get_embed_color(guild_id: int):
-    async with db.execute("SELECT embed_color FROM guild_data WHERE guild_id = ?", (guild_id,)) as cursor:
-        result = await cursor.fetchone()
-        return result[0] if result else None
+    return (await get_guild_config(guild_id)).embed_color
 
-async def get_guild_embed_color(guild_id: int) -> discord.Color:
-    db_color = await get_embed_color(guild_id)
-    if db_color:
-        return discord.Color(int(db_color, 16))
-    return discord.Color(EMBED_COLOR)
+async def get_guild_embed_color(guild_id: int | None) -> discord.Color:
+    return (await get_guild_config(guild_id)).color
 
 async def set_welcome_channel(guild_id: int, channel_id: int | None):
-    await db.execute(
+    await _write(
+        "set_welcome_channel",
         """
         INSERT INTO guild_data (guild_id, welcome_channel_id) VALUES (?, ?)
         ON CONFLICT(guild_id) DO UPDATE SET welcome_channel_id=excluded.welcome_channel_id
         """,
-        (guild_id, channel_id)
+        (guild_id, channel_id),
+        durable=True,
+        guild_id=guild_id,
     )
-    await db.commit()
+    _update_guild_config(guild_id, welcome_channel_id=channel_id)
 
 async def get_welcome_channel(guild_id: int):
-    async with db.execute("SELECT welcome_channel_id FROM guild_data WHERE guild_id = ?", (guild_id,)) as cursor:
-        result = await cursor.fetchone()
-        return result[0] if result else None
+    return (await get_guild_config(guild_id)).welcome_channel_id
 
 async def set_commands_log_channel(guild_id: int, channel_id: int | None):
-    await db.execute(
+    await _write(
+        "set_commands_log_channel",
         """
         INSERT INTO guild_data (guild_id, commands_log_channel_id) VALUES (?, ?)
         ON CONFLICT(guild_id) DO UPDATE SET commands_log_channel_id=excluded.commands_log_channel_id
         """,
-        (guild_id, channel_id)
+        (guild_id, channel_id),
+        durable=True,
+        guild_id=guild_id,
     )
-    await db.commit()
+    _update_guild_config(guild_id, commands_log_channel_id=channel_id)
 
 async def get_commands_log_channel(guild_id: int):
-    async with db.execute("SELECT commands_log_channel_id FROM guild_data WHERE guild_id = ?", (guild_id,)) as cursor:
-        result = await cursor.fetchone()
-        return result[0] if result else None
+    return (await get_guild_config(guild_id)).commands_log_channel_id
 
 async def set_moderation_log_channel(guild_id: int, channel_id: int | None):
-    await db.execute(
+    await _write(
+        "set_moderation_log_channel",
         """
         INSERT INTO guild_data (guild_id, moderation_log_channel_id) VALUES (?, ?)
         ON CONFLICT(guild_id) DO UPDATE SET moderation_log_channel_id=excluded.moderation_log_channel_id
         """,
-        (guild_id, channel_id)
+        (guild_id, channel_id),
+        durable=True,
+        guild_id=guild_id,
     )
-    await db.commit()
+    _update_guild_config(guild_id, moderation_log_channel_id=channel_id)
 
 async def get_moderation_log_channel(guild_id: int):
-    async with db.execute("SELECT moderation_log_channel_id FROM guild_data WHERE guild_id = ?", (guild_id,)) as cursor:
-        result = await cursor.fetchone()
-        return result[0] if result else None
+    return (await get_guild_config(guild_id)).moderation_log_channel_id
 
-async def next_case_number(guild_id: int) -> int:
-    """Atomically increments and returns the guild's next moderation case number."""
-    async with db.execute(
+async def set_case_retention(guild_id: int, days: int | None):
+    await _write(
+        "set_case_retention",
         """
-        INSERT INTO guild_data (guild_id, case_counter) VALUES (?, 1)
-        ON CONFLICT(guild_id) DO UPDATE SET case_counter = guild_data.case_counter + 1
-        RETURNING case_counter
+        INSERT INTO guild_data (guild_id, case_retention_days) VALUES (?, ?)
+        ON CONFLICT(guild_id) DO UPDATE SET case_retention_days=excluded.case_retention_days
         """,
-        (guild_id,)
-    ) as cursor:
-        result = await cursor.fetchone()
-    await db.commit()
-    return result[0]
-
-async def add_mod_case(guild_id: int, case_number: int, action: str, target_id: int, moderator_id: int, reason: str, duration: str | None):
-    await db.execute(
-        """
-        INSERT INTO mod_cases (guild_id, case_number, action, target_id, moderator_id, reason, duration, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (guild_id, case_number, action, target_id, moderator_id, reason, duration, int(time.time()))
+        (guild_id, days),
+        durable=True,
+        guild_id=guild_id,
     )
-    await db.commit()
+    _update_guild_config(guild_id, case_retention_days=days)
+
+async def record_case(
+    guild_id: int, action: str, target_id: int, moderator_id: int, reason: str, duration: str | None = None, *,
+    warning: bool = False, unban_at: int | None = None, lift_temp_ban: bool = False,
+) -> CaseRecord:
+    """Records a moderation action as one unit of work: allocates the case number,
+    inserts the case and, as asked, a warning (warning=True), a temp ban expiring
+    at unban_at, or the removal of the member's pending temp ban (lift_temp_ban=True).
+    Waits for the commit, which concurrent actions share."""
+    config = await get_guild_config(guild_id)
+    if lift_temp_ban:
+        # Dropped from the schedule first, so it can't fire while the delete commits.
+        temp_ban_schedule.remove(guild_id, target_id)
+
+    now = int(time.time())
+    warning_count = None
+    async with _transaction("record_case", durable=True, guild_id=guild_id) as conn:
+        async with conn.execute(
+            """
+            INSERT INTO guild_data (guild_id, case_counter) VALUES (?, 1)
+            ON CONFLICT(guild_id) DO UPDATE SET case_counter = guild_data.case_counter + 1
+            RETURNING case_counter
+            """,
+            (guild_id,)
+        ) as cursor:
+            (case_number,) = await cursor.fetchone()
 
-async def temp_ban_add(guild_id: int, user_id: int, unban_at: int, case_number: int):
-    await db.execute(
-        "INSERT OR REPLACE INTO temp_bans (guild_id, user_id, unban_at, case_number) VALUES (?, ?, ?, ?)",
-        (guild_id, user_id, unban_at, case_number)
+        await conn.execute(
+            """
+            INSERT INTO mod_cases (guild_id, case_number, action, target_id, moderator_id, reason, duration, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (guild_id, case_number, action, target_id, moderator_id, reason, duration, now)
+        )
+
+        if warning:
+            await conn.execute(
+                """
+                INSERT INTO warnings (guild_id, case_number, target_id, moderator_id, reason, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (guild_id, case_number, target_id, moderator_id, reason, now)
+            )
+            async with conn.execute(
+                """
+                INSERT INTO warning_counts (guild_id, target_id, count) VALUES (?, ?, 1)
+                ON CONFLICT(guild_id, target_id) DO UPDATE SET count = count + 1
+                RETURNING count
+                """,
+                (guild_id, target_id)
+            ) as cursor:
+                (warning_count,) = await cursor.fetchone()
+
+        if unban_at is not None:
+            await conn.execute(
+                "INSERT OR REPLACE INTO temp_bans (guild_id, user_id, unban_at, case_number) VALUES (?, ?, ?, ?)",
+                (guild_id, target_id, unban_at, case_number)
+            )
+        elif lift_temp_ban:
+            await conn.execute("DELETE FROM temp_bans WHERE guild_id = ? AND user_id = ?", (guild_id, target_id))
+
+    if unban_at is not None:
+        temp_ban_schedule.add(guild_id, target_id, unban_at, case_number)
+
+    return CaseRecord(
+        case_number=case_number,
+        warning_count=warning_count,
+        log_channel_id=config.moderation_log_channel_id,
+        color=config.color,
     )
-    await db.commit()
 
-async def temp_ban_remove(guild_id: int, user_id: int):
-    await db.execute("DELETE FROM temp_bans WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
-    await db.commit()
+async def get_case_history(guild_id: int, target_id: int, before_case: int | None = None, limit: int = 10, *, include_archive: bool = False):
+    """One page of a member's moderation cases, newest first, starting before before_case.
+    With include_archive, archived cases are merged in as if they'd never moved."""
+    params = (guild_id, target_id, MAX_CASE_NUMBER if before_case is None else before_case, limit)
+    if not include_archive:
+        return await _read(
+            "get_case_history",
+            """
+            SELECT case_number, action, moderator_id, reason, duration, created_at FROM mod_cases
+            WHERE guild_id = ? AND target_id = ? AND case_number < ? ORDER BY case_number DESC LIMIT ?
+            """,
+            params,
+            guild_id=guild_id,
+        )
+    # Each side is limited before the merge, so neither file is read past one page.
+    return await _read(
+        "get_case_history_archived",
+        """
+        SELECT * FROM (
+            SELECT * FROM (
+                SELECT case_number, action, moderator_id, reason, duration, created_at FROM main.mod_cases
+                WHERE guild_id = ?1 AND target_id = ?2 AND case_number < ?3 ORDER BY case_number DESC LIMIT ?4
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT case_number, action, moderator_id, reason, duration, created_at FROM archive.mod_cases
+                WHERE guild_id = ?1 AND target_id = ?2 AND case_number < ?3 ORDER BY case_number DESC LIMIT ?4
+            )
+        ) ORDER BY case_number DESC LIMIT ?4
+        """,
+        params,
+        guild_id=guild_id,
+    )
 
-async def reset_case_counter(guild_id: int):
-    """Wipes case history and resets the counter for a guild. Testing use only."""
-    await db.execute("DELETE FROM mod_cases WHERE guild_id = ?", (guild_id,))
-    await db.execute(
+async def get_cases_from(guild_id: int, case_number: int, limit: int = 2, *, include_archive: bool = False):
+    """Case case_number and the ones before it, newest first. The first row is only
+    that case if it exists, so callers check its number. With include_archive,
+    archived cases are merged in."""
+    params = (guild_id, case_number, limit)
+    if not include_archive:
+        return await _read(
+            "get_cases_from",
+            """
+            SELECT case_number, action, target_id, moderator_id, reason, duration, created_at FROM mod_cases
+            WHERE guild_id = ? AND case_number <= ? ORDER BY case_number DESC LIMIT ?
+            """,
+            params,
+            guild_id=guild_id,
+        )
+    return await _read(
+        "get_cases_from_archived",
         """
-        INSERT INTO guild_data (guild_id, case_counter) VALUES (?, 0)
-        ON CONFLICT(guild_id) DO UPDATE SET case_counter = 0
+        SELECT * FROM (
+            SELECT * FROM (
+                SELECT case_number, action, target_id, moderator_id, reason, duration, created_at FROM main.mod_cases
+                WHERE guild_id = ?1 AND case_number <= ?2 ORDER BY case_number DESC LIMIT ?3
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT case_number, action, target_id, moderator_id, reason, duration, created_at FROM archive.mod_cases
+                WHERE guild_id = ?1 AND case_number <= ?2 ORDER BY case_number DESC LIMIT ?3
+            )
+        ) ORDER BY case_number DESC LIMIT ?3
         """,
-        (guild_id,)
+        params,
+        guild_id=guild_id,
     )
-    await db.commit()
 
-async def temp_bans_due(now_ts: int):
-    async with db.execute("SELECT guild_id, user_id, case_number FROM temp_bans WHERE unban_at <= ?", (now_ts,)) as cursor:
-        return await cursor.fetchall()
+_SEARCH_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+def _fts_query(text: str) -> str:
+    """Turns free text into an FTS5 query matching every word, with "quoted text"
+    kept together as a phrase. Each term is quoted, so FTS5 operators and
+    punctuation in the input are searched for literally instead of raising
+    a syntax error."""
+    terms = []
+    for phrase, word in _SEARCH_TERM.findall(text):
+        term = (phrase or word).strip()
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"')
+    return " ".join(terms)
 
-async def add_warning(guild_id: int, case_number: int, target_id: int, moderator_id: int, reason: str):
-    await db.execute(
+async def search_cases(
+    guild_id: int, text: str, *, action: str | None = None, target_id: int | None = None,
+    since: int | None = None, offset: int = 0, limit: int = 10,
+):
+    """One page of the guild's cases whose reason matches text, best match (bm25)
+    first. Returns (case_number, action, target_id, moderator_id, snippet, created_at)
+    rows, with the matched words in the snippet in bold. Paged by offset, since
+    ranks shift as cases are added."""
+    query = _fts_query(text)
+    if not query:
+        return []
+    return await _read(
+        "search_cases",
         """
-        INSERT INTO warnings (guild_id, case_number, target_id, moderator_id, reason, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
+        SELECT c.case_number, c.action, c.target_id, c.moderator_id,
+               snippet(mod_cases_fts, 0, '**', '**', '…', 24), c.created_at
+        FROM mod_cases_fts AS f
+        JOIN mod_cases AS c ON c.rowid = f.rowid
+        WHERE mod_cases_fts MATCH :query AND c.guild_id = :guild_id
+          AND (:action IS NULL OR c.action = :action)
+          AND (:target_id IS NULL OR c.target_id = :target_id)
+          AND (:since IS NULL OR c.created_at >= :since)
+        ORDER BY bm25(mod_cases_fts), c.case_number DESC
+        LIMIT :limit OFFSET :offset
         """,
-        (guild_id, case_number, target_id, moderator_id, reason, int(time.time()))
+        {
+            "query": query, "guild_id": guild_id, "action": action, "target_id": target_id,
+            "since": since, "limit": limit, "offset": offset,
+        },
+        guild_id=guild_id,
+    )
+
+async def temp_ban_remove(guild_id: int, user_id: int):
+    temp_ban_schedule.remove(guild_id, user_id)
+    await _write("temp_ban_remove", "DELETE FROM temp_bans WHERE guild_id = ? AND user_id = ?", (guild_id, user_id), durable=True, guild_id=guild_id)
+
+async def load_temp_bans():
+    """(Re)builds the in-memory unban schedule from the temp_bans table."""
+    rows = await _read_all("load_temp_bans", "SELECT guild_id, user_id, unban_at, case_number FROM temp_bans")
+    temp_ban_schedule.load(rows)
+
+def next_temp_ban_at() -> int | None:
+    return temp_ban_schedule.next_deadline()
+
+def pop_due_temp_bans(now_ts: float) -> list[tuple[int, int, int | None]]:
+    return temp_ban_schedule.pop_due(now_ts)
+
+async def wait_for_temp_ban_change(timeout: float | None):
+    """Sleeps until timeout, or until a ban is added that expires before the current next one."""
+    await temp_ban_schedule.wait_for_change(timeout)
+
+# Set by outbox_enqueue, so the dispatcher wakes for a new message right away
+# instead of at its next poll.
+outbox_ready = asyncio.Event()
+# Earliest due time queued by this process that next_outbox_at() might not see yet,
+# since it reads committed rows and a new one can still be in the open batch.
+_outbox_due_hint: float | None = None
+# (gateway shard count, first shard, last shard) whose guilds' messages this process
+# sends. In cluster mode each bot process only has its own shards' channels cached,
+# so it claims only their messages. (1, 0, 0) matches every guild.
+owned_shards: tuple[int, int, int] = (1, 0, 0)
+
+def set_owned_shards(shard_count: int, first: int, last: int):
+    global owned_shards
+    owned_shards = (shard_count, first, last)
+
+def _outbox_due(window: float) -> float:
+    # The end of the current window, so everything queued within it is due together.
+    now = time.time()
+    return math.ceil(now / window) * window if window else now
+
+async def outbox_enqueue(guild_id: int, channel_id: int, kind: str, payload: dict, batch_window: float = 0.0):
+    """Queues a message for the outbox dispatcher and returns without waiting on
+    Discord. payload holds the message as JSON: "embeds" (Embed.to_dict() dicts)
+    and optionally "attachments" ({"url", "filename"} fetched at send time). With
+    a batch_window, it's held until the end of the current window of that many
+    seconds, so the dispatcher can combine it with others queued alongside."""
+    due = _outbox_due(batch_window)
+    await _write(
+        "outbox_enqueue",
+        "INSERT INTO outbox (guild_id, channel_id, kind, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (guild_id, channel_id, kind, json.dumps(payload), due, int(time.time())),
+        guild_id=guild_id,
+    )
+    global _outbox_due_hint
+    _outbox_due_hint = due if _outbox_due_hint is None else min(_outbox_due_hint, due)
+    outbox_ready.set()
+
+async def outbox_claim(limit: int) -> list[tuple[int, int, int, str, dict, int]]:
+    """Takes up to limit due messages per shard (of this process's guilds, see
+    owned_shards), oldest first, leasing each for
+    OUTBOX_LEASE_SECONDS. A message is held back while an older one for the same
+    channel is waiting on a retry or still out being sent, so no channel's
+    messages overtake each other. Runs on the writers, so messages queued but not
+    yet committed are seen too. Rows are (id, guild_id, channel_id, kind,
+    payload, attempts), attempts counting this one."""
+    now = time.time()
+    results = await asyncio.gather(*(
+        _write_on(
+            pool,
+            "outbox_claim",
+            """
+            UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?1 + ?2
+            WHERE id IN (
+                SELECT id FROM outbox AS o
+                WHERE next_attempt_at <= ?1 AND (guild_id >> 22) % ?4 BETWEEN ?5 AND ?6 AND NOT EXISTS (
+                    SELECT 1 FROM outbox AS earlier
+                    WHERE earlier.channel_id = o.channel_id AND earlier.id < o.id AND earlier.next_attempt_at > ?1
+                )
+                ORDER BY next_attempt_at, id LIMIT ?3
+            )
+            RETURNING id, guild_id, channel_id, kind, payload, attempts
+            """,
+            (now, OUTBOX_LEASE_SECONDS, limit, *owned_shards),
+        )
+        for pool in pools
+    ))
+    rows = [row for shard_rows in results for row in shard_rows]
+    # RETURNING order isn't guaranteed, and the dispatcher sends each channel's in order.
+    rows.sort(key=lambda row: row[0])
+    return [(id_, guild_id, channel_id, kind, json.loads(payload), attempts) for id_, guild_id, channel_id, kind, payload, attempts in rows]
+
+async def outbox_done(guild_id: int, message_id: int):
+    """Removes a message that was delivered, or that will never be."""
+    await _write("outbox_done", "DELETE FROM outbox WHERE id = ?", (message_id,), guild_id=guild_id)
+
+async def outbox_retry(guild_id: int, message_id: int, delay: float, error: str):
+    await _write(
+        "outbox_retry",
+        "UPDATE outbox SET next_attempt_at = ?, last_error = ? WHERE id = ?",
+        (time.time() + delay, error, message_id),
+        guild_id=guild_id,
     )
-    await db.commit()
 
-async def get_warnings(guild_id: int, target_id: int):
-    async with db.execute(
+async def next_outbox_at() -> float | None:
+    """When the next of this process's queued messages is due (or its lease runs
+    out), None if there are none."""
+    global _outbox_due_hint
+    rows = await _read_all(
+        "next_outbox_at",
+        "SELECT next_attempt_at FROM outbox WHERE (guild_id >> 22) % ? BETWEEN ? AND ? ORDER BY next_attempt_at LIMIT 1",
+        owned_shards,
+    )
+    due = [row[0] for row in rows]
+    if _outbox_due_hint is not None:
+        if _outbox_due_hint > time.time():
+            due.append(_outbox_due_hint)
+        else:
+            _outbox_due_hint = None  # due by now, so outbox_claim() already saw it
+    return min(due) if due else None
+
+async def wait_for_outbox(timeout: float | None):
+    """Sleeps until timeout, or until a message is queued."""
+    try:
+        await asyncio.wait_for(outbox_ready.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    outbox_ready.clear()
+
+async def reset_case_counter(guild_id: int):
+    """Wipes case history and resets the counter for a guild. Testing use only."""
+    async with _transaction("reset_case_counter", durable=True, guild_id=guild_id) as conn:
+        await conn.execute("DELETE FROM mod_cases WHERE guild_id = ?", (guild_id,))
+        await conn.execute("DELETE FROM archive.mod_cases WHERE guild_id = ?", (guild_id,))
+        await conn.execute(
+            """
+            INSERT INTO guild_data (guild_id, case_counter) VALUES (?, 0)
+            ON CONFLICT(guild_id) DO UPDATE SET case_counter = 0
+            """,
+            (guild_id,)
+        )
+
+async def temp_bans_due(now_ts: int):
+    return await _read_all("temp_bans_due", "SELECT guild_id, user_id, case_number FROM temp_bans WHERE unban_at <= ?", (now_ts,))
+
+async def get_warnings(guild_id: int, target_id: int, after_case: int = 0, limit: int = 10):
+    """One page of a member's warnings, oldest first, starting after after_case."""
+    return await _read(
+        "get_warnings",
         """
         SELECT case_number, moderator_id, reason, created_at FROM warnings
-        WHERE guild_id = ? AND target_id = ? ORDER BY case_number
+        WHERE guild_id = ? AND target_id = ? AND case_number > ? ORDER BY case_number LIMIT ?
         """,
-        (guild_id, target_id)
-    ) as cursor:
-        return await cursor.fetchall()
+        (guild_id, target_id, after_case, limit),
+        guild_id=guild_id,
+    )
 
 async def count_warnings(guild_id: int, target_id: int) -> int:
-    async with db.execute(
-        "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND target_id = ?",
-        (guild_id, target_id)
-    ) as cursor:
-        result = await cursor.fetchone()
-        return result[0]
-
-async def get_all_warnings(guild_id: int):
-    async with db.execute(
+    rows = await _read(
+        "count_warnings",
+        "SELECT count FROM warning_counts WHERE guild_id = ? AND target_id = ?",
+        (guild_id, target_id),
+        guild_id=guild_id,
+    )
+    return rows[0][0] if rows else 0
+
+async def get_warning_counts(guild_id: int, after_target: int = 0, limit: int = 10):
+    """One page of (target_id, count) for every warned member, by member ID, starting after after_target."""
+    return await _read(
+        "get_warning_counts",
+        "SELECT target_id, count FROM warning_counts WHERE guild_id = ? AND target_id > ? ORDER BY target_id LIMIT ?",
+        (guild_id, after_target, limit),
+        guild_id=guild_id,
+    )
+
+async def clear_warnings(guild_id: int, target_id: int) -> int:
+    """Deletes every warning for a member and returns how many there were."""
+    async with _transaction("clear_warnings", durable=True, guild_id=guild_id) as conn:
+        async with conn.execute(
+            "DELETE FROM warning_counts WHERE guild_id = ? AND target_id = ? RETURNING count",
+            (guild_id, target_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await conn.execute("DELETE FROM warnings WHERE guild_id = ? AND target_id = ?", (guild_id, target_id))
+    return row[0] if row else 0
+
+async def check_warning_counts() -> list[tuple[int, int, int, int]]:
+    """Compares warning_counts against the warnings table. Returns
+    (guild_id, target_id, actual, stored) for every member where they disagree."""
+    return await _read_all(
+        "check_warning_counts",
         """
-        SELECT case_number, target_id, moderator_id, reason, created_at FROM warnings
-        WHERE guild_id = ? ORDER BY target_id, case_number
-        """,
-        (guild_id,)
-    ) as cursor:
-        return await cursor.fetchall()
+        SELECT w.guild_id, w.target_id, w.actual, c.count
+        FROM (SELECT guild_id, target_id, COUNT(*) AS actual FROM warnings GROUP BY guild_id, target_id) AS w
+        LEFT JOIN warning_counts AS c ON c.guild_id = w.guild_id AND c.target_id = w.target_id
+        WHERE c.count IS NOT w.actual
+        UNION ALL
+        SELECT c.guild_id, c.target_id, 0, c.count FROM warning_counts AS c
+        WHERE NOT EXISTS (SELECT 1 FROM warnings AS w WHERE w.guild_id = c.guild_id AND w.target_id = c.target_id)
+        """
+    )
 
-async def clear_warnings(guild_id: int, target_id: int):
-    await db.execute("DELETE FROM warnings WHERE guild_id = ? AND target_id = ?", (guild_id, target_id))
-    await db.commit()
+async def rebuild_warning_counts() -> int:
+    """Recomputes warning_counts from scratch. Returns the number of members with warnings."""
+    members = 0
+    for pool in pools:
+        async with _transaction_on(pool, "rebuild_warning_counts", durable=True) as conn:
+            await conn.execute("DELETE FROM warning_counts")
+            async with conn.execute(
+                """
+                INSERT INTO warning_counts (guild_id, target_id, count)
+                SELECT guild_id, target_id, COUNT(*) FROM warnings GROUP BY guild_id, target_id
+                """
+            ) as cursor:
+                members += cursor.rowcount
+    return members
 
 async def add_autorole(guild_id: int, role_id: int):
-    await db.execute(
+    await _write(
+        "add_autorole",
         "INSERT OR IGNORE INTO autoroles (guild_id, role_id) VALUES (?, ?)",
-        (guild_id, role_id)
+        (guild_id, role_id),
+        durable=True,
+        guild_id=guild_id,
     )
-    await db.commit()
+    config = _guild_configs.get(guild_id)
+    if config is not None and role_id not in config.autoroles:
+        _update_guild_config(guild_id, autoroles=config.autoroles + (role_id,))
+    else:
+        _update_guild_config(guild_id)
 
 async def remove_autorole(guild_id: int, role_id: int):
-    await db.execute(
+    await _write(
+        "remove_autorole",
         "DELETE FROM autoroles WHERE guild_id = ? AND role_id = ?",
-        (guild_id, role_id)
+        (guild_id, role_id),
+        durable=True,
+        guild_id=guild_id,
     )
-    await db.commit()
+    config = _guild_configs.get(guild_id)
+    if config is not None:
+        _update_guild_config(guild_id, autoroles=tuple(r for r in config.autoroles if r != role_id))
+    else:
+        _update_guild_config(guild_id)
 
 async def get_autoroles(guild_id: int) -> list[int]:
-    async with db.execute(
-        "SELECT role_id FROM autoroles WHERE guild_id = ?",
-        (guild_id,)
-    ) as cursor:
-        rows = await cursor.fetchall()
-        return [row[0] for row in rows]
+    return list((await get_guild_config(guild_id)).autoroles)
+
+async def _export_lines(guild_id: int) -> AsyncIterator[bytes]:
+    started = time.perf_counter()
+    exported = 0
+    async with _pool_for(guild_id).read() as conn:
+        # One read transaction for every table, so the export is a single consistent
+        # snapshot even while writes carry on.
+        await conn.execute("BEGIN")
+        try:
+            header = {"format": GUILD_EXPORT_FORMAT, "version": GUILD_EXPORT_VERSION, "guild_id": guild_id, "exported_at": int(time.time())}
+            yield (json.dumps(header) + "\n").encode()
+            for table, columns in GUILD_EXPORT_TABLES.items():
+                sources = [f"main.{table}"] + ([f"archive.{table}"] if table in ARCHIVED_TABLES else [])
+                for source in sources:
+                    # Table and column names come from GUILD_EXPORT_TABLES, never from input.
+                    sql = f"SELECT {', '.join(columns)} FROM {source} WHERE guild_id = ?"
+                    async with conn.execute(sql, (guild_id,)) as cursor:
+                        while rows := await cursor.fetchmany(EXPORT_FETCH_ROWS):
+                            exported += len(rows)
+                            yield "".join(
+                                json.dumps({"table": table, "row": dict(zip(columns, row))}) + "\n" for row in rows
+                            ).encode()
+        finally:
+            await conn.execute("ROLLBACK")
+            _record_query("export_guild", None, (guild_id,), started, exported)
+
+@contextlib.asynccontextmanager
+async def export_guild_file(guild_id: int, *, compress: bool = False):
+    """Writes a guild's moderation data and autoroles as NDJSON into a temporary
+    file: a header line, then one {"table", "row"} object per row, optionally
+    gzipped. Yields (file, size in bytes), the file rewound, and removes it on exit.
+    Reads through a cursor EXPORT_FETCH_ROWS at a time, so memory stays flat however
+    big the guild, and gives the reader and its snapshot back once the rows are
+    read, however long whoever reads the file takes over it."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as spool:
+        async with contextlib.aclosing(_export_lines(guild_id)) as lines:
+            async for chunk in lines:
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    await asyncio.to_thread(spool.write, chunk)
+        if compressor:
+            await asyncio.to_thread(spool.write, compressor.flush())
+        size = spool.tell()
+        spool.seek(0)
+        yield spool, size
+
+async def export_guild(guild_id: int, *, compress: bool = False) -> AsyncIterator[bytes]:
+    """Streams export_guild_file()'s file in EXPORT_STREAM_BYTES chunks. Close it
+    (contextlib.aclosing) if you stop early, so the file is removed."""
+    async with export_guild_file(guild_id, compress=compress) as (spool, _):
+        while chunk := await asyncio.to_thread(spool.read, EXPORT_STREAM_BYTES):
+            yield chunk
+
+async def _parse_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, dict]]:
+    """Yields (line_number, object) from raw NDJSON chunks, gunzipping them on the fly if gzipped."""
+    decompressor = None
+    buffer = b""
+    line_number = 0
+    first = True
+    async for chunk in chunks:
+        if first:
+            first = False
+            if chunk[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(wbits=31)
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, json.loads(line)
+    if decompressor:
+        buffer += decompressor.flush()
+    if buffer.strip():
+        yield line_number + 1, json.loads(buffer)
+
+async def _import_chunk(guild_id: int, chunk: dict[str, list[tuple]]):
+    # Not durable: chunks commit with the group-commit batches as they go, and
+    # import_guild's final step waits for the last of them.
+    async with _transaction("import_guild", guild_id=guild_id) as conn:
+        for table, rows in chunk.items():
+            columns = ("guild_id",) + GUILD_EXPORT_TABLES[table]
+            # OR IGNORE, not OR REPLACE: rows already in the database win, so
+            # re-running an import is harmless. REPLACE would also delete mod_cases
+            # rows without firing the trigger that keeps mod_cases_fts in step.
+            sql = f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            await conn.executemany(sql, [(guild_id, *row) for row in rows])
+
+async def import_guild(guild_id: int, chunks: AsyncIterable[bytes]) -> dict[str, int]:
+    """Imports an export_guild() file (plain or gzipped, as raw chunks) into guild_id,
+    committing every IMPORT_CHUNK_ROWS rows. Rows that already exist are kept.
+    Afterwards brings the guild's case counter, warning counters, cached config and
+    unban schedule up to date. Returns rows read per table. Raises ValueError on a
+    malformed file, keeping whatever chunks were already committed."""
+    counts = dict.fromkeys(GUILD_EXPORT_TABLES, 0)
+    chunk: dict[str, list[tuple]] = {}
+    pending = 0
+    header_seen = False
+
+    async for line_number, record in _parse_ndjson(chunks):
+        if not header_seen:
+            if record.get("format") != GUILD_EXPORT_FORMAT or record.get("version") != GUILD_EXPORT_VERSION:
+                raise ValueError(f"Not a version {GUILD_EXPORT_VERSION} guild export (line {line_number})")
+            header_seen = True
+            continue
+
+        table = record.get("table")
+        columns = GUILD_EXPORT_TABLES.get(table)
+        if columns is None:
+            raise ValueError(f"Unknown table {table!r} on line {line_number}")
+        try:
+            row = tuple(record["row"][column] for column in columns)
+        except (KeyError, TypeError):
+            raise ValueError(f"Malformed {table} row on line {line_number}")
+
+        chunk.setdefault(table, []).append(row)
+        counts[table] += 1
+        pending += 1
+        if pending >= IMPORT_CHUNK_ROWS:
+            await _import_chunk(guild_id, chunk)
+            chunk, pending = {}, 0
+
+    if not header_seen:
+        raise ValueError("The file is empty")
+    if chunk:
+        await _import_chunk(guild_id, chunk)
+
+    async with _transaction("import_guild_finish", durable=True, guild_id=guild_id) as conn:
+        # Imported cases may be numbered past the counter; the next case must follow them.
+        await conn.execute(
+            """
+            INSERT INTO guild_data (guild_id, case_counter)
+            VALUES (:guild_id, (SELECT COALESCE(MAX(case_number), 0) FROM mod_cases WHERE guild_id = :guild_id))
+            ON CONFLICT(guild_id) DO UPDATE SET case_counter = MAX(COALESCE(case_counter, 0), excluded.case_counter)
+            """,
+            {"guild_id": guild_id}
+        )
+        await conn.execute("DELETE FROM warning_counts WHERE guild_id = ?", (guild_id,))
+        await conn.execute(
+            """
+            INSERT INTO warning_counts (guild_id, target_id, count)
+            SELECT guild_id, target_id, COUNT(*) FROM warnings WHERE guild_id = ? GROUP BY target_id
+            """,
+            (guild_id,)
+        )
+
+    _forget_guild_config(guild_id)  # autoroles may have changed
+    rows = await _read("import_guild_temp_bans", "SELECT user_id, unban_at, case_number FROM temp_bans WHERE guild_id = ?", (guild_id,), guild_id=guild_id)
+    for user_id, unban_at, case_number in rows:
+        temp_ban_schedule.add(guild_id, user_id, unban_at, case_number)
+
+    logger.info(f"Imported {sum(counts.values())} row(s) into guild {guild_id}: {counts}")
+    return counts
+
+async def guilds_with_retention() -> list[tuple[int, int]]:
+    """(guild_id, case_retention_days) for every guild that has a retention period set."""
+    return await _read_all(
+        "guilds_with_retention",
+        "SELECT guild_id, case_retention_days FROM guild_data WHERE case_retention_days IS NOT NULL"
+    )
+
+async def archive_old_cases(guild_id: int, created_before: int) -> int:
+    """Moves up to ARCHIVE_BATCH_ROWS of the guild's cases created before
+    created_before (and their warnings) into archive.db, as one transaction.
+    Returns how many cases moved; call again until it returns 0.
+
+    The two files commit separately in WAL mode, so a crash mid-commit can leave a
+    case in both. It's copied before it's deleted, so it's never in neither, and
+    the next pass finishes the move."""
+    async with _transaction("archive_old_cases", guild_id=guild_id) as conn:
+        async with conn.execute(
+            "SELECT case_number FROM mod_cases WHERE guild_id = ? AND created_at < ? LIMIT ?",
+            (guild_id, created_before, ARCHIVE_BATCH_ROWS)
+        ) as cursor:
+            cases = [row[0] for row in await cursor.fetchall()]
+        if not cases:
+            return 0
+
+        params = {"guild_id": guild_id, "cases": json.dumps(cases)}
+        await conn.execute(
+            """
+            INSERT OR IGNORE INTO archive.mod_cases (guild_id, case_number, action, target_id, moderator_id, reason, duration, created_at)
+            SELECT guild_id, case_number, action, target_id, moderator_id, reason, duration, created_at FROM main.mod_cases
+            WHERE guild_id = :guild_id AND case_number IN (SELECT value FROM json_each(:cases))
+            """,
+            params
+        )
+        await conn.execute(
+            """
+            INSERT OR IGNORE INTO archive.warnings (guild_id, case_number, target_id, moderator_id, reason, created_at)
+            SELECT guild_id, case_number, target_id, moderator_id, reason, created_at FROM main.warnings
+            WHERE guild_id = :guild_id AND case_number IN (SELECT value FROM json_each(:cases))
+            """,
+            params
+        )
+        # Archived warnings stop counting towards escalation, same as cleared ones.
+        await conn.execute(
+            """
+            UPDATE warning_counts SET count = count - (
+                SELECT COUNT(*) FROM main.warnings AS w
+                WHERE w.guild_id = warning_counts.guild_id AND w.target_id = warning_counts.target_id
+                  AND w.case_number IN (SELECT value FROM json_each(:cases))
+            )
+            WHERE guild_id = :guild_id AND target_id IN (
+                SELECT target_id FROM main.warnings
+                WHERE guild_id = :guild_id AND case_number IN (SELECT value FROM json_each(:cases))
+            )
+            """,
+            params
+        )
+        await conn.execute("DELETE FROM warning_counts WHERE guild_id = ? AND count <= 0", (guild_id,))
+        await conn.execute(
+            "DELETE FROM main.warnings WHERE guild_id = :guild_id AND case_number IN (SELECT value FROM json_each(:cases))",
+            params
+        )
+        # Also drops them from mod_cases_fts, through its delete trigger.
+        await conn.execute(
+            "DELETE FROM main.mod_cases WHERE guild_id = :guild_id AND case_number IN (SELECT value FROM json_each(:cases))",
+            params
+        )
+    return len(cases)
+
+def last_write_at() -> float:
+    """time.monotonic() of the most recent write of any kind to any shard, 0.0 if none yet."""
+    return max(pool.writes.last_write for pool in pools)
+
+async def freelist_pages(shard: int) -> int:
+    """Unused pages in the shard's main file, which incremental_vacuum() can give back."""
+    rows = await _read_on(pools[shard], "freelist_pages", "PRAGMA main.freelist_count")
+    return rows[0][0]
+
+async def incremental_vacuum(shard: int, pages: int):
+    """Truncates up to pages free pages off the end of the shard's main file."""
+    # PRAGMA arguments can't be bound parameters; int() keeps this one a plain number.
+    sql = f"PRAGMA main.incremental_vacuum({int(pages)})"
+    started = time.perf_counter()
+    await pools[shard].writes.run_standalone(sql)
+    _record_query("incremental_vacuum", sql, None, started, 0)
+
+def database_files() -> list[tuple[str, str]]:
+    """(database, archive) file pair of every open shard, in shard order."""
+    return [(pool.path, pool.archive_path) for pool in pools]
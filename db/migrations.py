@@ -0,0 +1,336 @@
+import aiosqlite
+import logging
+import time
+
+logger = logging.getLogger("db")
+
+# Schema migrations, applied in order. A migration's version is its 1-based position
+# in this list, recorded in PRAGMA user_version once it's applied, so only append:
+# never reorder, remove, or edit one that has already shipped.
+MIGRATIONS = []
+
+
+def migration(func=None, *, transactional: bool = True):
+    """Registers a migration. Pass transactional=False for one that can't run inside
+    a transaction (VACUUM); it must then be safe to re-run if interrupted."""
+    def register(func):
+        func.transactional = transactional
+        MIGRATIONS.append(func)
+        return func
+    return register(func) if func else register
+
+
+async def run_migrations(conn: aiosqlite.Connection):
+    """Brings the schema up to date, running only the migrations this database is
+    missing, each in its own transaction. An up-to-date database costs one pragma read."""
+    async with conn.execute("PRAGMA user_version") as cursor:
+        (current,) = await cursor.fetchone()
+
+    if current > len(MIGRATIONS):
+        logger.warning(f"Database schema is at version {current}, newer than this code knows about ({len(MIGRATIONS)})")
+        return
+
+    for version, func in enumerate(MIGRATIONS[current:], start=current + 1):
+        started = time.perf_counter()
+        if not func.transactional:
+            await func(conn)
+            await conn.execute(f"PRAGMA user_version = {version}")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Applied migration {version} ({func.__name__}) in {elapsed_ms:.1f}ms")
+            continue
+
+        await conn.execute("BEGIN")
+        try:
+            await func(conn)
+            # PRAGMA arguments can't be bound parameters; version is always an int here.
+            await conn.execute(f"PRAGMA user_version = {version}")
+            await conn.execute("COMMIT")
+        except BaseException:
+            await conn.execute("ROLLBACK")
+            logger.error(f"Migration {version} ({func.__name__}) failed, rolled back")
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Applied migration {version} ({func.__name__}) in {elapsed_ms:.1f}ms")
+
+
+@migration
+async def baseline_schema(conn: aiosqlite.Connection):
+    """Everything up to the introduction of versioned migrations. Databases created
+    before then are at user_version 0 in whatever shape they were left, so the
+    legacy renames/column additions stay here, tolerant of having already run."""
+    # user_roles predates autoroles and was never read anywhere; drop it if it's still around.
+    await conn.execute("DROP TABLE IF EXISTS user_roles")
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS lobbies (
+            guild_id   INTEGER NOT NULL,
+            channel_id INTEGER PRIMARY KEY
+        )
+    """)
+
+    # Older databases still have this under its old name; rename before CREATE TABLE
+    # IF NOT EXISTS below runs, since ALTER TABLE RENAME fails if the target already exists.
+    try:
+        await conn.execute("ALTER TABLE server_settings RENAME TO guild_data")
+    except aiosqlite.OperationalError:
+        pass
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS guild_data (
+            guild_id INTEGER PRIMARY KEY,
+            embed_color TEXT,
+            updated_by INTEGER,
+            welcome_channel_id INTEGER,
+            commands_log_channel_id INTEGER,
+            moderation_log_channel_id INTEGER,
+            case_counter INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Older databases predate the commands/moderation log split and the case counter.
+    # log_channel_id becomes commands_log_channel_id; every ALTER is a no-op once applied.
+    try:
+        await conn.execute("ALTER TABLE guild_data RENAME COLUMN log_channel_id TO commands_log_channel_id")
+    except aiosqlite.OperationalError:
+        pass
+    try:
+        await conn.execute("ALTER TABLE guild_data ADD COLUMN commands_log_channel_id INTEGER")
+    except aiosqlite.OperationalError:
+        pass
+    try:
+        await conn.execute("ALTER TABLE guild_data ADD COLUMN moderation_log_channel_id INTEGER")
+    except aiosqlite.OperationalError:
+        pass
+    try:
+        await conn.execute("ALTER TABLE guild_data ADD COLUMN case_counter INTEGER NOT NULL DEFAULT 0")
+    except aiosqlite.OperationalError:
+        pass
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS autoroles (
+            guild_id INTEGER,
+            role_id INTEGER,
+            PRIMARY KEY (guild_id, role_id)
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS mod_cases (
+            guild_id INTEGER NOT NULL,
+            case_number INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            target_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            duration TEXT,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, case_number)
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS temp_bans (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            unban_at INTEGER NOT NULL,
+            case_number INTEGER,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS warnings (
+            guild_id     INTEGER NOT NULL,
+            case_number  INTEGER NOT NULL,
+            target_id    INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason       TEXT NOT NULL,
+            created_at   INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, case_number)
+        )
+    """)
+
+
+@migration
+async def moderation_indexes(conn: aiosqlite.Connection):
+    """Indexes for the per-member and due-time lookups, which otherwise scan the
+    whole table. Checked by scripts/check_query_plans.py."""
+    # count_warnings/clear_warnings are answered from the index alone; get_warnings
+    # and get_all_warnings get their ORDER BY for free from its column order.
+    await conn.execute("CREATE INDEX IF NOT EXISTS warnings_by_target ON warnings (guild_id, target_id, case_number)")
+    # Covers temp_bans_due outright, so the periodic check never touches the table.
+    await conn.execute("CREATE INDEX IF NOT EXISTS temp_bans_by_unban_at ON temp_bans (unban_at, guild_id, user_id, case_number)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS mod_cases_by_target ON mod_cases (guild_id, target_id, case_number)")
+
+
+@migration
+async def warning_counts(conn: aiosqlite.Connection):
+    """Per-member warning totals, kept in step with warnings by record_case and
+    clear_warnings so escalation reads one row instead of counting."""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS warning_counts (
+            guild_id  INTEGER NOT NULL,
+            target_id INTEGER NOT NULL,
+            count     INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, target_id)
+        ) WITHOUT ROWID
+    """)
+    await conn.execute("""
+        INSERT OR REPLACE INTO warning_counts (guild_id, target_id, count)
+        SELECT guild_id, target_id, COUNT(*) FROM warnings GROUP BY guild_id, target_id
+    """)
+
+
+@migration
+async def case_search(conn: aiosqlite.Connection):
+    """Full-text index over mod_cases reasons for /moderation search. External
+    content: the index stores only terms and points back at mod_cases by rowid,
+    and the triggers keep it in step with every insert, edit and delete."""
+    await conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS mod_cases_fts USING fts5(
+            reason,
+            content = 'mod_cases',
+            content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mod_cases_fts_insert AFTER INSERT ON mod_cases BEGIN
+            INSERT INTO mod_cases_fts (rowid, reason) VALUES (new.rowid, new.reason);
+        END
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mod_cases_fts_delete AFTER DELETE ON mod_cases BEGIN
+            INSERT INTO mod_cases_fts (mod_cases_fts, rowid, reason) VALUES ('delete', old.rowid, old.reason);
+        END
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mod_cases_fts_update AFTER UPDATE OF reason ON mod_cases BEGIN
+            INSERT INTO mod_cases_fts (mod_cases_fts, rowid, reason) VALUES ('delete', old.rowid, old.reason);
+            INSERT INTO mod_cases_fts (rowid, reason) VALUES (new.rowid, new.reason);
+        END
+    """)
+    # Backfills every existing case in one pass.
+    await conn.execute("INSERT INTO mod_cases_fts (mod_cases_fts) VALUES ('rebuild')")
+
+
+@migration
+async def case_retention(conn: aiosqlite.Connection):
+    """Per-guild retention for archive_old_cases(): cases older than this many days
+    move to archive.db. NULL keeps them in the main file forever. The index lets
+    the archiver find them without scanning the guild's whole history."""
+    await conn.execute("ALTER TABLE guild_data ADD COLUMN case_retention_days INTEGER")
+    await conn.execute("CREATE INDEX IF NOT EXISTS mod_cases_by_created_at ON mod_cases (guild_id, created_at)")
+
+
+@migration(transactional=False)
+async def incremental_vacuum(conn: aiosqlite.Connection):
+    """Switches the file to auto_vacuum=INCREMENTAL, so pages freed by archiving can
+    be handed back to the OS a few at a time (see the maintenance cog). Changing the
+    mode on an existing file takes a full VACUUM, once."""
+    async with conn.execute("PRAGMA auto_vacuum") as cursor:
+        (mode,) = await cursor.fetchone()
+    # New files are created in this mode by ConnectionPool.open_writer. A file can
+    # also already be in it because a previous run died after its VACUUM.
+    if mode != 2:
+        await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await conn.execute("VACUUM")
+    # VACUUM may renumber mod_cases rowids, which mod_cases_fts points at. Rebuilt
+    # whatever the mode, since only the recorded version says the rebuild happened.
+    await conn.execute("INSERT INTO mod_cases_fts (mod_cases_fts) VALUES ('rebuild')")
+
+
+@migration
+async def change_log(conn: aiosqlite.Connection):
+    """Which guilds' cached tables changed, in commit order, so every process with
+    the file open can drop just those cache entries (see poll_changes). Filled by
+    triggers, so writes from any tool are logged, not only the bot's. The update
+    trigger ignores case_counter, which every moderation action bumps."""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            guild_id   INTEGER NOT NULL
+        )
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS guild_data_insert_log AFTER INSERT ON guild_data BEGIN
+            INSERT INTO change_log (table_name, guild_id) VALUES ('guild_data', new.guild_id);
+        END
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS guild_data_update_log AFTER UPDATE OF
+            embed_color, welcome_channel_id, commands_log_channel_id, moderation_log_channel_id, case_retention_days
+        ON guild_data BEGIN
+            INSERT INTO change_log (table_name, guild_id) VALUES ('guild_data', new.guild_id);
+        END
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS guild_data_delete_log AFTER DELETE ON guild_data BEGIN
+            INSERT INTO change_log (table_name, guild_id) VALUES ('guild_data', old.guild_id);
+        END
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS autoroles_insert_log AFTER INSERT ON autoroles BEGIN
+            INSERT INTO change_log (table_name, guild_id) VALUES ('autoroles', new.guild_id);
+        END
+    """)
+    await conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS autoroles_delete_log AFTER DELETE ON autoroles BEGIN
+            INSERT INTO change_log (table_name, guild_id) VALUES ('autoroles', old.guild_id);
+        END
+    """)
+
+
+@migration
+async def outbox(conn: aiosqlite.Connection):
+    """Discord messages waiting to be sent (mod logs, command logs, welcomes), so
+    producers don't wait on Discord and a restart doesn't lose them. A row stays
+    until it's delivered or given up on; next_attempt_at is both the retry backoff
+    and the lease a claimed row holds while it's being sent."""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id        INTEGER NOT NULL,
+            channel_id      INTEGER NOT NULL,
+            kind            TEXT NOT NULL,
+            payload         TEXT NOT NULL,
+            attempts        INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            created_at      INTEGER NOT NULL,
+            last_error      TEXT
+        )
+    """)
+    await conn.execute("CREATE INDEX IF NOT EXISTS outbox_by_next_attempt ON outbox (next_attempt_at, id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS outbox_by_channel ON outbox (channel_id, id, next_attempt_at)")
+
+
+async def create_archive_schema(conn: aiosqlite.Connection, schema: str = "archive"):
+    """Creates the archive's tables in the attached database named schema, if missing.
+    Not a migration: archive.db is versioned with the main file's schema but can be
+    deleted or swapped independently, so this runs every time it's attached."""
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.mod_cases (
+            guild_id INTEGER NOT NULL,
+            case_number INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            target_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            duration TEXT,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, case_number)
+        )
+    """)
+    await conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.mod_cases_by_target ON mod_cases (guild_id, target_id, case_number)")
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.warnings (
+            guild_id     INTEGER NOT NULL,
+            case_number  INTEGER NOT NULL,
+            target_id    INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason       TEXT NOT NULL,
+            created_at   INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, case_number)
+        )
+    """)
@@ -0,0 +1,48 @@
+import bisect
+
+# Upper bounds, in milliseconds, of the latency histogram buckets. Fixed so that
+# recording a call is one bisect and a counter bump, however many calls pile up;
+# the last bucket catches everything slower than the largest bound.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class QueryStats:
+    """Running call count, total time, row count and latency histogram for one named query."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float, rows: int):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of calls. Capped at
+        the slowest call seen, so the open-ended last bucket still reads sensibly."""
+        if not self.calls:
+            return 0.0
+        rank = max(1, round(fraction * self.calls))
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "p50_ms": round(self.percentile(0.50), 2),
+            "p99_ms": round(self.percentile(0.99), 2),
+            "max_ms": round(self.max_ms, 2),
+            "rows": self.rows,
+        }
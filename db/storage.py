@@ -0,0 +1,606 @@
+import abc
+import asyncio
+import bisect
+import itertools
+import re
+import time
+import unicodedata
+from collections.abc import Sequence
+
+import discord
+
+from db import database
+from db.database import CaseRecord, GuildConfig, LobbyIndex, TempBanSchedule
+
+# Row shapes shared by every backend, matching the SQLite queries' column order.
+# CaseRow:    (case_number, action, target_id, moderator_id, reason, duration, created_at)
+# WarningRow: (case_number, moderator_id, reason, created_at)
+CaseRow = tuple[int, str, int, int, str, str | None, int]
+WarningRow = tuple[int, int, str, int]
+# OutboxRow:  (id, guild_id, channel_id, kind, payload, attempts)
+OutboxRow = tuple[int, int, int, str, dict, int]
+
+
+class StorageBackend(abc.ABC):
+    """Everything cogs read and write: guild settings, autoroles, lobbies, cases,
+    warnings and temp bans. The bot holds one as bot.storage; cogs go through it
+    instead of importing db.database, so the same cog code runs against SQLite or
+    entirely in memory. Row-returning methods return the same tuples either way.
+
+    SQLite-only housekeeping (archiving, vacuum, backups, export/import, query
+    stats) stays in db.database, since it has no meaning for other backends."""
+
+    async def initialize(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def warm_up(self, guild_ids: Sequence[int]) -> dict[str, int]:
+        """Bulk-loads what cogs look up per guild, before the first commands arrive.
+        Returns how many of each kind are loaded; nothing to do by default."""
+        return {}
+
+    def set_owned_shards(self, shard_count: int, first: int, last: int):
+        """Limits outbox claims to guilds on gateway shards first..last, for a bot
+        process that runs only those. A backend no other process shares owns every
+        guild anyway, so nothing to do by default."""
+
+    # Guild settings
+
+    @abc.abstractmethod
+    async def get_guild_config(self, guild_id: int | None) -> GuildConfig: ...
+
+    @abc.abstractmethod
+    async def set_embed_color(self, guild_id: int, hex_code: str, user_id: int): ...
+
+    @abc.abstractmethod
+    async def set_welcome_channel(self, guild_id: int, channel_id: int | None): ...
+
+    @abc.abstractmethod
+    async def set_commands_log_channel(self, guild_id: int, channel_id: int | None): ...
+
+    @abc.abstractmethod
+    async def set_moderation_log_channel(self, guild_id: int, channel_id: int | None): ...
+
+    @abc.abstractmethod
+    async def set_case_retention(self, guild_id: int, days: int | None): ...
+
+    async def get_embed_color(self, guild_id: int) -> str | None:
+        return (await self.get_guild_config(guild_id)).embed_color
+
+    async def get_guild_embed_color(self, guild_id: int | None) -> discord.Color:
+        return (await self.get_guild_config(guild_id)).color
+
+    async def get_welcome_channel(self, guild_id: int) -> int | None:
+        return (await self.get_guild_config(guild_id)).welcome_channel_id
+
+    async def get_commands_log_channel(self, guild_id: int) -> int | None:
+        return (await self.get_guild_config(guild_id)).commands_log_channel_id
+
+    async def get_moderation_log_channel(self, guild_id: int) -> int | None:
+        return (await self.get_guild_config(guild_id)).moderation_log_channel_id
+
+    # Autoroles
+
+    @abc.abstractmethod
+    async def add_autorole(self, guild_id: int, role_id: int): ...
+
+    @abc.abstractmethod
+    async def remove_autorole(self, guild_id: int, role_id: int): ...
+
+    async def get_autoroles(self, guild_id: int) -> list[int]:
+        return list((await self.get_guild_config(guild_id)).autoroles)
+
+    # Lobbies
+
+    @abc.abstractmethod
+    async def lobby_add(self, guild_id: int, channel_id: int): ...
+
+    @abc.abstractmethod
+    async def lobby_delete(self, channel_id: int): ...
+
+    @abc.abstractmethod
+    async def load_lobbies(self): ...
+
+    @abc.abstractmethod
+    def lobby_is_tracked(self, channel_id: int) -> bool: ...
+
+    @abc.abstractmethod
+    def tracked_lobbies(self) -> list[tuple[int, int]]: ...
+
+    # Cases
+
+    @abc.abstractmethod
+    async def record_case(
+        self, guild_id: int, action: str, target_id: int, moderator_id: int, reason: str, duration: str | None = None, *,
+        warning: bool = False, unban_at: int | None = None, lift_temp_ban: bool = False,
+    ) -> CaseRecord: ...
+
+    @abc.abstractmethod
+    async def get_case_history(
+        self, guild_id: int, target_id: int, before_case: int | None = None, limit: int = 10, *, include_archive: bool = False,
+    ) -> list[tuple]: ...
+
+    @abc.abstractmethod
+    async def get_cases_from(
+        self, guild_id: int, case_number: int, limit: int = 2, *, include_archive: bool = False,
+    ) -> list[CaseRow]: ...
+
+    @abc.abstractmethod
+    async def search_cases(
+        self, guild_id: int, text: str, *, action: str | None = None, target_id: int | None = None,
+        since: int | None = None, offset: int = 0, limit: int = 10,
+    ) -> list[tuple]: ...
+
+    @abc.abstractmethod
+    async def reset_case_counter(self, guild_id: int): ...
+
+    # Temp bans
+
+    @abc.abstractmethod
+    async def temp_ban_remove(self, guild_id: int, user_id: int): ...
+
+    @abc.abstractmethod
+    async def load_temp_bans(self): ...
+
+    @abc.abstractmethod
+    def next_temp_ban_at(self) -> int | None: ...
+
+    @abc.abstractmethod
+    def pop_due_temp_bans(self, now_ts: float) -> list[tuple[int, int, int | None]]: ...
+
+    @abc.abstractmethod
+    async def wait_for_temp_ban_change(self, timeout: float | None): ...
+
+    # Outbox
+
+    @abc.abstractmethod
+    async def outbox_enqueue(self, guild_id: int, channel_id: int, kind: str, payload: dict, batch_window: float = 0.0): ...
+
+    @abc.abstractmethod
+    async def outbox_claim(self, limit: int) -> list[OutboxRow]: ...
+
+    @abc.abstractmethod
+    async def outbox_done(self, guild_id: int, message_id: int): ...
+
+    @abc.abstractmethod
+    async def outbox_retry(self, guild_id: int, message_id: int, delay: float, error: str): ...
+
+    @abc.abstractmethod
+    async def next_outbox_at(self) -> float | None: ...
+
+    @abc.abstractmethod
+    async def wait_for_outbox(self, timeout: float | None): ...
+
+    # Warnings
+
+    @abc.abstractmethod
+    async def get_warnings(self, guild_id: int, target_id: int, after_case: int = 0, limit: int = 10) -> list[WarningRow]: ...
+
+    @abc.abstractmethod
+    async def count_warnings(self, guild_id: int, target_id: int) -> int: ...
+
+    @abc.abstractmethod
+    async def get_warning_counts(self, guild_id: int, after_target: int = 0, limit: int = 10) -> list[tuple[int, int]]: ...
+
+    @abc.abstractmethod
+    async def clear_warnings(self, guild_id: int, target_id: int) -> int: ...
+
+
+class SqliteBackend(StorageBackend):
+    """The bot's real storage: thin forwarding to db.database. Looked up on the
+    module at call time, so a hot reload of db.database takes effect here too."""
+
+    def __init__(self, path: str | None = None, archive_path: str | None = None, shards: int | None = None):
+        self.path = path
+        self.archive_path = archive_path
+        self.shards = shards
+
+    async def initialize(self):
+        await database.initialize_databases(self.path, self.archive_path, self.shards)
+
+    async def close(self):
+        await database.close_all_databases()
+
+    async def warm_up(self, guild_ids):
+        return await database.warm_up(guild_ids)
+
+    async def get_guild_config(self, guild_id):
+        return await database.get_guild_config(guild_id)
+
+    async def set_embed_color(self, guild_id, hex_code, user_id):
+        await database.set_embed_color(guild_id, hex_code, user_id)
+
+    async def set_welcome_channel(self, guild_id, channel_id):
+        await database.set_welcome_channel(guild_id, channel_id)
+
+    async def set_commands_log_channel(self, guild_id, channel_id):
+        await database.set_commands_log_channel(guild_id, channel_id)
+
+    async def set_moderation_log_channel(self, guild_id, channel_id):
+        await database.set_moderation_log_channel(guild_id, channel_id)
+
+    async def set_case_retention(self, guild_id, days):
+        await database.set_case_retention(guild_id, days)
+
+    async def add_autorole(self, guild_id, role_id):
+        await database.add_autorole(guild_id, role_id)
+
+    async def remove_autorole(self, guild_id, role_id):
+        await database.remove_autorole(guild_id, role_id)
+
+    async def lobby_add(self, guild_id, channel_id):
+        await database.lobby_add(guild_id, channel_id)
+
+    async def lobby_delete(self, channel_id):
+        await database.lobby_delete(channel_id)
+
+    async def load_lobbies(self):
+        await database.load_lobbies()
+
+    def lobby_is_tracked(self, channel_id):
+        return database.lobby_is_tracked(channel_id)
+
+    def tracked_lobbies(self):
+        return database.tracked_lobbies()
+
+    async def record_case(self, guild_id, action, target_id, moderator_id, reason, duration=None, **options):
+        return await database.record_case(guild_id, action, target_id, moderator_id, reason, duration, **options)
+
+    async def get_case_history(self, guild_id, target_id, before_case=None, limit=10, *, include_archive=False):
+        return await database.get_case_history(guild_id, target_id, before_case, limit, include_archive=include_archive)
+
+    async def get_cases_from(self, guild_id, case_number, limit=2, *, include_archive=False):
+        return await database.get_cases_from(guild_id, case_number, limit, include_archive=include_archive)
+
+    async def search_cases(self, guild_id, text, **filters):
+        return await database.search_cases(guild_id, text, **filters)
+
+    async def reset_case_counter(self, guild_id):
+        await database.reset_case_counter(guild_id)
+
+    async def temp_ban_remove(self, guild_id, user_id):
+        await database.temp_ban_remove(guild_id, user_id)
+
+    async def load_temp_bans(self):
+        await database.load_temp_bans()
+
+    def next_temp_ban_at(self):
+        return database.next_temp_ban_at()
+
+    def pop_due_temp_bans(self, now_ts):
+        return database.pop_due_temp_bans(now_ts)
+
+    async def wait_for_temp_ban_change(self, timeout):
+        await database.wait_for_temp_ban_change(timeout)
+
+    def set_owned_shards(self, shard_count, first, last):
+        database.set_owned_shards(shard_count, first, last)
+
+    async def outbox_enqueue(self, guild_id, channel_id, kind, payload, batch_window=0.0):
+        await database.outbox_enqueue(guild_id, channel_id, kind, payload, batch_window)
+
+    async def outbox_claim(self, limit):
+        return await database.outbox_claim(limit)
+
+    async def outbox_done(self, guild_id, message_id):
+        await database.outbox_done(guild_id, message_id)
+
+    async def outbox_retry(self, guild_id, message_id, delay, error):
+        await database.outbox_retry(guild_id, message_id, delay, error)
+
+    async def next_outbox_at(self):
+        return await database.next_outbox_at()
+
+    async def wait_for_outbox(self, timeout):
+        await database.wait_for_outbox(timeout)
+
+    async def get_warnings(self, guild_id, target_id, after_case=0, limit=10):
+        return await database.get_warnings(guild_id, target_id, after_case, limit)
+
+    async def count_warnings(self, guild_id, target_id):
+        return await database.count_warnings(guild_id, target_id)
+
+    async def get_warning_counts(self, guild_id, after_target=0, limit=10):
+        return await database.get_warning_counts(guild_id, after_target, limit)
+
+    async def clear_warnings(self, guild_id, target_id):
+        return await database.clear_warnings(guild_id, target_id)
+
+
+_WORD = re.compile(r"\w+")
+# Words either side of the first match kept in a search snippet, like snippet()'s 24-token window.
+SNIPPET_WORDS = 24
+
+
+def _fold(text: str) -> str:
+    """Case- and accent-insensitive form of text, as the FTS index's unicode61
+    tokenizer with remove_diacritics sees it."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _search_terms(text: str) -> list[tuple[str, ...]]:
+    """Each word, or "quoted phrase", of text as a tuple of folded words."""
+    terms = []
+    for phrase, word in database._SEARCH_TERM.findall(text):
+        words = tuple(_WORD.findall(_fold(phrase or word)))
+        if words:
+            terms.append(words)
+    return terms
+
+
+def _find_phrase(words: Sequence[str], phrase: tuple[str, ...]) -> int:
+    """Index of the first occurrence of phrase in words, or -1."""
+    size = len(phrase)
+    for i in range(len(words) - size + 1):
+        if tuple(words[i:i + size]) == phrase:
+            return i
+    return -1
+
+
+def _snippet(reason: str, terms: list[tuple[str, ...]], first: int) -> str:
+    """reason around its first match (the word at index first), matched words in
+    bold and the rest cut off with an ellipsis, like FTS5's snippet()."""
+    spans = [(m.start(), m.end()) for m in _WORD.finditer(reason)]
+    wanted = {word for term in terms for word in term}
+    begin = max(0, min(first - SNIPPET_WORDS // 4, len(spans) - SNIPPET_WORDS))
+    end = min(len(spans), begin + SNIPPET_WORDS)
+    out = ["…"] if begin > 0 else []
+    cursor = 0 if begin == 0 else spans[begin][0]
+    for start, stop in spans[begin:end]:
+        word = reason[start:stop]
+        out.append(reason[cursor:start])
+        out.append(f"**{word}**" if _fold(word) in wanted else word)
+        cursor = stop
+    out.append(reason[cursor:] if end == len(spans) else "…")
+    return "".join(out)
+
+
+class MemoryBackend(StorageBackend):
+    """Everything in dicts, indexed the way the SQLite schema is: cases by guild and
+    by (guild, member) in case order, warnings by guild then member, temp bans by
+    (guild, member). Nothing touches disk and nothing survives the process, which is
+    the point: tests and benchmarks run with no file, and scripts/bench_storage.py
+    runs the same load against both backends. There's no archive, so
+    include_archive changes nothing, and search is a plain word match ranked by
+    hits rather than bm25."""
+
+    def __init__(self):
+        self._guilds: dict[int, dict] = {}  # guild_id -> guild_data columns that have been set
+        self._autoroles: dict[int, dict[int, None]] = {}  # guild_id -> role IDs, in insertion order
+        self._lobbies = LobbyIndex()
+        self._lobbies.loaded = True
+        self._cases: dict[int, list[CaseRow]] = {}  # guild_id -> rows by case number
+        self._member_cases: dict[tuple[int, int], list[CaseRow]] = {}  # (guild_id, target_id) -> rows by case number
+        # Search index, standing in for mod_cases_fts: each case's folded words, and
+        # for each guild, which cases every word appears in.
+        self._case_words: dict[tuple[int, int], list[str]] = {}  # (guild_id, case_number) -> words in order
+        self._word_index: dict[int, dict[str, set[int]]] = {}  # guild_id -> word -> case numbers
+        self._warnings: dict[int, dict[int, list[WarningRow]]] = {}  # guild_id -> target_id -> rows by case number
+        self._temp_bans: dict[tuple[int, int], tuple[int, int | None]] = {}  # (guild_id, user_id) -> (unban_at, case_number)
+        self._schedule = TempBanSchedule()
+        # id -> [guild_id, channel_id, kind, payload, attempts, next_attempt_at], in id order.
+        self._outbox: dict[int, list] = {}
+        self._outbox_ids = itertools.count(1)
+        self._outbox_ready = asyncio.Event()
+
+    def _set(self, guild_id: int, **columns):
+        self._guilds.setdefault(guild_id, {}).update(columns)
+
+    async def get_guild_config(self, guild_id):
+        row = self._guilds.get(guild_id, {})
+        return GuildConfig(
+            guild_id=guild_id,
+            embed_color=row.get("embed_color"),
+            welcome_channel_id=row.get("welcome_channel_id"),
+            commands_log_channel_id=row.get("commands_log_channel_id"),
+            moderation_log_channel_id=row.get("moderation_log_channel_id"),
+            case_retention_days=row.get("case_retention_days"),
+            autoroles=tuple(self._autoroles.get(guild_id, ())),
+        )
+
+    async def set_embed_color(self, guild_id, hex_code, user_id):
+        self._set(guild_id, embed_color=hex_code, updated_by=user_id)
+
+    async def set_welcome_channel(self, guild_id, channel_id):
+        self._set(guild_id, welcome_channel_id=channel_id)
+
+    async def set_commands_log_channel(self, guild_id, channel_id):
+        self._set(guild_id, commands_log_channel_id=channel_id)
+
+    async def set_moderation_log_channel(self, guild_id, channel_id):
+        self._set(guild_id, moderation_log_channel_id=channel_id)
+
+    async def set_case_retention(self, guild_id, days):
+        self._set(guild_id, case_retention_days=days)
+
+    async def add_autorole(self, guild_id, role_id):
+        self._autoroles.setdefault(guild_id, {})[role_id] = None
+
+    async def remove_autorole(self, guild_id, role_id):
+        self._autoroles.get(guild_id, {}).pop(role_id, None)
+
+    async def lobby_add(self, guild_id, channel_id):
+        self._lobbies.add(guild_id, channel_id)
+
+    async def lobby_delete(self, channel_id):
+        self._lobbies.discard(channel_id)
+
+    async def load_lobbies(self):
+        pass
+
+    def lobby_is_tracked(self, channel_id):
+        return channel_id in self._lobbies
+
+    def tracked_lobbies(self):
+        return self._lobbies.items()
+
+    async def record_case(
+        self, guild_id, action, target_id, moderator_id, reason, duration=None, *,
+        warning=False, unban_at=None, lift_temp_ban=False,
+    ):
+        config = await self.get_guild_config(guild_id)
+        guild = self._guilds.setdefault(guild_id, {})
+        case_number = guild["case_counter"] = guild.get("case_counter", 0) + 1
+        now = int(time.time())
+
+        row = (case_number, action, target_id, moderator_id, reason, duration, now)
+        self._cases.setdefault(guild_id, []).append(row)
+        self._member_cases.setdefault((guild_id, target_id), []).append(row)
+        words = self._case_words[(guild_id, case_number)] = [_fold(word) for word in _WORD.findall(reason)]
+        index = self._word_index.setdefault(guild_id, {})
+        for word in set(words):
+            index.setdefault(word, set()).add(case_number)
+
+        warning_count = None
+        if warning:
+            warnings = self._warnings.setdefault(guild_id, {}).setdefault(target_id, [])
+            warnings.append((case_number, moderator_id, reason, now))
+            warning_count = len(warnings)
+
+        if unban_at is not None:
+            self._temp_bans[(guild_id, target_id)] = (unban_at, case_number)
+            self._schedule.add(guild_id, target_id, unban_at, case_number)
+        elif lift_temp_ban:
+            self._temp_bans.pop((guild_id, target_id), None)
+            self._schedule.remove(guild_id, target_id)
+
+        return CaseRecord(
+            case_number=case_number,
+            warning_count=warning_count,
+            log_channel_id=config.moderation_log_channel_id,
+            color=config.color,
+        )
+
+    async def get_case_history(self, guild_id, target_id, before_case=None, limit=10, *, include_archive=False):
+        rows = self._member_cases.get((guild_id, target_id), [])
+        end = len(rows) if before_case is None else bisect.bisect_left(rows, before_case, key=lambda r: r[0])
+        return [
+            (case_number, action, moderator_id, reason, duration, created_at)
+            for case_number, action, _, moderator_id, reason, duration, created_at in reversed(rows[max(0, end - limit):end])
+        ]
+
+    async def get_cases_from(self, guild_id, case_number, limit=2, *, include_archive=False):
+        rows = self._cases.get(guild_id, [])
+        end = bisect.bisect_right(rows, case_number, key=lambda r: r[0])
+        return rows[max(0, end - limit):end][::-1]
+
+    async def search_cases(self, guild_id, text, *, action=None, target_id=None, since=None, offset=0, limit=10):
+        terms = _search_terms(text)
+        index = self._word_index.get(guild_id)
+        if not terms or index is None:
+            return []
+        try:
+            candidates = set.intersection(*(index[word] for term in terms for word in term))
+        except KeyError:
+            return []  # some word is in no case at all
+
+        rows = self._cases[guild_id]
+        matches = []
+        for case_number in candidates:
+            row = rows[bisect.bisect_left(rows, case_number, key=lambda r: r[0])]
+            _, case_action, case_target, _, _, _, created_at = row
+            if (action is not None and case_action != action) or (target_id is not None and case_target != target_id):
+                continue
+            if since is not None and created_at < since:
+                continue
+            words = self._case_words[(guild_id, case_number)]
+            # The index only says every word is there; phrases still need them in order.
+            starts = [_find_phrase(words, term) if len(term) > 1 else words.index(term[0]) for term in terms]
+            if -1 in starts:
+                continue
+            hits = sum(words.count(word) for term in terms for word in term)
+            matches.append((-hits, -case_number, row, min(starts)))
+
+        matches.sort(key=lambda match: match[:2])
+        return [
+            (case_number, case_action, case_target, moderator_id, _snippet(reason, terms, first), created_at)
+            for _, _, (case_number, case_action, case_target, moderator_id, reason, _, created_at), first
+            in matches[offset:offset + limit]
+        ]
+
+    async def reset_case_counter(self, guild_id):
+        for case_number, *_ in self._cases.pop(guild_id, ()):
+            del self._case_words[(guild_id, case_number)]
+        self._word_index.pop(guild_id, None)
+        for key in [key for key in self._member_cases if key[0] == guild_id]:
+            del self._member_cases[key]
+        self._set(guild_id, case_counter=0)
+
+    async def temp_ban_remove(self, guild_id, user_id):
+        self._schedule.remove(guild_id, user_id)
+        self._temp_bans.pop((guild_id, user_id), None)
+
+    async def load_temp_bans(self):
+        self._schedule.load([
+            (guild_id, user_id, unban_at, case_number)
+            for (guild_id, user_id), (unban_at, case_number) in self._temp_bans.items()
+        ])
+
+    def next_temp_ban_at(self):
+        return self._schedule.next_deadline()
+
+    def pop_due_temp_bans(self, now_ts):
+        return self._schedule.pop_due(now_ts)
+
+    async def wait_for_temp_ban_change(self, timeout):
+        await self._schedule.wait_for_change(timeout)
+
+    async def outbox_enqueue(self, guild_id, channel_id, kind, payload, batch_window=0.0):
+        self._outbox[next(self._outbox_ids)] = [guild_id, channel_id, kind, payload, 0, database._outbox_due(batch_window)]
+        self._outbox_ready.set()
+
+    async def outbox_claim(self, limit):
+        now = time.time()
+        held = set()  # channels with an older message waiting on a retry or its lease
+        due = []
+        for id_, entry in self._outbox.items():
+            if entry[5] > now:
+                held.add(entry[1])
+            elif entry[1] not in held:
+                due.append((entry[5], id_))
+        due = sorted(due)[:limit]
+        claimed = []
+        for _, id_ in sorted(due, key=lambda item: item[1]):
+            entry = self._outbox[id_]
+            entry[4] += 1
+            entry[5] = now + database.OUTBOX_LEASE_SECONDS
+            claimed.append((id_, *entry[:5]))
+        return claimed
+
+    async def outbox_done(self, guild_id, message_id):
+        self._outbox.pop(message_id, None)
+
+    async def outbox_retry(self, guild_id, message_id, delay, error):
+        entry = self._outbox.get(message_id)
+        if entry is not None:
+            entry[5] = time.time() + delay
+
+    async def next_outbox_at(self):
+        return min((entry[5] for entry in self._outbox.values()), default=None)
+
+    async def wait_for_outbox(self, timeout):
+        try:
+            await asyncio.wait_for(self._outbox_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._outbox_ready.clear()
+
+    async def get_warnings(self, guild_id, target_id, after_case=0, limit=10):
+        rows = self._warnings.get(guild_id, {}).get(target_id, [])
+        start = bisect.bisect_right(rows, after_case, key=lambda r: r[0])
+        return rows[start:start + limit]
+
+    async def count_warnings(self, guild_id, target_id):
+        return len(self._warnings.get(guild_id, {}).get(target_id, ()))
+
+    async def get_warning_counts(self, guild_id, after_target=0, limit=10):
+        members = self._warnings.get(guild_id, {})
+        targets = sorted(members)
+        start = bisect.bisect_right(targets, after_target)
+        return [(target, len(members[target])) for target in targets[start:start + limit]]
+
+    async def clear_warnings(self, guild_id, target_id):
+        return len(self._warnings.get(guild_id, {}).pop(target_id, ()))
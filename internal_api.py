@@ -3,11 +3,14 @@ import json
 import logging
 import math
 import os
+from datetime import datetime, timezone
 
 import uvicorn
 from fastapi import FastAPI, Body
 from fastapi.responses import StreamingResponse
 
+from db.database import export_guild, query_stats_snapshot
+from utils.cluster import INTERNAL_API_BASE_PORT, cluster_member
 from utils.cogs import discover_cog_paths, reload_shared_modules
 from utils.log import quiet_uvicorn_logging
 from utils.uptime import format_uptime
@@ -55,6 +58,8 @@ def create_internal_app(bot, state):
             "bot_avatar_url": str(bot.user.display_avatar.url) if bot.user else None,
             "latency_ms": _latency_ms(bot) if ready else None,
             "guild_count": len(bot.guilds) if ready else None,
+            "shard_count": bot.shard_count,
+            "shards": bot.shard_health.snapshot(bot),
             "uptime": format_uptime(bot.launch_time),
             "launch_time": bot.launch_time.timestamp() if ready else None,
         }
@@ -65,6 +70,7 @@ def create_internal_app(bot, state):
             last_latency = "unset"
             last_guild_count = "unset"
             last_ready = "unset"
+            last_shards = "unset"
             while True:
                 changed = False
 
@@ -87,6 +93,13 @@ def create_internal_app(bot, state):
                     changed = True
                     yield f"event: guilds\ndata: {guild_count if guild_count is not None else ''}\n\n"
 
+                # Per shard, so one degraded shard shows up instead of vanishing into the averaged latency above.
+                shards = bot.shard_health.snapshot(bot)
+                if shards != last_shards:
+                    last_shards = shards
+                    changed = True
+                    yield f"event: shards\ndata: {json.dumps(shards)}\n\n"
+
                 if not changed:
                     yield ": keepalive\n\n"
 
@@ -125,6 +138,36 @@ def create_internal_app(bot, state):
             )
         }
 
+    @app.get("/guilds/{guild_id}/export")
+    async def export_guild_data(guild_id: int):
+        filename = f"guild-{guild_id}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.ndjson.gz"
+        return StreamingResponse(export_guild(guild_id, compress=True), media_type="application/gzip", headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        })
+
+    @app.get("/db/stats")
+    async def db_stats():
+        return {"queries": query_stats_snapshot()}
+
+    @app.get("/rest/stats")
+    async def rest_stats():
+        return bot.rest.snapshot()
+
+    @app.get("/db/backup")
+    async def backup_status():
+        backups = bot.get_cog("Backups")
+        if backups is None:
+            return {"backup": None, "error": "Backups cog isn't loaded"}
+        return {"backup": backups.progress.to_dict() if backups.progress else None, "error": None}
+
+    @app.post("/db/backup")
+    async def start_backup():
+        # Returns straight away; the dashboard polls GET /db/backup for progress.
+        backups = bot.get_cog("Backups")
+        if backups is None:
+            return {"backup": None, "error": "Backups cog isn't loaded"}
+        return {"backup": backups.start_backup("dashboard").to_dict(), "error": None}
+
     @app.post("/cogs/reload/{extension:path}")
     async def reload_cog(extension: str):
         error = None
@@ -227,7 +270,8 @@ def create_internal_app(bot, state):
 async def start(bot):
     state = InternalState()
     app = create_internal_app(bot, state)
-    config = uvicorn.Config(app, host="127.0.0.1", port=8001, log_config=None)
+    # One port per cluster member, so run.py's dashboard can reach each of them.
+    config = uvicorn.Config(app, host="127.0.0.1", port=INTERNAL_API_BASE_PORT + cluster_member(), log_config=None)
     quiet_uvicorn_logging()
     server = uvicorn.Server(config)
     state.server = server
@@ -4,8 +4,13 @@ import os
 import signal
 import subprocess
 import sys
+import time
+
+import aiohttp
+from dotenv import load_dotenv
 
 import web
+from utils.cluster import check_cluster_config, cluster_size, internal_api_url
 from utils.log import RawConsoleSink, setup_logging
 
 
@@ -42,21 +47,42 @@ setup_logging()
 logger = logging.getLogger("run")
 
 
-class BotSupervisor:
-    """Owns the bot.py child process: spawns it, watches it, and decides whether
-    a dead child gets restarted (crash) or left alone (clean exit / user stop)."""
+# A crashed bot process is restarted after this many seconds, doubling with each
+# crash in a row up to the cap. One that stayed up this long starts over from the base.
+RESTART_DELAY = 5
+RESTART_DELAY_MAX = 5 * 60
+RESTART_RESET_SECONDS = 60
+# Cluster members start one after another, each once the one before it has all its
+# shards ready (or after this long regardless): only the first runs the database
+# migrations, and the members' shards don't all IDENTIFY with Discord at once.
+MEMBER_START_TIMEOUT = 5 * 60
 
-    def __init__(self, sink, host_stdout):
+
+class ClusterMember:
+    """Owns one bot.py child process: spawns it, watches it, and decides whether
+    a dead child gets restarted (crash) or left alone (clean exit / user stop).
+    Without clustering there's just the one, running every shard."""
+
+    def __init__(self, index, size, sink, host_stdout):
+        self.index = index
+        self.size = size
         self.process = None
         self.status = "stopped"  # stopped | stopping | running | crashed_retrying
         self.sink = sink
         self.host_stdout = host_stdout
+        self.crashes = 0  # in a row, for the restart backoff
+        self._spawned_at = 0.0
         self._lock = asyncio.Lock()
 
+    @property
+    def name(self):
+        return "bot" if self.size == 1 else f"cluster member {self.index}"
+
     async def start(self):
         async with self._lock:
             if self.status in ("running", "crashed_retrying"):
                 return False
+            self.crashes = 0
             await self._spawn()
             return True
 
@@ -75,37 +101,48 @@ class BotSupervisor:
             self.process = None
             return True
 
-    async def restart(self):
-        await self.stop()
-        await self.start()
-
     async def _spawn(self):
         creationflags = subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == "win32" else 0
-        logger.info("Starting bot...")
+        logger.info(f"Starting {self.name}...")
         # Piped (not a real console) means PEP 528's UTF-8-for-console default no
         # longer applies; force UTF-8 explicitly to match what the sink expects.
-        env = {**os.environ, "PYTHONIOENCODING": "utf-8"}
+        env = {**os.environ, "PYTHONIOENCODING": "utf-8", "CLUSTER_MEMBER": str(self.index)}
         self.process = await asyncio.create_subprocess_exec(
             sys.executable, "bot.py", creationflags=creationflags, env=env,
             stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
         )
         self.status = "running"
+        self._spawned_at = time.monotonic()
         asyncio.create_task(self._pump_output(self.process))
         asyncio.create_task(self._watch(self.process))
 
     async def _pump_output(self, proc):
         """Forwards bot.py's merged stdout+stderr to the real host stdout and to
-        the raw console sink. Reads in chunks, not lines, to preserve \\r bytes."""
+        the raw console sink. Reads in chunks, not lines, to preserve \\r bytes.
+        With several members, only whole lines are written, so their output
+        doesn't interleave mid-line."""
+        pending = b""
         try:
             while True:
                 chunk = await proc.stdout.read(4096)
                 if not chunk:
                     break
-                self.host_stdout.buffer.write(chunk)
-                self.host_stdout.buffer.flush()
-                self.sink.write(chunk)
+                if self.size > 1:
+                    pending += chunk
+                    end = pending.rfind(b"\n") + 1
+                    chunk, pending = pending[:end], pending[end:]
+                    if not chunk:
+                        continue
+                self._write(chunk)
+            if pending:
+                self._write(pending)
         except Exception:
-            logger.exception("Error pumping bot.py output")
+            logger.exception(f"Error pumping {self.name} output")
+
+    def _write(self, chunk):
+        self.host_stdout.buffer.write(chunk)
+        self.host_stdout.buffer.flush()
+        self.sink.write(chunk)
 
     async def _watch(self, proc):
         returncode = await proc.wait()
@@ -120,20 +157,93 @@ class BotSupervisor:
             return
 
         if returncode == 0:
-            logger.info("Bot stopped cleanly (exit code 0). Not restarting.")
+            logger.info(f"{self.name.capitalize()} stopped cleanly (exit code 0). Not restarting.")
             self.status = "stopped"
             self.process = None
             return
 
-        logger.warning(f"Bot stopped (exit code {returncode}). Restarting in 5 seconds...")
+        if time.monotonic() - self._spawned_at >= RESTART_RESET_SECONDS:
+            self.crashes = 0
+        delay = min(RESTART_DELAY_MAX, RESTART_DELAY * 2 ** self.crashes)
+        self.crashes += 1
+        logger.warning(f"{self.name.capitalize()} stopped (exit code {returncode}). Restarting in {delay} seconds...")
         self.status = "crashed_retrying"
         self.process = None
-        await asyncio.sleep(5)
+        await asyncio.sleep(delay)
         async with self._lock:
             if self.status == "crashed_retrying":
                 await self._spawn()
 
 
+class BotSupervisor:
+    """Owns the bot processes: a single bot.py, or in cluster mode (CLUSTER_SIZE
+    above 1) that many members, each running its own contiguous run of SHARD_COUNT
+    shards with its internal API on its own port. Each member restarts on its own
+    after a crash; start, stop and restart apply to all of them."""
+
+    def __init__(self, sink, host_stdout):
+        size = cluster_size()
+        self.members = [ClusterMember(index, size, sink, host_stdout) for index in range(size)]
+        self._starting = None  # starts the members after the first, one by one
+        self._lock = asyncio.Lock()
+
+    @property
+    def status(self):
+        """One status for the lot, in the single-process vocabulary the dashboard knows."""
+        statuses = {member.status for member in self.members}
+        if "stopping" in statuses:
+            return "stopping"
+        if statuses == {"stopped"} and not self._start_pending():
+            return "stopped"
+        if "crashed_retrying" in statuses and "running" not in statuses:
+            return "crashed_retrying"
+        return "running"
+
+    def _start_pending(self):
+        return self._starting is not None and not self._starting.done()
+
+    async def start(self):
+        async with self._lock:
+            if self.status in ("running", "crashed_retrying"):
+                return False
+            await self.members[0].start()
+            if len(self.members) > 1:
+                self._starting = asyncio.create_task(self._start_rest())
+            return True
+
+    async def _start_rest(self):
+        for previous, member in zip(self.members, self.members[1:]):
+            if not await _wait_until_ready(previous.index, MEMBER_START_TIMEOUT):
+                logger.warning(f"{previous.name.capitalize()} isn't ready after {MEMBER_START_TIMEOUT}s; starting {member.name} anyway")
+            await member.start()
+
+    async def stop(self):
+        async with self._lock:
+            if self._start_pending():
+                self._starting.cancel()
+            stopped = await asyncio.gather(*(member.stop() for member in self.members))
+            return any(stopped)
+
+    async def restart(self):
+        await self.stop()
+        await self.start()
+
+
+async def _wait_until_ready(member, timeout):
+    """Polls a member's internal API until all its shards are ready. False on timeout."""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=2, sock_connect=0.5)) as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{internal_api_url(member)}/status") as resp:
+                    if resp.status == 200 and (await resp.json()).get("ready"):
+                        return True
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(1)
+    return False
+
+
 async def _terminate(proc):
     if sys.platform == "win32":
         # bot.py is spawned in its own process group specifically so it can be
@@ -163,6 +273,8 @@ class WebState:
 
 
 async def main():
+    load_dotenv()
+    check_cluster_config()
     supervisor = BotSupervisor(_console_sink, _real_stdout)
     web_state = WebState()
     await supervisor.start()
@@ -0,0 +1,166 @@
+"""Run the same synthetic load against the SQLite and in-memory storage backends.
+
+This is a dev tool, not part of the running bot. It drives each backend in
+``db/storage.py`` through the operations cogs use most (recording cases and
+warnings, paging history and warnings, searching reasons, settings lookups,
+lobby churn), with many operations in flight at once as in the bot, and prints
+throughput and latency per operation side by side. The SQLite backend runs on
+a throwaway database in a temp directory; the in-memory one touches no disk.
+
+Run it from anywhere:
+
+    py -3.13 scripts/bench_storage.py [--guilds 20] [--cases 20000] [--concurrency 64] [--backend sqlite|memory] [--shards 1]
+
+Exit codes:
+    0  benchmark finished
+    1  something went wrong
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+from db.storage import MemoryBackend, SqliteBackend, StorageBackend  # noqa: E402
+
+ACTIONS = ("Ban", "Kick", "Mute", "Warn")
+WORDS = (
+    "spam", "scam", "links", "raid", "slurs", "harassment", "advertising", "nsfw", "alt", "account",
+    "evading", "mute", "flooding", "mentions", "toxicity", "impersonation", "phishing", "bot", "repeated", "warnings",
+)
+
+
+def _reason(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+
+
+async def _run(label: str, ops: list[Callable[[], Awaitable]], concurrency: int) -> dict:
+    """Runs every op with up to concurrency in flight, timing each one."""
+    latencies: list[float] = []
+    queue = iter(ops)
+
+    async def worker():
+        for op in queue:
+            started = time.perf_counter()
+            await op()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "op": label,
+        "count": len(latencies),
+        "ops_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+
+async def bench(storage: StorageBackend, args: argparse.Namespace) -> list[dict]:
+    rng = random.Random(args.seed)
+    # Snowflake-shaped, so they spread over shards the way real guild IDs do.
+    guilds = [rng.randrange(10**12, 2 * 10**12) << 22 for _ in range(args.guilds)]
+    members = {guild: [guild + 1 + i for i in range(args.members)] for guild in guilds}
+    results = []
+
+    def record_op():
+        guild = rng.choice(guilds)
+        target = rng.choice(members[guild])
+        action = rng.choice(ACTIONS)
+        return lambda: storage.record_case(guild, action, target, 42, _reason(rng), warning=action == "Warn")
+
+    results.append(await _run("record_case", [record_op() for _ in range(args.cases)], args.concurrency))
+
+    def pick():
+        guild = rng.choice(guilds)
+        return guild, rng.choice(members[guild])
+
+    reads = args.cases // 2
+    ops: dict[str, Callable[[], Callable[[], Awaitable]]] = {
+        "get_guild_embed_color": lambda: (lambda guild=rng.choice(guilds): storage.get_guild_embed_color(guild)),
+        "get_case_history": lambda: (lambda key=pick(): storage.get_case_history(*key, None, 11)),
+        "get_cases_from": lambda: (lambda guild=rng.choice(guilds), n=rng.randint(1, args.cases // args.guilds): storage.get_cases_from(guild, n)),
+        "get_warnings": lambda: (lambda key=pick(): storage.get_warnings(*key, 0, 11)),
+        "count_warnings": lambda: (lambda key=pick(): storage.count_warnings(*key)),
+        "get_warning_counts": lambda: (lambda guild=rng.choice(guilds): storage.get_warning_counts(guild, 0, 20)),
+        "search_cases": lambda: (lambda guild=rng.choice(guilds), text=" ".join(rng.sample(WORDS, 2)): storage.search_cases(guild, text, limit=10)),
+    }
+    for label, make in ops.items():
+        count = reads // 10 if label == "search_cases" else reads
+        results.append(await _run(label, [make() for _ in range(count)], args.concurrency))
+
+    channels = iter(range(10**12, 10**12 + args.cases))
+
+    def lobby_op():
+        guild, channel = rng.choice(guilds), next(channels)
+
+        async def churn():
+            await storage.lobby_add(guild, channel)
+            storage.lobby_is_tracked(channel)
+            await storage.lobby_delete(channel)
+        return churn
+
+    results.append(await _run("lobby_add+delete", [lobby_op() for _ in range(reads)], args.concurrency))
+    return results
+
+
+async def run_backend(name: str, args: argparse.Namespace) -> list[dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        if name == "sqlite":
+            storage = SqliteBackend(str(Path(tmp) / "bench.db"), str(Path(tmp) / "bench_archive.db"), args.shards)
+        else:
+            storage = MemoryBackend()
+        await storage.initialize()
+        try:
+            return await bench(storage, args)
+        finally:
+            await storage.close()
+
+
+def print_table(results: dict[str, list[dict]]):
+    names = list(results)
+    header = f"{'operation':<22}" + "".join(f"{name + ' ops/s':>18}{'p50 ms':>10}{'p99 ms':>10}" for name in names)
+    print(header)
+    print("-" * len(header))
+    for row in zip(*results.values()):
+        line = f"{row[0]['op']:<22}"
+        for result in row:
+            line += f"{result['ops_s']:>18,.0f}{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+        print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=200, help="members per guild that cases are spread over")
+    parser.add_argument("--cases", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--backend", choices=("sqlite", "memory"), help="run only this backend")
+    parser.add_argument("--shards", type=int, default=1, help="database shards for the SQLite backend")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backends = [args.backend] if args.backend else ["sqlite", "memory"]
+    results = {}
+    for name in backends:
+        started = time.perf_counter()
+        results[name] = asyncio.run(run_backend(name, args))
+        print(f"[bench_storage] {name}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    print_table(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
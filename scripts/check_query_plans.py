@@ -0,0 +1,130 @@
+"""Fail if any query in db/database.py falls back to a full table scan.
+
+This is a dev tool, not part of the running bot. It builds a throwaway database
+from the real migrations in ``db/migrations.py``, statically pulls every SQL
+string literal out of ``db/database.py``, and runs ``EXPLAIN QUERY PLAN`` on each
+one. Any ``SCAN <table>`` step fails the check unless the enclosing function is
+listed in ``ALLOWED_SCANS`` with the reason the scan is intended.
+
+Run it from anywhere:
+
+    py -3.13 scripts/check_query_plans.py
+
+Exit codes:
+    0  every query uses an index (or an allowed scan)
+    1  at least one query does a full table scan, or failed to plan
+"""
+
+from __future__ import annotations
+
+import ast
+import asyncio
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import aiosqlite
+
+ROOT = Path(__file__).resolve().parent.parent
+DATABASE_MODULE = ROOT / "db" / "database.py"
+
+sys.path.insert(0, str(ROOT))
+from db.migrations import create_archive_schema, run_migrations  # noqa: E402
+
+# Functions whose full scan is the point of the query, not an accident.
+ALLOWED_SCANS = {
+    "lobbies_all": "reads every tracked lobby by design (periodic cleanup)",
+    "load_temp_bans": "loads the whole unban schedule into memory once, at cog load",
+    "check_warning_counts": "reconciles every warning counter against warnings, at startup",
+    "rebuild_warning_counts": "recomputes every warning counter, only after a failed check",
+    "guilds_with_retention": "guild_data is one small row per guild, read once per maintenance pass",
+    "warm_up": "bulk-loads every guild's settings and autoroles once, at the first READY",
+    "next_outbox_at": "walks the due-time index in order, stopping at the first message this process owns",
+}
+
+_SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b", re.IGNORECASE)
+_NAMED_PARAM = re.compile(r":([A-Za-z_]\w*)")
+_NUMBERED_PARAM = re.compile(r"\?(\d+)")
+_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def collect_queries() -> list[tuple[str, str]]:
+    """Return (function_name, sql) for every SQL string literal in db/database.py."""
+    tree = ast.parse(DATABASE_MODULE.read_text(encoding="utf-8"), filename=str(DATABASE_MODULE))
+    queries: list[tuple[str, str]] = []
+    for func in ast.walk(tree):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        # Fragments of f-strings (SQL built from a fixed table list) aren't complete
+        # statements on their own, so they can't be planned here.
+        fragments = {id(part) for node in ast.walk(func) if isinstance(node, ast.JoinedStr) for part in node.values}
+        for node in ast.walk(func):
+            if id(node) in fragments:
+                continue
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and _SQL_START.match(node.value):
+                queries.append((func.name, node.value))
+    return queries
+
+
+def _null_params(sql: str) -> dict | tuple:
+    named = _NAMED_PARAM.findall(sql)
+    if named:
+        return {name: None for name in named}
+    numbered = _NUMBERED_PARAM.findall(sql)
+    if numbered:
+        return (None,) * max(int(n) for n in numbered)
+    return (None,) * sql.count("?")
+
+
+def check(conn: sqlite3.Connection, queries: list[tuple[str, str]]) -> list[str]:
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    failures = []
+    for func_name, sql in queries:
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", _null_params(sql)).fetchall()
+        except sqlite3.Error as e:
+            failures.append(f"{func_name}: could not plan query ({e})")
+            continue
+
+        for _, _, _, detail in plan:
+            match = _SCAN.match(detail)
+            # Scans of subqueries/CTEs (not real tables) are fine; so is a deliberate scan.
+            if match and match[1] in tables and func_name not in ALLOWED_SCANS:
+                failures.append(f"{func_name}: {detail}")
+    return failures
+
+
+async def build_schema(path: Path, archive_path: Path):
+    async with aiosqlite.connect(path, isolation_level=None) as conn:
+        await run_migrations(conn)
+        await conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+        await create_archive_schema(conn)
+
+
+def main() -> int:
+    queries = collect_queries()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "plan_check.db"
+        archive_path = Path(tmp) / "plan_check_archive.db"
+        asyncio.run(build_schema(path, archive_path))
+        conn = sqlite3.connect(path)
+        conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+        try:
+            failures = check(conn, queries)
+        finally:
+            conn.close()
+
+    if failures:
+        print(f"[check_query_plans] {len(failures)} full table scan(s):", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        return 1
+
+    print(f"[check_query_plans] {len(queries)} queries checked, no unexpected table scans.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
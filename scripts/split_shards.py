@@ -0,0 +1,168 @@
+"""Split an unsharded database.db and archive.db into DB_SHARDS shards.
+
+This is a one-off migration, not part of the running bot. Stop the bot first.
+It creates database-<n>.db and archive-<n>.db beside the originals with the real
+migrations from ``db/migrations.py``, copies every guild's rows into the shard
+``db.database.shard_of`` routes that guild to, checks that each table's rows all
+arrived, and only then renames the originals to ``*.unsharded`` so the bot can't
+open them by mistake. The full-text index is not copied; its triggers rebuild it
+as the cases land in each shard. Neither is ``change_log``: it's a feed of recent
+settings changes for other processes' caches, not guild data, and the shard's own
+triggers fill it again during the copy, so each shard's is emptied afterwards.
+
+Run it from anywhere, then start the bot with the same DB_SHARDS:
+
+    py -3.13 scripts/split_shards.py --shards 4 [--db db/database.db] [--archive db/archive.db]
+
+Exit codes:
+    0  the database was split
+    1  nothing was changed (shard files already exist, or a table has no guild_id)
+    2  the copy failed or didn't match; the shards are removed and the originals left in place
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+from db.database import ARCHIVE_FILE, DB_FILE, ConnectionPool, shard_files  # noqa: E402
+from db.migrations import run_migrations  # noqa: E402
+
+
+# Tables that aren't copied: they're rebuilt, or only matter to processes already running.
+SKIPPED_TABLES = {"change_log"}
+
+
+def guild_tables(conn: sqlite3.Connection, schema: str) -> dict[str, list[str]]:
+    """{table: columns} of every table in schema, which must all be per guild. The
+    full-text index's own tables and SKIPPED_TABLES are left out."""
+    tables = {}
+    rows = conn.execute(f"SELECT name, sql FROM {schema}.sqlite_schema WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+    fts = set()
+    for name, sql in rows.fetchall():
+        if sql.upper().startswith("CREATE VIRTUAL TABLE"):
+            fts.add(name)
+            continue
+        if name in SKIPPED_TABLES:
+            continue
+        tables[name] = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({name})")]
+    for name in list(tables):
+        if any(name.startswith(f"{table}_") for table in fts):
+            del tables[name]
+        elif "guild_id" not in tables[name]:
+            raise SystemExit(f"[split_shards] {schema}.{name} has no guild_id column, so it can't be split")
+    return tables
+
+
+async def create_shards(files: list[tuple[str, str]]):
+    for path, archive_path in files:
+        pool = ConnectionPool(path, archive_path)
+        await pool.open_writer()
+        await run_migrations(pool.writer)
+        await pool.attach_archive()
+        await pool.close()
+
+
+# Where each schema of the shard being written reads its rows from.
+SOURCE_SCHEMAS = {"main": "src", "archive": "src_archive"}
+
+
+def copy_shard(conn: sqlite3.Connection, tables: dict[str, dict[str, list[str]]], shard: int, count: int) -> dict[str, int]:
+    """Copies the shard's guilds from the attached source schemas into the shard,
+    in one transaction, returning rows copied per schema.table."""
+    copied = {}
+    conn.execute("BEGIN")
+    for schema, columns_of in tables.items():
+        for table, columns in columns_of.items():
+            column_list = ", ".join(columns)
+            cursor = conn.execute(
+                f"INSERT INTO {schema}.{table} ({column_list}) "
+                f"SELECT {column_list} FROM {SOURCE_SCHEMAS[schema]}.{table} WHERE (guild_id >> 22) % ? = ?",
+                (count, shard),
+            )
+            copied[f"{schema}.{table}"] = cursor.rowcount
+    # The change_log triggers logged every copied settings row; nothing is running to
+    # read that, so the shard starts with an empty log numbered from 1.
+    conn.execute("DELETE FROM main.change_log")
+    conn.execute("DELETE FROM main.sqlite_sequence WHERE name = 'change_log'")
+    conn.execute("COMMIT")
+    return copied
+
+
+def _remove_with_wal(paths: list[str]):
+    for path in paths:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, required=True)
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--archive", default=ARCHIVE_FILE)
+    args = parser.parse_args()
+    if args.shards < 2:
+        parser.error("--shards must be at least 2")
+
+    if not os.path.exists(args.db):
+        print(f"[split_shards] {args.db} doesn't exist; nothing changed", file=sys.stderr)
+        return 1
+    files = shard_files(args.db, args.archive, args.shards)
+    existing = [path for pair in files for path in pair if os.path.exists(path)]
+    if existing:
+        print(f"[split_shards] {', '.join(existing)} already exist(s); nothing changed", file=sys.stderr)
+        return 1
+
+    source = sqlite3.connect(args.db, isolation_level=None)
+    source.execute("ATTACH DATABASE ? AS archive", (args.archive,))
+    # Folds the WAL into the files, so the .unsharded copies are complete on their own.
+    source.execute("PRAGMA main.wal_checkpoint(TRUNCATE)")
+    source.execute("PRAGMA archive.wal_checkpoint(TRUNCATE)")
+    tables = {schema: guild_tables(source, schema) for schema in SOURCE_SCHEMAS}
+    expected = {
+        f"{schema}.{table}": source.execute(f"SELECT count(*) FROM {schema}.{table}").fetchone()[0]
+        for schema, columns_of in tables.items()
+        for table in columns_of
+    }
+    source.close()
+
+    totals = dict.fromkeys(expected, 0)
+    try:
+        asyncio.run(create_shards(files))
+        for shard, (path, archive_path) in enumerate(files):
+            conn = sqlite3.connect(path, isolation_level=None)
+            try:
+                conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+                conn.execute("ATTACH DATABASE ? AS src", (args.db,))
+                conn.execute("ATTACH DATABASE ? AS src_archive", (args.archive,))
+                for table, rows in copy_shard(conn, tables, shard, args.shards).items():
+                    totals[table] += rows
+            finally:
+                conn.close()
+            print(f"[split_shards] wrote {os.path.basename(path)} and {os.path.basename(archive_path)}")
+        mismatched = [f"{table}: {totals[table]} of {count}" for table, count in expected.items() if totals[table] != count]
+        if mismatched:
+            raise RuntimeError(f"row counts don't match ({'; '.join(mismatched)})")
+    except Exception as e:
+        # The shard files are all new, so removing them puts things back as they were.
+        _remove_with_wal([path for pair in files for path in pair])
+        print(f"[split_shards] {e}; shards removed, originals left in place", file=sys.stderr)
+        return 2
+
+    for path in (args.db, args.archive):
+        os.replace(path, f"{path}.unsharded")
+    _remove_with_wal([args.db, args.archive])
+    print(f"[split_shards] {sum(expected.values())} row(s) split over {args.shards} shards; set DB_SHARDS={args.shards}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import os
+
+# Cluster members' internal APIs listen on consecutive ports from this one; a single
+# bot process uses just this port, as before.
+INTERNAL_API_BASE_PORT = 8001
+
+
+def cluster_size() -> int:
+    """How many bot processes run.py starts (CLUSTER_SIZE), 1 unless clustered."""
+    return int(os.getenv("CLUSTER_SIZE") or 1)
+
+
+def cluster_member() -> int:
+    """This bot process's index in the cluster, set by run.py for each member it spawns."""
+    return int(os.getenv("CLUSTER_MEMBER") or 0)
+
+
+def shard_count() -> int | None:
+    """The gateway shard count (SHARD_COUNT), None to use Discord's recommendation."""
+    return int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+
+
+def check_cluster_config():
+    """Clustering splits a known number of shards between processes, so it needs SHARD_COUNT."""
+    size = cluster_size()
+    if size < 1:
+        raise SystemExit("CLUSTER_SIZE must be at least 1")
+    if size > 1 and (shard_count() or 0) < size:
+        raise SystemExit("CLUSTER_SIZE above 1 needs SHARD_COUNT set, to at least CLUSTER_SIZE")
+
+
+def member_shards(member: int, size: int, shards: int) -> range:
+    """The contiguous run of shard IDs a member owns, as even as the counts allow."""
+    return range(member * shards // size, (member + 1) * shards // size)
+
+
+def internal_api_url(member: int) -> str:
+    return f"http://127.0.0.1:{INTERNAL_API_BASE_PORT + member}"
@@ -19,16 +19,23 @@ def reload_shared_modules():
                 # reloaded in the same pass; reloading this module would mint a new class
                 # and break that check.
                 continue
+            if name == "utils.rest":
+                # The scheduler installed on bot.http reads the lane from this module's
+                # context variable; a reload would give cogs a new one it never sees.
+                continue
 
             module = sys.modules[name]
             if name == "db.database":
-                # module-level `db` holds the live aiosqlite connection singleton,
-                # set once by initialize_databases(). A reload re-executes the file
-                # top to bottom and would reset it to None, breaking every cog's DB
-                # access until a full process restart, so carry it across the reload.
-                live_connection = getattr(module, "db", None)
+                # The module keeps its live connection pools (writers, readers, and the
+                # group-commit batches still open on the writers) in module globals, set
+                # once by initialize_databases(). A reload re-executes the file top to
+                # bottom and would reset them, breaking every cog's DB access until a
+                # full process restart, so carry every name it lists across the reload.
+                persistent = getattr(module, "RELOAD_PERSISTENT", ("pools",))
+                live_state = {attr: getattr(module, attr, None) for attr in persistent}
                 importlib.reload(module)
-                module.db = live_connection
+                for attr, value in live_state.items():
+                    setattr(module, attr, value)
             else:
                 importlib.reload(module)
 
@@ -1,7 +1,6 @@
 import aiohttp
 import discord
 
-from db.database import lobby_is_tracked
 from utils.errors import UserError
 
 
@@ -20,7 +19,8 @@ class LobbyMixin:
             raise UserError("You must be connected to a lobby voice-channel.")
 
         ch = interaction.user.voice.channel
-        if not await lobby_is_tracked(ch.id):
+        await self.bot.storage.load_lobbies()  # no-op once LobbyManager has loaded the index
+        if not self.bot.storage.lobby_is_tracked(ch.id):
             raise UserError("This channel isn’t a lobby voice-channel.")
 
         return ch
@@ -0,0 +1,77 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import discord
+
+# Fetches the page starting at a cursor. Returns the page's text (None if it has
+# no rows) and the cursor the following page starts at (None if this is the last).
+PageFetcher = Callable[[Any], Awaitable[tuple[str | None, Any]]]
+
+
+class KeysetPaginator(discord.ui.LayoutView):
+    """Pages through a query one page at a time, in the same layout as HelpView.
+    Only the page being shown is ever loaded: each page hands back the cursor the
+    next one starts at, and the cursors of visited pages are kept for going back.
+    There's no total or "last page" button, since that would need a full count."""
+
+    def __init__(self, title: str, fetch_page: PageFetcher, first_page: str, next_cursor: Any, color, start_cursor: Any = None):
+        super().__init__(timeout=180)
+        self.title = title
+        self.fetch_page = fetch_page
+        # cursors[i] is where page i starts; one past the current page if there's a next.
+        self.cursors = [start_cursor] if next_cursor is None else [start_cursor, next_cursor]
+        self.current_page = 0
+        self.message: discord.WebhookMessage | None = None
+
+        self.text_display = discord.ui.TextDisplay(self._render(first_page))
+
+        self.first_page = discord.ui.Button(label="<<", style=discord.ButtonStyle.secondary)
+        self.first_page.callback = self._first_page
+        self.prev_page = discord.ui.Button(label="<", style=discord.ButtonStyle.secondary)
+        self.prev_page.callback = self._prev_page
+        self.page_indicator = discord.ui.Button(style=discord.ButtonStyle.secondary, disabled=True)
+        self.next_page = discord.ui.Button(label=">", style=discord.ButtonStyle.secondary)
+        self.next_page.callback = self._next_page
+        nav_row = discord.ui.ActionRow(self.first_page, self.prev_page, self.page_indicator, self.next_page)
+
+        self.container = discord.ui.Container(self.text_display, nav_row, accent_color=color)
+        self.add_item(self.container)
+        self.update_buttons()
+
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.delete()
+            except discord.HTTPException:
+                pass
+
+    def _render(self, content: str | None) -> str:
+        return f"# {self.title}\n{content or '*Nothing left on this page.*'}"
+
+    def update_buttons(self):
+        self.first_page.disabled = (self.current_page == 0)
+        self.prev_page.disabled = (self.current_page == 0)
+        self.next_page.disabled = (self.current_page >= len(self.cursors) - 1)
+        self.page_indicator.label = f"Page {self.current_page + 1}"
+
+    async def go_to_page(self, interaction: discord.Interaction, page: int):
+        content, next_cursor = await self.fetch_page(self.cursors[page])
+        # Rows may have changed since the page was last seen, so the cursor past it
+        # is always taken from this fetch rather than from history.
+        self.cursors = self.cursors[:page + 1]
+        if next_cursor is not None:
+            self.cursors.append(next_cursor)
+
+        self.current_page = page
+        self.text_display.content = self._render(content)
+        self.update_buttons()
+        await interaction.response.edit_message(view=self)
+
+    async def _first_page(self, interaction: discord.Interaction):
+        await self.go_to_page(interaction, 0)
+
+    async def _prev_page(self, interaction: discord.Interaction):
+        await self.go_to_page(interaction, max(0, self.current_page - 1))
+
+    async def _next_page(self, interaction: discord.Interaction):
+        await self.go_to_page(interaction, min(len(self.cursors) - 1, self.current_page + 1))
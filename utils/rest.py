@@ -0,0 +1,244 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import time
+
+import aiohttp
+import discord
+
+from db.stats import QueryStats
+from utils.cluster import cluster_size
+
+# Priority lanes, highest first. Work done for a command in progress runs in the
+# default INTERACTIVE lane; background code opts into a lower one with lane() or
+# set_lane(), so it yields whenever commands need the budget. Interaction responses
+# and followups go through discord.py's webhook adapter rather than the bot's HTTP
+# client, so they never queue here at all.
+INTERACTIVE, MODERATION, BACKGROUND = 0, 1, 2
+LANE_NAMES = ("interactive", "moderation", "background")
+
+# A proactive budget, kept under Discord's 50 requests/s global limit so discord.py's
+# own reactive 429 handling is the exception rather than how bursts get paced. The
+# limit is per bot token, so in cluster mode each member gets an even share of it.
+GLOBAL_RATE = 45
+GLOBAL_BURST = 45
+# Per route (method, path and major parameter, as Discord buckets them), until the
+# route's first response says otherwise: 5 at once, then 1/s, the common limit for
+# sends and edits in one channel. See RouteBucket.
+ROUTE_RATE = 1
+ROUTE_BURST = 5
+# Idle route buckets are dropped past this many, so memory doesn't grow with every channel ever touched.
+MAX_ROUTE_BUCKETS = 10_000
+
+_lane: contextvars.ContextVar[int] = contextvars.ContextVar("rest_lane", default=INTERACTIVE)
+# The bucket of the request in progress, for the response hook to update.
+_route_bucket: contextvars.ContextVar["RouteBucket | None"] = contextvars.ContextVar("rest_route_bucket", default=None)
+
+
+@contextlib.contextmanager
+def lane(value: int):
+    """Runs the REST calls made inside the block in the given lane."""
+    token = _lane.set(value)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def set_lane(value: int):
+    """Puts the rest of the current task (and tasks it starts) in the given lane,
+    for long-running background tasks."""
+    _lane.set(value)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, 0.0 if one is now."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        """Whether it has refilled, so dropping it loses nothing."""
+        self.wait_time(now)
+        return self.tokens >= self.capacity
+
+
+class RouteBucket(TokenBucket):
+    """A route's bucket. A token bucket at ROUTE_RATE/ROUTE_BURST until a response
+    carries Discord's X-RateLimit-* headers for the route; from then on it follows
+    the window they describe: the calls remaining, none more until it resets, then
+    the route's full limit again."""
+
+    def __init__(self):
+        super().__init__(ROUTE_RATE, ROUTE_BURST)
+        self.reset_at: float | None = None
+        self.outgoing = 0  # calls granted and not yet answered
+
+    def wait_time(self, now: float) -> float:
+        if self.reset_at is not None:
+            if now < self.reset_at:
+                return 0.0 if self.tokens >= 1 else self.reset_at - now
+            # The window is over; the next response starts a new one.
+            self.tokens = self.capacity
+            self.updated = now
+            self.reset_at = None
+        return super().wait_time(now)
+
+    def sync(self, limit: int, remaining: int, reset_after: float, now: float):
+        """Adopts the limit, remaining calls and reset time from a response's headers."""
+        self.capacity = limit
+        # The other calls still in flight were granted before Discord counted them.
+        self.tokens = max(0, remaining - (self.outgoing - 1))
+        self.updated = now
+        self.reset_at = now + reset_after
+
+    def idle(self, now: float) -> bool:
+        return not self.outgoing and super().idle(now)
+
+
+class RestScheduler:
+    """Paces the bot's own REST calls through a global token bucket and one per
+    route, granting waiting calls in lane order (oldest first within a lane). A
+    call held up only by its route's bucket doesn't block calls to other routes."""
+
+    def __init__(self):
+        members = cluster_size()
+        self._global = TokenBucket(GLOBAL_RATE / members, max(1, GLOBAL_BURST / members))
+        self._routes: dict[str, RouteBucket] = {}
+        self._waiting: list[tuple[int, int, str, asyncio.Future]] = []  # (lane, seq, route, future), a heap
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.waits = [QueryStats() for _ in LANE_NAMES]
+        self.peak_depth = [0] * len(LANE_NAMES)
+
+    def install(self, http: discord.http.HTTPClient):
+        """Routes every request the bot's HTTP client makes through the scheduler, and
+        sizes each route's bucket from the rate limit headers on its responses. Call
+        before login, which is when the client creates its session and trace hooks."""
+        request = http.request
+
+        async def scheduled_request(route: discord.http.Route, **kwargs):
+            key = f"{route.key}:{route.major_parameters}"
+            await self.acquire(_lane.get(), key)
+            bucket = self._bucket(key)
+            bucket.outgoing += 1
+            token = _route_bucket.set(bucket)
+            try:
+                return await request(route, **kwargs)
+            finally:
+                _route_bucket.reset(token)
+                bucket.outgoing -= 1
+
+        http.request = scheduled_request
+        if http.http_trace is None:
+            http.http_trace = aiohttp.TraceConfig()
+        http.http_trace.on_request_end.append(self._on_response)
+
+    async def _on_response(self, session, context, params: aiohttp.TraceRequestEndParams):
+        # Runs in the requesting task, so _route_bucket is the route being answered.
+        # CDN fetches and other requests that bypass scheduled_request have none.
+        bucket = _route_bucket.get()
+        headers = params.response.headers
+        if bucket is None or "X-RateLimit-Remaining" not in headers:
+            return
+        bucket.sync(
+            int(headers.get("X-RateLimit-Limit", 1)),
+            int(headers["X-RateLimit-Remaining"]),
+            float(headers.get("X-RateLimit-Reset-After", 0)),
+            time.monotonic(),
+        )
+        # Calls queued on this route may be able to go sooner, or later, than planned.
+        self._wakeup.set()
+
+    async def acquire(self, lane_: int, route: str):
+        """Waits until the call may go out. Free when nothing is queued and both buckets have a token."""
+        started = time.perf_counter()
+        if not self._waiting and self._grant(route, time.monotonic()):
+            self.waits[lane_].record(0.0, 0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (lane_, next(self._seq), route, future))
+        self.peak_depth[lane_] = max(self.peak_depth[lane_], self.depth(lane_))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        # A cancelled caller leaves a done future behind, which _run() skips.
+        await future
+        self.waits[lane_].record((time.perf_counter() - started) * 1000, 0)
+
+    def _bucket(self, route: str) -> RouteBucket:
+        bucket = self._routes.get(route)
+        if bucket is None:
+            if len(self._routes) >= MAX_ROUTE_BUCKETS:
+                now = time.monotonic()
+                self._routes = {key: b for key, b in self._routes.items() if not b.idle(now)}
+            bucket = self._routes[route] = RouteBucket()
+        return bucket
+
+    def _wait_time(self, route: str, now: float) -> float:
+        return max(self._global.wait_time(now), self._bucket(route).wait_time(now))
+
+    def _grant(self, route: str, now: float) -> bool:
+        if self._wait_time(route, now):
+            return False
+        self._global.take()
+        self._bucket(route).take()
+        return True
+
+    async def _run(self):
+        while self._waiting:
+            now = time.monotonic()
+            still_waiting = []
+            soonest = None
+            for entry in sorted(self._waiting):
+                _, _, route, future = entry
+                if future.done():
+                    continue
+                if self._grant(route, now):
+                    future.set_result(None)
+                    continue
+                still_waiting.append(entry)
+                wait = self._wait_time(route, now)
+                soonest = wait if soonest is None else min(soonest, wait)
+            # Sorted, so already a valid heap.
+            self._waiting = still_waiting
+            if not still_waiting:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), soonest)
+            except asyncio.TimeoutError:
+                pass
+
+    def depth(self, lane_: int) -> int:
+        return sum(1 for entry in self._waiting if entry[0] == lane_ and not entry[3].done())
+
+    def snapshot(self) -> dict:
+        lanes = []
+        for index, name in enumerate(LANE_NAMES):
+            stats = self.waits[index].snapshot()
+            lanes.append({
+                "lane": name,
+                "queued": self.depth(index),
+                "peak_queued": self.peak_depth[index],
+                "calls": stats["calls"],
+                "wait_p50_ms": stats["p50_ms"],
+                "wait_p99_ms": stats["p99_ms"],
+                "wait_max_ms": stats["max_ms"],
+            })
+        return {"lanes": lanes, "routes": len(self._routes)}
+
@@ -0,0 +1,70 @@
+import math
+import time
+from collections import Counter
+
+import discord
+
+
+class ShardHealth:
+    """Per-shard connection state and counters for an AutoShardedBot, fed by the
+    on_shard_* events. discord.py keeps latency per shard but not whether a shard
+    has finished its READY or how often it has dropped, which is what shows a
+    single flapping shard that the averaged bot.latency hides."""
+
+    def __init__(self):
+        self._ready: set[int] = set()
+        self._connects: Counter[int] = Counter()
+        self._resumes: Counter[int] = Counter()
+        self._disconnects: Counter[int] = Counter()
+        self._since: dict[int, float] = {}  # shard_id -> wall time of its last state change
+
+    def attach(self, bot: discord.AutoShardedClient):
+        # Listeners rather than @bot.event, so they don't replace handlers defined elsewhere.
+        bot.add_listener(self.on_shard_connect)
+        bot.add_listener(self.on_shard_ready)
+        bot.add_listener(self.on_shard_resumed)
+        bot.add_listener(self.on_shard_disconnect)
+
+    async def on_shard_connect(self, shard_id: int):
+        self._connects[shard_id] += 1
+
+    async def on_shard_ready(self, shard_id: int):
+        self._ready.add(shard_id)
+        self._since[shard_id] = time.time()
+
+    async def on_shard_resumed(self, shard_id: int):
+        self._resumes[shard_id] += 1
+        self._ready.add(shard_id)
+        self._since[shard_id] = time.time()
+
+    async def on_shard_disconnect(self, shard_id: int):
+        self._disconnects[shard_id] += 1
+        self._ready.discard(shard_id)
+        self._since[shard_id] = time.time()
+
+    def snapshot(self, bot: discord.AutoShardedClient) -> list[dict]:
+        """One entry per shard this process runs, in shard order."""
+        guilds = Counter(guild.shard_id for guild in bot.guilds)
+        shards = []
+        for shard_id, info in sorted(bot.shards.items()):
+            ready = shard_id in self._ready and not info.is_closed()
+            latency = info.latency
+            shards.append({
+                "id": shard_id,
+                "ready": ready,
+                "latency_ms": round(latency * 1000) if ready and math.isfinite(latency) else None,
+                "guilds": guilds[shard_id],
+                # The first IDENTIFY is a connect, not a reconnect.
+                "reconnects": max(0, self._connects[shard_id] - 1) + self._resumes[shard_id],
+                "disconnects": self._disconnects[shard_id],
+                "since": self._since.get(shard_id),
+            })
+        return shards
+
+
+def owns_guild(bot: discord.AutoShardedClient, guild_id: int) -> bool:
+    """Whether the guild is on one of the shards this process runs. Always true
+    unless clustered; in cluster mode, another member handles the rest."""
+    if bot.shard_ids is None:
+        return True
+    return (guild_id >> 22) % bot.shard_count in bot.shard_ids
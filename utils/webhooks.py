@@ -0,0 +1,53 @@
+import logging
+import time
+
+import discord
+
+logger = logging.getLogger("webhooks")
+
+WEBHOOK_NAME = "Pedro-bot logs"
+# After a webhook couldn't be set up in a guild (e.g. the channel already has the
+# maximum of 15), how long to send directly before trying again.
+SETUP_RETRY_SECONDS = 10 * 60
+
+
+class LogWebhooks:
+    """One managed webhook per guild for its log channel, found (or created) on
+    first use and cached. Webhook executes are rate limited per webhook, not per
+    channel, so log bursts stop competing with the bot's own sends there.
+    get() returns None when the bot can't manage webhooks in the channel; callers
+    send directly then."""
+
+    def __init__(self, bot: discord.Client):
+        self.bot = bot
+        self._hooks: dict[int, discord.Webhook] = {}  # guild_id -> webhook
+        self._failed_at: dict[int, float] = {}  # channel_id -> monotonic time setup last failed
+
+    async def get(self, channel: discord.TextChannel) -> discord.Webhook | None:
+        hook = self._hooks.get(channel.guild.id)
+        if hook is not None and hook.channel_id == channel.id:
+            return hook
+        if not channel.permissions_for(channel.guild.me).manage_webhooks:
+            return None
+        if time.monotonic() - self._failed_at.get(channel.id, -SETUP_RETRY_SECONDS) < SETUP_RETRY_SECONDS:
+            return None
+
+        try:
+            hook = await self._find_or_create(channel)
+        except discord.HTTPException as e:
+            self._failed_at[channel.id] = time.monotonic()
+            logger.warning(f"Couldn't set up a log webhook in channel {channel.id}, sending directly: {e}")
+            return None
+        self._hooks[channel.guild.id] = hook
+        return hook
+
+    def forget(self, guild_id: int):
+        """Drops a cached webhook that turned out to be deleted; the next get() makes a new one."""
+        self._hooks.pop(guild_id, None)
+
+    async def _find_or_create(self, channel: discord.TextChannel) -> discord.Webhook:
+        # Reuses the one made before a restart rather than piling up a new webhook each time.
+        for hook in await channel.webhooks():
+            if hook.user == self.bot.user and hook.token and hook.name == WEBHOOK_NAME:
+                return hook
+        return await channel.create_webhook(name=WEBHOOK_NAME, reason="Moderation log delivery")
@@ -1,5 +1,6 @@
 import asyncio
 import importlib
+import json
 import logging
 import os
 import subprocess
@@ -12,11 +13,16 @@ from fastapi import FastAPI, Form, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
+from utils.cluster import cluster_size, internal_api_url, member_shards, shard_count
 from utils.cogs import discover_cog_paths, reload_shared_modules
 from utils.log import CONSOLE_RAW_FILE, log_file_size, quiet_uvicorn_logging, tail_log_file, tail_log_lines
 
 COGS_DIR = os.path.join(os.path.dirname(__file__), "cogs")
-INTERNAL_API = "http://127.0.0.1:8001"
+# The bot's internal API, or in cluster mode the first member's: database stats,
+# backups, exports and command sync are the same from any member, so they go there.
+INTERNAL_API = internal_api_url(0)
+# A ready shard whose heartbeat latency is above this is drawn as degraded in the shard grid.
+SLOW_SHARD_MS = 1000
 
 templates = Jinja2Templates(directory="templates")
 templates.env.globals["discord_version"] = discord.__version__
@@ -45,14 +51,14 @@ def _log_task_exception(task):
         logger.error("Web server task failed", exc_info=exc)
 
 
-async def _internal_get(path: str):
+async def _internal_get(path: str, base: str = INTERNAL_API):
     try:
         # sock_connect is the important limit here. If nothing is listening, the connect
         # should fail almost instantly. On Windows it can hang instead, and the plain
         # total timeout let every offline page load wait out the full multi-second timeout.
         timeout = aiohttp.ClientTimeout(total=2, sock_connect=0.5)
         async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(f"{INTERNAL_API}{path}") as resp:
+            async with session.get(f"{base}{path}") as resp:
                 if resp.status != 200:
                     return None
                 return await resp.json()
@@ -60,11 +66,11 @@ async def _internal_get(path: str):
         return None
 
 
-async def _internal_post(path: str, json=None):
+async def _internal_post(path: str, json=None, base: str = INTERNAL_API):
     try:
         timeout = aiohttp.ClientTimeout(total=5, sock_connect=0.5)
         async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(f"{INTERNAL_API}{path}", json=json) as resp:
+            async with session.post(f"{base}{path}", json=json) as resp:
                 if resp.status != 200:
                     return None
                 return await resp.json()
@@ -72,21 +78,116 @@ async def _internal_post(path: str, json=None):
         return None
 
 
+# Cluster mode (CLUSTER_SIZE above 1) runs several bot processes. What's per process
+# (status, guilds, cogs) is asked of every member and merged; cog actions go to all
+# of them. Each result list is in member order, None for a member that didn't answer.
+
+async def _internal_get_all(path: str) -> list:
+    return await asyncio.gather(*(_internal_get(path, internal_api_url(member)) for member in range(cluster_size())))
+
+
+async def _internal_post_all(path: str, json=None) -> list:
+    return await asyncio.gather(*(_internal_post(path, json, internal_api_url(member)) for member in range(cluster_size())))
+
+
+def _merge_status(results: list) -> dict:
+    """One /status for the whole cluster: ready once every member is, latency
+    averaged, guilds summed, and every member's shards in one list, with those of
+    members that didn't answer listed as down rather than left out."""
+    if len(results) == 1:
+        return results[0] or {}
+    up = [status for status in results if status]
+    if not up:
+        return {}
+
+    shards = [shard for status in up for shard in status.get("shards") or ()]
+    for member, status in enumerate(results):
+        if status is None:
+            shards.extend(
+                {"id": shard_id, "ready": False, "latency_ms": None, "guilds": 0, "reconnects": 0, "disconnects": 0, "since": None}
+                for shard_id in member_shards(member, len(results), shard_count())
+            )
+    ready = len(up) == len(results) and all(status["ready"] for status in up)
+    latencies = [status["latency_ms"] for status in up if status.get("latency_ms") is not None]
+    guild_counts = [status["guild_count"] for status in up if status.get("guild_count") is not None]
+    # Up since its most recent member started, since that's how long all of it has been.
+    newest = max((status for status in up if status.get("launch_time")), key=lambda status: status["launch_time"], default=up[0])
+    return {
+        "ready": ready,
+        "bot_name": next((status["bot_name"] for status in up if status.get("bot_name")), None),
+        "bot_avatar_url": next((status["bot_avatar_url"] for status in up if status.get("bot_avatar_url")), None),
+        "latency_ms": round(sum(latencies) / len(latencies)) if latencies else None,
+        "guild_count": sum(guild_counts) if guild_counts else None,
+        "shard_count": up[0].get("shard_count"),
+        "shards": sorted(shards, key=lambda shard: shard["id"]),
+        "uptime": newest.get("uptime"),
+        "launch_time": newest.get("launch_time") if ready else None,
+    }
+
+
+def _merge_cog_result(extension: str, results: list) -> dict:
+    """One cog row from every member's load/unload/reload result: loaded only if
+    it is on every member, with each member's error named."""
+    if not any(results):
+        return {"extension": extension, "loaded": False, "error": "Bot is offline"}
+    if len(results) == 1:
+        return {"extension": extension, "loaded": results[0]["loaded"], "error": results[0].get("error")}
+    errors = []
+    for member, result in enumerate(results):
+        if result is None:
+            errors.append(f"member {member}: offline")
+        elif result.get("error"):
+            errors.append(f"member {member}: {result['error']}")
+    return {
+        "extension": extension,
+        "loaded": all(result and result["loaded"] for result in results),
+        "error": "; ".join(errors) or None,
+    }
+
+
+def _merge_bulk_rows(cogs: list[str], results: list, skipped_loaded: bool) -> list[dict]:
+    """Merges every member's bulk action rows per extension. A member leaves out an
+    extension it had nothing to do for (already loaded, or not loaded to unload),
+    which skipped_loaded says the state of; one no member acted on is left out."""
+    if not any(results):
+        return [{"extension": extension, "loaded": False, "error": "Bot is offline"} for extension in cogs]
+    by_member = [{row["extension"]: row for row in result["rows"]} if result else None for result in results]
+    rows = []
+    for extension in cogs:
+        if not any(member_rows and extension in member_rows for member_rows in by_member):
+            continue
+        rows.append(_merge_cog_result(extension, [
+            None if member_rows is None else member_rows.get(extension, {"loaded": skipped_loaded, "error": None})
+            for member_rows in by_member
+        ]))
+    return rows
+
+
 def create_app(supervisor, web_state):
     app = FastAPI(docs_url=None, redoc_url=None)
 
     async def _status():
-        data = await _internal_get("/status")
-        return data or {}
+        return _merge_status(await _internal_get_all("/status"))
 
     async def _cogs():
         # Based on whether the internal API answers, not bot.is_ready(). bot.py loads
         # cogs before connecting to Discord, so extensions can be loaded already while
         # is_ready() is still false. /cogs reads bot.extensions directly and works
         # either way, so we get accurate state instead of showing "unloaded" too early.
-        cogs_data = await _internal_get("/cogs")
-        if cogs_data:
-            return cogs_data["cogs"]
+        results = [data for data in await _internal_get_all("/cogs") if data]
+        if len(results) == 1:
+            return results[0]["cogs"]
+        if results:
+            # In a cluster, loaded only where every member has it, so a partial state shows up.
+            counts = {}
+            for data in results:
+                for cog in data["cogs"]:
+                    counts[cog["extension"]] = counts.get(cog["extension"], 0) + cog["loaded"]
+            size = cluster_size()
+            return [
+                {"extension": extension, "loaded": count == size, "error": f"Loaded in {count} of {size} members" if 0 < count < size else None}
+                for extension, count in sorted(counts.items())
+            ]
         # No response means bot.py isn't running. Walk the cogs directory and check
         # each file for a setup() entrypoint instead. Real disk I/O, keep off the event loop.
         paths = await asyncio.to_thread(discover_cog_paths, COGS_DIR)
@@ -104,6 +205,8 @@ def create_app(supervisor, web_state):
             "is_ready": ready,
             "latency": status.get("latency_ms"),
             "guild_count": status.get("guild_count"),
+            "shards": status.get("shards") or [],
+            "slow_shard_ms": SLOW_SHARD_MS,
             "uptime": status.get("uptime") or "—",
             "launch_time": status.get("launch_time"),
             "cogs": cogs,
@@ -112,9 +215,17 @@ def create_app(supervisor, web_state):
 
     @app.get("/guilds", response_class=HTMLResponse)
     async def guild_list(request: Request):
-        data = await _internal_get("/guilds")
+        guilds = [guild for data in await _internal_get_all("/guilds") if data for guild in data["guilds"]]
         return templates.TemplateResponse(request=request, name="partials/guild_list.html", context={
-            "guilds": data["guilds"] if data else [],
+            "guilds": sorted(guilds, key=lambda g: g["name"].lower()),
+        })
+
+    @app.get("/shards", response_class=HTMLResponse)
+    async def shard_grid(request: Request):
+        status = await _status()
+        return templates.TemplateResponse(request=request, name="partials/shard_grid.html", context={
+            "shards": status.get("shards") or [],
+            "slow_shard_ms": SLOW_SHARD_MS,
         })
 
     @app.get("/guilds/clear", response_class=HTMLResponse)
@@ -125,6 +236,63 @@ def create_app(supervisor, web_state):
             "View</button>"
         )
 
+    @app.get("/guilds/{guild_id}/export")
+    async def export_guild(guild_id: int):
+        # Relayed chunk by chunk, so a large export never sits in memory here either.
+        # No total timeout: a big guild can take a while to stream.
+        session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=0.5))
+        try:
+            resp = await session.get(f"{INTERNAL_API}/guilds/{guild_id}/export")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            await session.close()
+            return HTMLResponse("Bot is offline", status_code=503)
+        if resp.status != 200:
+            resp.release()
+            await session.close()
+            return HTMLResponse("Export failed", status_code=502)
+
+        async def relay():
+            try:
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    yield chunk
+            finally:
+                resp.release()
+                await session.close()
+
+        return StreamingResponse(relay(), media_type="application/gzip", headers={
+            "Content-Disposition": resp.headers.get("Content-Disposition", f'attachment; filename="guild-{guild_id}.ndjson.gz"'),
+        })
+
+    @app.get("/db/backup", response_class=HTMLResponse)
+    async def backup_status(request: Request):
+        data = await _internal_get("/db/backup")
+        return templates.TemplateResponse(request=request, name="partials/backup_status.html", context={
+            "backup": data["backup"] if data else None,
+            "error": data["error"] if data else "Bot is offline",
+        })
+
+    @app.post("/db/backup", response_class=HTMLResponse)
+    async def start_backup(request: Request):
+        data = await _internal_post("/db/backup")
+        return templates.TemplateResponse(request=request, name="partials/backup_status.html", context={
+            "backup": data["backup"] if data else None,
+            "error": data["error"] if data else "Bot is offline",
+        })
+
+    @app.get("/db/stats", response_class=HTMLResponse)
+    async def db_stats(request: Request):
+        data = await _internal_get("/db/stats")
+        return templates.TemplateResponse(request=request, name="partials/db_stats.html", context={
+            "queries": data["queries"] if data else None,
+        })
+
+    @app.get("/rest/stats", response_class=HTMLResponse)
+    async def rest_stats(request: Request):
+        data = await _internal_get("/rest/stats")
+        return templates.TemplateResponse(request=request, name="partials/rest_stats.html", context={
+            "lanes": data["lanes"] if data else None,
+        })
+
     @app.get("/cogs/refresh", response_class=HTMLResponse)
     async def cogs_refresh(request: Request):
         # Called on a ready flip, a control flip, or another tab's cog change.
@@ -132,16 +300,16 @@ def create_app(supervisor, web_state):
         cogs = await _cogs()
         return templates.TemplateResponse(request=request, name="partials/cog_rows.html", context={
             "rows": [
-                {"extension": cog["extension"], "loaded": cog["loaded"], "error": None, "just_reloaded": False}
+                {"extension": cog["extension"], "loaded": cog["loaded"], "error": cog.get("error"), "just_reloaded": False}
                 for cog in cogs
             ],
         })
 
     @app.post("/cogs/reload/{extension:path}", response_class=HTMLResponse)
     async def reload_cog(request: Request, extension: str):
-        result = await _internal_post(f"/cogs/reload/{extension}")
+        result = _merge_cog_result(extension, await _internal_post_all(f"/cogs/reload/{extension}"))
         web_state.cogs_epoch += 1
-        error = result.get("error") if result else "Bot is offline"
+        error = result["error"]
         return templates.TemplateResponse(request=request, name="partials/cog_row.html", context={
             "extension": extension,
             "loaded": True,
@@ -155,10 +323,10 @@ def create_app(supervisor, web_state):
 
     @app.post("/cogs/unload/{extension:path}", response_class=HTMLResponse)
     async def unload_cog(request: Request, extension: str):
-        result = await _internal_post(f"/cogs/unload/{extension}")
+        result = _merge_cog_result(extension, await _internal_post_all(f"/cogs/unload/{extension}"))
         web_state.cogs_epoch += 1
-        loaded = bool(result and result.get("loaded"))
-        error = result.get("error") if result else "Bot is offline"
+        loaded = result["loaded"]
+        error = result["error"]
         return templates.TemplateResponse(request=request, name="partials/cog_row.html", context={
             "extension": extension,
             "loaded": loaded,
@@ -167,10 +335,10 @@ def create_app(supervisor, web_state):
 
     @app.post("/cogs/load/{extension:path}", response_class=HTMLResponse)
     async def load_cog_row(request: Request, extension: str):
-        result = await _internal_post(f"/cogs/load/{extension}")
+        result = _merge_cog_result(extension, await _internal_post_all(f"/cogs/load/{extension}"))
         web_state.cogs_epoch += 1
-        loaded = bool(result and result.get("loaded"))
-        error = result.get("error") if result else "Bot is offline"
+        loaded = result["loaded"]
+        error = result["error"]
         return templates.TemplateResponse(request=request, name="partials/cog_row.html", context={
             "extension": extension,
             "loaded": loaded,
@@ -179,11 +347,8 @@ def create_app(supervisor, web_state):
 
     @app.post("/cogs/bulk/reload", response_class=HTMLResponse)
     async def bulk_reload_cogs(request: Request, cogs: list[str] = Form(...)):
-        result = await _internal_post("/cogs/bulk/reload", json={"cogs": cogs})
+        rows = _merge_bulk_rows(cogs, await _internal_post_all("/cogs/bulk/reload", json={"cogs": cogs}), skipped_loaded=False)
         web_state.cogs_epoch += 1
-        rows = result["rows"] if result else [
-            {"extension": extension, "loaded": False, "error": "Bot is offline"} for extension in cogs
-        ]
         for row in rows:
             row["just_reloaded"] = row.get("error") is None
         return templates.TemplateResponse(request=request, name="partials/cog_rows_oob.html", context={
@@ -192,22 +357,16 @@ def create_app(supervisor, web_state):
 
     @app.post("/cogs/bulk/unload", response_class=HTMLResponse)
     async def bulk_unload_cogs(request: Request, cogs: list[str] = Form(...)):
-        result = await _internal_post("/cogs/bulk/unload", json={"cogs": cogs})
+        rows = _merge_bulk_rows(cogs, await _internal_post_all("/cogs/bulk/unload", json={"cogs": cogs}), skipped_loaded=False)
         web_state.cogs_epoch += 1
-        rows = result["rows"] if result else [
-            {"extension": extension, "loaded": False, "error": "Bot is offline"} for extension in cogs
-        ]
         return templates.TemplateResponse(request=request, name="partials/cog_rows_oob.html", context={
             "rows": rows,
         })
 
     @app.post("/cogs/bulk/load", response_class=HTMLResponse)
     async def bulk_load_cogs(request: Request, cogs: list[str] = Form(...)):
-        result = await _internal_post("/cogs/bulk/load", json={"cogs": cogs})
+        rows = _merge_bulk_rows(cogs, await _internal_post_all("/cogs/bulk/load", json={"cogs": cogs}), skipped_loaded=True)
         web_state.cogs_epoch += 1
-        rows = result["rows"] if result else [
-            {"extension": extension, "loaded": False, "error": "Bot is offline"} for extension in cogs
-        ]
         return templates.TemplateResponse(request=request, name="partials/cog_rows_oob.html", context={
             "rows": rows,
         })
@@ -268,6 +427,32 @@ def create_app(supervisor, web_state):
     async def bot_status_clear():
         return HTMLResponse("")
 
+    async def cluster_status_events():
+        """The events internal_api's /status/stream sends, for the cluster as a whole."""
+        last_ready = last_latency = last_guild_count = last_shards = "unset"
+        while True:
+            status = await _status()
+            events = []
+            ready = bool(status.get("ready"))
+            if ready != last_ready:
+                last_ready = ready
+                events.append(f"event: ready\ndata: {json.dumps({'ready': ready, 'launch_time': status.get('launch_time')})}\n\n")
+            latency_ms = status.get("latency_ms") if ready else None
+            if latency_ms != last_latency:
+                last_latency = latency_ms
+                events.append(f"data: {latency_ms if latency_ms is not None else ''}\n\n")
+            guild_count = status.get("guild_count") if ready else None
+            if guild_count != last_guild_count:
+                last_guild_count = guild_count
+                events.append(f"event: guilds\ndata: {guild_count if guild_count is not None else ''}\n\n")
+            shards = status.get("shards") or []
+            if shards != last_shards:
+                last_shards = shards
+                events.append(f"event: shards\ndata: {json.dumps(shards)}\n\n")
+            for event in events or [": keepalive\n\n"]:
+                yield event
+            await asyncio.sleep(1)
+
     @app.get("/status/stream")
     async def status_stream(request: Request):
         server = web_state.web_server
@@ -293,6 +478,17 @@ def create_app(supervisor, web_state):
                 last_cogs_epoch = web_state.cogs_epoch
                 return f"event: cogs\ndata: {last_cogs_epoch}\n\n"
 
+            if cluster_size() > 1:
+                # No single stream to relay, so the cluster's merged /status is polled
+                # instead, every event emitted whole, so ours can go in between any two.
+                async for event in cluster_status_events():
+                    if await request.is_disconnected() or (server and server.should_exit):
+                        return
+                    yield status_event()
+                    yield cogs_event()
+                    yield event
+                return
+
             try:
                 timeout = aiohttp.ClientTimeout(total=None, sock_connect=0.5)
                 async with aiohttp.ClientSession(timeout=timeout) as session: